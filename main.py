@@ -10,6 +10,10 @@ from sources.interaction import Interaction
 from sources.agents import Agent, CoderAgent, CasualAgent, FileAgent, PlannerAgent, BrowserAgent
 from sources.agents.gemini_agent import GeminiAgent
 from sources.browser import Browser, create_driver
+from sources.model_registry import registry
+from sources.model_tiers import ModelTiers
+from sources.memory import Memory
+from sources.utility import pretty_print
 
 import warnings
 warnings.filterwarnings("ignore")
@@ -23,12 +27,36 @@ def handleInterrupt(signum, frame):
 def main():
     signal.signal(signal.SIGINT, handler=handleInterrupt)
 
+    # AI models (summarizer, router, BART, Whisper, Kokoro) are shared and loaded on first use
+    registry.set_ram_budget(config.getint('MODELS', 'ram_budget_mb', fallback=0))
+    max_idle_seconds = config.getint('MODELS', 'max_idle_seconds', fallback=0)
+    Memory.configure_context(config.getint('MEMORY', 'context_tokens', fallback=0),
+                             recent_messages=config.getint('MEMORY', 'recent_messages', fallback=6),
+                             tokenizer=config.get('MEMORY', 'tokenizer', fallback=""))
+    Memory.configure_storage(config.get('MEMORY', 'storage', fallback="jsonl"),
+                             database=config.get('MEMORY', 'database', fallback="conversations/conversations.db"))
+    Memory.configure_summarizer(config.get('MEMORY', 'summarizer', fallback="auto"),
+                                batch_size=config.getint('MEMORY', 'summary_batch_size', fallback=8))
+
     # checking pre requisites 
     provider = Provider(provider_name=config["MAIN"]["provider_name"],
                         model=config["MAIN"]["provider_model"],
                         server_address=config["MAIN"]["provider_server_address"],
                         is_local=config.getboolean('MAIN', 'is_local'))
 
+    # LOW complexity turns are served by a small model when one is configured
+    small_model = config.get('TIERS', 'small_model', fallback="")
+    small_provider = None
+    if small_model:
+        small_provider = Provider(provider_name=config["MAIN"]["provider_name"],
+                                  model=small_model,
+                                  server_address=config["MAIN"]["provider_server_address"],
+                                  is_local=config.getboolean('MAIN', 'is_local'))
+    tier_overrides = {}
+    if config.has_section('TIERS'):
+        tier_overrides = {key: value for key, value in config.items('TIERS') if key != "small_model"}
+    tiers = ModelTiers(provider, small_provider, overrides=tier_overrides)
+
     browser = Browser(create_driver(headless=config.getboolean('MAIN', 'headless_browser')))
     personality_folder = "jarvis" if config.getboolean('MAIN', 'jarvis_personality') else "base"
 
@@ -53,10 +81,32 @@ def main():
                     provider=provider, verbose=False, browser=browser)
     ]
 
+    router_options = {
+        "mode": config.get('ROUTER', 'mode', fallback="cascade"),
+        "cascade_threshold": config.getfloat('ROUTER', 'cascade_threshold', fallback=0.5),
+        "quantization": config.get('ROUTER', 'quantization', fallback="none"),
+        "cache_size": config.getint('ROUTER', 'cache_size', fallback=256),
+        "cache_ttl": config.getfloat('ROUTER', 'cache_ttl', fallback=3600),
+        "cache_similarity": config.getfloat('ROUTER', 'cache_similarity', fallback=0),
+        "rules": config.getboolean('ROUTER', 'rules', fallback=True),
+        "knn_weight": config.getfloat('ROUTER', 'knn_weight', fallback=0),
+    }
+
+    long_term_options = None
+    if config.getboolean('MEMORY', 'long_term', fallback=False):
+        long_term_options = {
+            "top_k": config.getint('MEMORY', 'long_term_top_k', fallback=3),
+            "min_score": config.getfloat('MEMORY', 'long_term_min_score', fallback=0.5),
+        }
+
     interaction = Interaction(agents,
                               tts_enabled=config.getboolean('MAIN', 'speak'),
                               stt_enabled=config.getboolean('MAIN', 'listen'),
-                              recover_last_session=config.getboolean('MAIN', 'recover_last_session'))
+                              recover_last_session=config.getboolean('MAIN', 'recover_last_session'),
+                              router_options=router_options,
+                              tiers=tiers,
+                              journal=config.getboolean('MAIN', 'save_session'),
+                              long_term_options=long_term_options)
     try:
         while interaction.is_active:
             interaction.get_user()
@@ -65,6 +115,8 @@ def main():
                interaction.show_answer()
                 # except:
                 #     interaction.get_user()
+            if max_idle_seconds > 0:
+                registry.evict_idle(max_idle_seconds)
     except Exception as e:
         if config.getboolean('MAIN', 'save_session'):
             interaction.save_session()
@@ -72,6 +124,10 @@ def main():
     finally:
         if config.getboolean('MAIN', 'save_session'):
             interaction.save_session()
+        if tiers.enabled:
+            for tier, stats in tiers.report().items():
+                pretty_print(f"{tier} tier ({stats['model']}): {stats['turns']} turns ({stats['share']*100:.0f}%), "
+                             f"{stats['mean_time']:.1f}s per turn", color="info")
 
 
 if __name__ == "__main__":
@@ -1,32 +1,134 @@
 #!/usr/bin python3
 
 import argparse
+import json
 import time
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 
 from sources.llamacpp_handler import LlamacppLLM
 from sources.ollama_handler import OllamaLLM
+from sources.job_queue import JobQueue, QueueFull
 
 parser = argparse.ArgumentParser(description='AgenticSeek server script')
 parser.add_argument('--provider', type=str, help='LLM backend library to use. set to [ollama] or [llamacpp]', required=True)
 parser.add_argument('--port', type=int, help='port to use', required=True)
+parser.add_argument('--workers', type=int, default=1, help='generations run concurrently (ollama: match OLLAMA_NUM_PARALLEL)')
+parser.add_argument('--max-queue', type=int, default=16, help='generations waiting beyond this are rejected with HTTP 429')
+parser.add_argument('--batch-slots', type=int, default=1, help='llamacpp: generations decoded together (continuous batching), 1 to disable')
+parser.add_argument('--prefix-cache-mb', type=int, default=2048, help='llamacpp: memory of the KV cache states kept per session to reuse prompt prefixes, 0 to disable')
 args = parser.parse_args()
 
 app = Flask(__name__)
 
 assert args.provider in ["ollama", "llamacpp"], f"Provider {args.provider} does not exists. see --help for more information"
 
-generator = OllamaLLM() if args.provider == "ollama" else LlamacppLLM() 
+generator = OllamaLLM() if args.provider == "ollama" else LlamacppLLM(batch_slots=args.batch_slots, prefix_cache_mb=args.prefix_cache_mb)
+# every batch slot needs a worker to hand it a job
+workers = max(args.workers, args.batch_slots) if args.provider == "llamacpp" else args.workers
+jobs = JobQueue(generator, workers=workers, max_queued=args.max_queue)
+
+def submit_job():
+    """Queue the generation of the request, returns (job, None) or (None, error response)."""
+    data = request.get_json()
+    history = data.get('messages', [])
+    try:
+        return jobs.submit(history, model=data.get('model', None)), None
+    except QueueFull as e:
+        return None, (jsonify({"error": str(e)}), 429)
+
+def sse_response(job, since: int = 0):
+    """
+    Stream a job as server-sent events: "data: {"job_id": ...}" first, one "data: {"delta": ...}" event
+    per piece of text, "data: {"error": ...}" on failure or cancellation, then "data: [DONE]".
+    """
+    def events():
+        yield f"data: {json.dumps({'job_id': job.id})}\n\n"
+        for delta in job.state.stream(since):
+            if delta:
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+        if job.state.error is not None:
+            yield f"data: {json.dumps({'error': job.state.error})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def job_status(job):
+    # ?since=<offset> returns only the text after offset, as "delta", with the new "offset"
+    since = request.args.get('since', default=None, type=int)
+    with job.state.lock:
+        status = job.state.status(since)
+    return {**status, **job.info(), "position": jobs.position(job)}
 
 @app.route('/generate', methods=['POST'])
 def start_generation():
-    if generator is None:
-        return jsonify({"error": "Generator not initialized"}), 401
+    job, error = submit_job()
+    if error is not None:
+        return error
+    return jsonify({"message": "Generation queued", "job_id": job.id, "position": jobs.position(job)}), 202
+
+@app.route('/generate_stream', methods=['POST'])
+def stream_generation():
+    """Queue a generation and stream it as server-sent events."""
+    job, error = submit_job()
+    if error is not None:
+        return error
+    return sse_response(job)
+
+@app.route('/generate_batch', methods=['POST'])
+def generate_batch():
+    """
+    Run offline generations together and wait for all of them.
+    Takes {"requests": [{"messages": [...]}, ...], "model": ...}, returns the texts with the aggregate tokens/s.
+    """
     data = request.get_json()
-    history = data.get('messages', [])
-    if generator.start(history):
-        return jsonify({"message": "Generation started"}), 202
-    return jsonify({"error": "Generation already in progress"}), 402
+    histories = [item.get('messages', []) for item in data.get('requests', [])]
+    tokens_before = generator.stats()["tokens"]
+    start_time = time.perf_counter()
+    try:
+        batch = jobs.submit_many(histories, model=data.get('model', None))
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    results = []
+    for job in batch:
+        text = "".join(job.state.stream())
+        results.append({"job_id": job.id, "text": text, "error": job.state.error})
+    elapsed = time.perf_counter() - start_time
+    # tokens of every generation finished meanwhile, exact when the server runs nothing else
+    tokens = generator.stats()["tokens"] - tokens_before
+    return jsonify({
+        "results": results,
+        "tokens": tokens,
+        "seconds": elapsed,
+        "tokens_per_s": tokens / elapsed if elapsed > 0 else 0.0,
+        "generator": generator.stats(),
+    }), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return job_status(job)
+
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return sse_response(job, request.args.get('since', default=0, type=int))
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    if not jobs.cancel(job_id):
+        return jsonify({"error": f"Job {job_id} is unknown or already finished"}), 404
+    return jsonify({"message": "Job cancelled", "job_id": job_id}), 200
+
+@app.route('/queue', methods=['GET'])
+def queue_stats():
+    return jobs.stats()
 
 @app.route('/setup', methods=['POST'])
 def setup():
@@ -39,9 +141,11 @@ def setup():
 
 @app.route('/get_updated_sentence')
 def get_updated_sentence():
-    if not generator:
-        return jsonify({"error": "Generator not initialized"}), 405
-    return generator.get_status()
+    # ?job_id=<id> selects the job, the latest submitted one by default
+    job = jobs.get(request.args.get('job_id', default=None))
+    if job is None:
+        return jsonify({"error": "No generation"}), 404
+    return job_status(job)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', threaded=True, debug=True, port=args.port)
\ No newline at end of file
+    app.run(host='0.0.0.0', threaded=True, debug=True, port=args.port)
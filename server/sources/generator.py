@@ -1,27 +1,155 @@
-
+import bisect
+import collections
+import re
 import threading
+import time
 import logging
 from abc import abstractmethod
 
+# end of a sentence: punctuation followed by a space, or a line break
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+# characters before new text scanned again for sentence ends, a boundary may start in the previous chunk
+SENTENCE_OVERLAP = 8
+
 class GenerationState:
+    """
+    GenerationState holds the text of the current generation as an append-only list of chunks.
+    offsets[i] is the length of the text up to the end of chunks[i], so a client that already
+    has `since` characters gets only the new ones, without the buffer ever being rebuilt.
+    """
     def __init__(self):
         self.lock = threading.Lock()
-        self.last_complete_sentence = ""
-        self.current_buffer = ""
+        # notified whenever text is added or the generation ends
+        self.updated = threading.Condition(self.lock)
         self.is_generating = False
-    
-    def status(self) -> dict:
-        return {
-            "sentence": self.current_buffer,
+        # set by cancel(), handlers stop generating when they see it
+        self.cancelled = False
+        self.reset()
+
+    @property
+    def current_buffer(self) -> str:
+        return "".join(self.chunks)
+
+    def status(self, since: int = None) -> dict:
+        """
+        Args:
+            since (int): Length of the text the caller already has, None for the whole text
+        Returns:
+            dict: The whole text as "sentence", or only the new text as "delta" with the new "offset"
+        """
+        status = {
             "is_complete": not self.is_generating,
             "last_complete_sentence": self.last_complete_sentence,
+            "sentence_end": self.sentence_end,
             "is_generating": self.is_generating,
         }
+        if since is None:
+            status["sentence"] = self.current_buffer
+        else:
+            status["delta"] = self.text_since(since)
+            status["offset"] = self.length
+        if self.error is not None:
+            status["error"] = self.error
+        return status
+
+    def reset(self) -> None:
+        """Clear the output of the previous generation, the lock must be held."""
+        self.chunks = []
+        self.offsets = []
+        self.length = 0
+        # the text after sentence_end is the sentence being generated
+        self.last_complete_sentence = ""
+        self.sentence_end = 0
+        self.error = None
+
+    def text_since(self, offset: int) -> str:
+        """Text after offset, the lock must be held."""
+        offset = max(0, min(offset, self.length))
+        first = bisect.bisect_right(self.offsets, offset)
+        if first == len(self.chunks):
+            return ""
+        chunk_start = self.offsets[first] - len(self.chunks[first])
+        return "".join(self.chunks[first:])[offset - chunk_start:]
+
+    def append(self, text: str) -> None:
+        if not text:
+            return
+        with self.lock:
+            self.chunks.append(text)
+            self.length += len(text)
+            self.offsets.append(self.length)
+            self.track_sentences(text)
+            self.updated.notify_all()
+
+    def track_sentences(self, text: str) -> None:
+        """
+        Move last_complete_sentence to the last sentence ended by text, the lock must be held.
+        Only text and the few characters before it are scanned, so a long sentence (code, lists) is not scanned again
+        on every append.
+        """
+        scan_start = max(self.sentence_end, self.length - len(text) - SENTENCE_OVERLAP)
+        ends = [scan_start + match.end() for match in SENTENCE_END.finditer(self.text_since(scan_start))]
+        if not ends:
+            return
+        starts = [self.sentence_end] + ends[:-1]
+        for start, end in zip(reversed(starts), reversed(ends)):
+            sentence = self.text_since(start)[:end - start].strip()
+            if sentence:
+                self.last_complete_sentence = sentence
+                break
+        self.sentence_end = ends[-1]
+
+    def finish(self, error: str = None) -> None:
+        with self.lock:
+            pending = self.text_since(self.sentence_end).strip()
+            if pending:
+                # the end of the generation closes the last sentence
+                self.last_complete_sentence = pending
+                self.sentence_end = self.length
+            self.is_generating = False
+            self.error = error
+            self.updated.notify_all()
+
+    def cancel(self) -> None:
+        with self.lock:
+            self.cancelled = True
+            self.updated.notify_all()
+
+    def wait_for_text(self, offset: int, timeout: float = None) -> tuple:
+        """
+        Wait until text past offset is generated or the generation ends.
+        Args:
+            offset (int): Length of the text the caller already has
+            timeout (float): Maximum wait in seconds
+        Returns:
+            tuple: (new text, whether the generation is over)
+        """
+        with self.lock:
+            if self.length <= offset and self.is_generating:
+                self.updated.wait(timeout)
+            return self.text_since(offset), not self.is_generating
+
+    def stream(self, since: int = 0, heartbeat: float = 15):
+        """
+        Yield the text of the generation as it is produced.
+        Args:
+            since (int): Length of the text the caller already has
+            heartbeat (float): Seconds without new text after which an empty string is yielded (keeps the connection alive)
+        Returns:
+            Generator: Text deltas
+        """
+        offset = since
+        while True:
+            text, is_complete = self.wait_for_text(offset, heartbeat)
+            offset += len(text)
+            if text or not is_complete:
+                yield text
+            if is_complete and not text:
+                return
 
 class GeneratorLLM():
     def __init__(self):
         self.model = None
-        self.state = GenerationState()
         self.logger = logging.getLogger(__name__)
         handler = logging.StreamHandler()
         handler.setLevel(logging.INFO)
@@ -29,37 +157,90 @@ class GeneratorLLM():
         handler.setFormatter(formatter)
         self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
+        # throughput: tokens of finished generations, time with at least one generation running
+        self.stats_lock = threading.Lock()
+        self.active = 0
+        self.busy_since = None
+        self.busy_time = 0.0
+        self.total_tokens = 0
+        self.stream_rates = collections.deque(maxlen=1000)
     
     def set_model(self, model: str) -> None:
         self.logger.info(f"Model set to {model}")
         self.model = model
-    
-    def start(self, history: list) -> bool:
-        if self.model is None:
-            raise Exception("Model not set")
-        with self.state.lock:
-            if self.state.is_generating:
-                return False
-            self.state.is_generating = True
-            self.logger.info("Starting generation")
-            threading.Thread(target=self.generate, args=(history,)).start()
-        return True
-    
-    def get_status(self) -> dict:
-        with self.state.lock:
-            return self.state.status()
+
+    def run(self, history: list, state: GenerationState, model: str = None) -> None:
+        """
+        Run one generation to the end, the outcome (error, cancellation) is recorded in state.
+        Args:
+            history (list): The messages
+            state (GenerationState): The state the text is appended to
+            model (str): The model, None for the model set with set_model
+        """
+        model = model or self.model
+        error = None
+        tokens = 0
+        start_time = self.begin()
+        try:
+            if model is None:
+                raise Exception("Model not set")
+            tokens = self.generate(history, state, model)
+            if tokens is None:
+                tokens = len(state.chunks)
+        except Exception as e:
+            self.logger.error(f"Error: {e}")
+            error = str(e)
+        finally:
+            if state.cancelled and error is None:
+                error = "Generation cancelled"
+            self.end(start_time, tokens)
+            self.logger.info("Generation complete")
+            state.finish(error)
+
+    def begin(self) -> float:
+        with self.stats_lock:
+            now = time.perf_counter()
+            if self.active == 0:
+                self.busy_since = now
+            self.active += 1
+            return now
+
+    def end(self, start_time: float, tokens: int) -> None:
+        with self.stats_lock:
+            now = time.perf_counter()
+            self.active -= 1
+            if self.active == 0:
+                self.busy_time += now - self.busy_since
+            self.total_tokens += tokens
+            if tokens and now > start_time:
+                self.stream_rates.append(tokens / (now - start_time))
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: aggregate tokens/s (all generations over the time any was running) and mean tokens/s of one generation
+        """
+        with self.stats_lock:
+            busy_time = self.busy_time
+            if self.active > 0:
+                busy_time += time.perf_counter() - self.busy_since
+            return {
+                "tokens": self.total_tokens,
+                "busy_s": busy_time,
+                "tokens_per_s": self.total_tokens / busy_time if busy_time > 0 else 0.0,
+                "stream_tokens_per_s": sum(self.stream_rates) / max(len(self.stream_rates), 1),
+            }
 
     @abstractmethod
-    def generate(self, history: list) -> None:
+    def generate(self, history: list, state: GenerationState, model: str) -> None:
         """
-        Generate text using the model.
+        Generate text using the model, appending it to state as it is produced.
+        Stops early when state.cancelled is set.
         args:
             history: list of strings
+            state: the GenerationState of the job
+            model: the model to use
         returns:
-            None
+            number of tokens generated, None to count the appended chunks
         """
         pass
-
-if __name__ == "__main__":
-    generator = GeneratorLLM()
-    generator.get_status()
\ No newline at end of file
@@ -0,0 +1,209 @@
+import collections
+import threading
+import time
+import uuid
+
+from .generator import GeneratorLLM, GenerationState
+
+class QueueFull(Exception):
+    pass
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile, 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return float(ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))])
+
+class Job:
+    """
+    A generation request: its messages, model and GenerationState, with queue and run timings.
+    Status goes queued -> running -> done | failed | cancelled.
+    """
+    def __init__(self, history: list, model: str = None):
+        self.id = uuid.uuid4().hex
+        self.history = history
+        self.model = model
+        self.state = GenerationState()
+        # streams of a queued job wait for its first token
+        self.state.is_generating = True
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def info(self) -> dict:
+        now = time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "model": self.model,
+            "wait_s": (self.started_at or now) - self.submitted_at,
+            "run_s": (self.finished_at or now) - self.started_at if self.started_at else 0.0,
+        }
+
+class JobQueue:
+    """
+    JobQueue lets several clients share one generator: each /generate call becomes a job in a bounded
+    FIFO queue, served by a fixed number of worker threads. Jobs keep their own GenerationState,
+    so they are polled, streamed and cancelled by id.
+    """
+    def __init__(self, generator: GeneratorLLM, workers: int = 1, max_queued: int = 16, max_finished: int = 256):
+        """
+        Args:
+            generator (GeneratorLLM): The backend running the jobs
+            workers (int): Jobs generated concurrently
+            max_queued (int): Jobs waiting beyond this are rejected with QueueFull
+            max_finished (int): Finished jobs kept for their status, oldest forgotten first
+        """
+        self.generator = generator
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.pending = collections.deque()
+        self.jobs = collections.OrderedDict()
+        self.finished = collections.deque()
+        self.latest = None
+        self.running = 0
+        self.counts = collections.Counter()
+        self.wait_times = collections.deque(maxlen=1000)
+        self.run_times = collections.deque(maxlen=1000)
+        for i in range(workers):
+            threading.Thread(target=self.worker, name=f"generation-worker-{i}", daemon=True).start()
+
+    def submit(self, history: list, model: str = None) -> Job:
+        """
+        Queue a generation.
+        Returns:
+            Job: The new job
+        Raises:
+            QueueFull: max_queued jobs are already waiting
+        """
+        with self.lock:
+            if len(self.pending) >= self.max_queued:
+                self.counts["rejected"] += 1
+                raise QueueFull(f"Generation queue is full ({self.max_queued} jobs waiting)")
+            job = Job(history, model)
+            self.pending.append(job)
+            self.jobs[job.id] = job
+            self.latest = job
+            self.counts["submitted"] += 1
+            self.available.notify()
+        return job
+
+    def submit_many(self, histories: list, model: str = None) -> list:
+        """
+        Queue several generations at once, all or none.
+        Returns:
+            list: The new jobs
+        Raises:
+            QueueFull: the queue has no room for all of them
+        """
+        with self.lock:
+            if len(self.pending) + len(histories) > self.max_queued:
+                self.counts["rejected"] += len(histories)
+                raise QueueFull(f"Generation queue has room for {self.max_queued - len(self.pending)} jobs, {len(histories)} submitted")
+            jobs = [Job(history, model) for history in histories]
+            for job in jobs:
+                self.pending.append(job)
+                self.jobs[job.id] = job
+            if jobs:
+                self.latest = jobs[-1]
+            self.counts["submitted"] += len(jobs)
+            self.available.notify_all()
+        return jobs
+
+    def get(self, job_id: str = None) -> Job:
+        """
+        Returns:
+            Job: The job, the latest submitted one if job_id is None, None if unknown
+        """
+        with self.lock:
+            return self.latest if job_id is None else self.jobs.get(job_id)
+
+    def position(self, job: Job) -> int:
+        """
+        Returns:
+            int: Jobs ahead of this one in the queue, -1 if it is not queued
+        """
+        with self.lock:
+            return self.pending.index(job) if job.status == "queued" else -1
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job, a running job stops at its next token.
+        Returns:
+            bool: False if the job is unknown or already finished
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return False
+            job.state.cancel()
+            if job.status == "queued":
+                self.pending.remove(job)
+                self.complete(job)
+                job.state.finish("Generation cancelled")
+        return True
+
+    def complete(self, job: Job) -> None:
+        """Record the end of a job, the lock must be held."""
+        job.finished_at = time.time()
+        if job.state.cancelled:
+            job.status = "cancelled"
+        elif job.state.error is not None:
+            job.status = "failed"
+        else:
+            job.status = "done"
+        self.counts[job.status] += 1
+        if job.started_at is not None:
+            self.run_times.append(job.finished_at - job.started_at)
+        self.finished.append(job.id)
+        while len(self.finished) > self.max_finished:
+            self.jobs.pop(self.finished.popleft(), None)
+
+    def worker(self) -> None:
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.available.wait()
+                job = self.pending.popleft()
+                job.status = "running"
+                job.started_at = time.time()
+                self.wait_times.append(job.started_at - job.submitted_at)
+                self.running += 1
+            self.generator.run(job.history, job.state, job.model)
+            with self.lock:
+                self.running -= 1
+                self.complete(job)
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: queue depth, running jobs, job counts by outcome, queue wait / run time percentiles in seconds
+                  and the generator throughput
+        """
+        generator_stats = self.generator.stats()
+        with self.lock:
+            wait_times, run_times = list(self.wait_times), list(self.run_times)
+            oldest = self.pending[0].submitted_at if self.pending else None
+            return {
+                "queued": len(self.pending),
+                "running": self.running,
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "oldest_wait_s": time.time() - oldest if oldest is not None else 0.0,
+                "jobs": dict(self.counts),
+                "wait_s": {
+                    "mean": sum(wait_times) / max(len(wait_times), 1),
+                    "p50": percentile(wait_times, 50),
+                    "p95": percentile(wait_times, 95),
+                },
+                "run_s": {
+                    "mean": sum(run_times) / max(len(run_times), 1),
+                    "p95": percentile(run_times, 95),
+                },
+                "generator": generator_stats,
+            }
@@ -0,0 +1,363 @@
+import codecs
+import collections
+import logging
+import threading
+import time
+
+import numpy as np
+
+from .generator import GenerationState
+from .prefix_cache import PrefixMetrics, common_prefix_length
+
+# llama_cpp is imported where it is used, the scheduling and sampling logic loads without it
+
+logger = logging.getLogger(__name__)
+
+def new_context(model, params):
+    import llama_cpp
+    # renamed in recent llama.cpp versions
+    init = getattr(llama_cpp, "llama_init_from_model", None) or llama_cpp.llama_new_context_with_model
+    return init(model, params)
+
+def clear_sequence(ctx, seq_id: int, start: int = 0) -> None:
+    """Drop the KV cache of a sequence from position start, the function was renamed across llama.cpp versions."""
+    import llama_cpp
+    if hasattr(llama_cpp, "llama_memory_seq_rm"):
+        llama_cpp.llama_memory_seq_rm(llama_cpp.llama_get_memory(ctx), seq_id, start, -1)
+    elif hasattr(llama_cpp, "llama_kv_self_seq_rm"):
+        llama_cpp.llama_kv_self_seq_rm(ctx, seq_id, start, -1)
+    else:
+        llama_cpp.llama_kv_cache_seq_rm(ctx, seq_id, start, -1)
+
+def sample(logits: np.ndarray, temperature: float, top_k: int, top_p: float, rng: np.random.Generator) -> int:
+    """Top-k, then top-p sampling at a temperature, greedy when temperature is 0."""
+    if temperature <= 0:
+        return int(np.argmax(logits))
+    top_k = min(top_k, len(logits))
+    top = np.argpartition(-logits, top_k - 1)[:top_k]
+    scaled = logits[top] / temperature
+    probs = np.exp(scaled - scaled.max())
+    probs /= probs.sum()
+    order = np.argsort(-probs)
+    keep = order[:np.searchsorted(np.cumsum(probs[order]), top_p) + 1]
+    return int(top[rng.choice(keep, p=probs[keep] / probs[keep].sum())])
+
+class Sequence:
+    """A generation in the batch: its tokens (prompt, then decoded ones), KV cache sequence and output state."""
+    def __init__(self, tokens: list, stops: list, state: GenerationState):
+        self.tokens = list(tokens)
+        self.stops = stops
+        self.state = state
+        self.seq_id = None
+        # prompt tokens already in the KV cache, then position of the next token
+        self.n_past = 0
+        self.last_token = None
+        self.generated = 0
+        # keeps the bytes of a utf-8 character split across tokens until it is complete
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        # text held back while it may start a stop string
+        self.tail = ""
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def prefilling(self) -> bool:
+        return self.n_past < len(self.tokens)
+
+class BatchDecoder:
+    """
+    BatchDecoder interleaves the decoding of several generations on one llama.cpp context (continuous batching).
+    Each sequence owns a slot of the KV cache; every step decodes one token of each running sequence
+    and a chunk of the prompts of new ones in a single llama_decode call, so sequences join and leave
+    the batch between any two tokens instead of waiting for the whole batch to end.
+    A finished sequence leaves its tokens in its slot: a new prompt goes to the free slot sharing its longest
+    prefix (the same agent and session), only the tokens after that prefix are prefilled.
+    """
+    def __init__(self, llm, slots: int = 4, n_ctx: int = 4096, n_batch: int = 512,
+                 temperature: float = 0.2, top_k: int = 40, top_p: float = 0.95):
+        """
+        Args:
+            llm (Llama): Loaded model, its tokenizer and chat template are used
+            slots (int): Sequences decoded together
+            n_ctx (int): Context length of each sequence
+            n_batch (int): Tokens per llama_decode call, prompts are prefilled in chunks of this size
+            temperature, top_k, top_p: Sampling parameters, defaults of create_chat_completion
+        """
+        self.llm = llm
+        self.slots = slots
+        self.n_ctx = n_ctx
+        self.n_batch = max(n_batch, slots)
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self.rng = np.random.default_rng()
+        self.n_vocab = llm.n_vocab()
+        self.formatter = self.chat_formatter()
+        self.stops, self.eog = self.end_of_generation()
+
+        import llama_cpp
+        params = llama_cpp.llama_context_default_params()
+        params.n_ctx = n_ctx * slots
+        params.n_batch = self.n_batch
+        params.n_ubatch = self.n_batch
+        params.n_seq_max = slots
+        params.n_threads = llm.context_params.n_threads
+        params.n_threads_batch = llm.context_params.n_threads_batch
+        self.ctx = new_context(llm.model, params)
+        if self.ctx is None:
+            raise Exception("Failed to create the llama.cpp batch context")
+        self.batch = llama_cpp.llama_batch_init(self.n_batch, 0, slots)
+        self.init_scheduler()
+        threading.Thread(target=self.loop, name="llamacpp-batch", daemon=True).start()
+
+    def init_scheduler(self) -> None:
+        """Create the queues, slots and counters."""
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.waiting = collections.deque()
+        self.running = []
+        self.free_slots = list(range(self.slots))
+        # tokens in the KV cache of each free slot
+        self.slot_tokens = {slot: [] for slot in range(self.slots)}
+        self.metrics = PrefixMetrics()
+        self.steps = 0
+        self.decoded_tokens = 0
+        self.generated_tokens = 0
+        self.decode_time = 0.0
+
+    def chat_formatter(self):
+        from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+        template = self.llm.metadata.get("tokenizer.chat_template")
+        if template is None:
+            raise Exception("Batched generation needs a chat template in the model metadata")
+        return Jinja2ChatFormatter(
+            template=template,
+            eos_token=self.llm.detokenize([self.llm.token_eos()]).decode("utf-8", errors="ignore"),
+            bos_token=self.llm.detokenize([self.llm.token_bos()]).decode("utf-8", errors="ignore"),
+        )
+
+    def end_of_generation(self) -> tuple:
+        """
+        Returns:
+            tuple: (stop strings of the chat template, end of generation token ids)
+        """
+        prompt = self.formatter(messages=[{"role": "user", "content": ""}])
+        stops = [prompt.stop] if isinstance(prompt.stop, str) else list(prompt.stop or [])
+        eog = {self.llm.token_eos()}
+        for stop in stops:
+            # end of turn markers are single special tokens
+            stop_tokens = self.llm.tokenize(stop.encode("utf-8"), add_bos=False, special=True)
+            if len(stop_tokens) == 1:
+                eog.add(stop_tokens[0])
+        return stops, frozenset(eog)
+
+    def submit(self, history: list, state: GenerationState) -> Sequence:
+        """
+        Queue a generation, it joins the batch at the next step with a free slot.
+        Returns:
+            Sequence: done is set when the generation ends
+        """
+        prompt = self.formatter(messages=history)
+        tokens = self.llm.tokenize(prompt.prompt.encode("utf-8"),
+                                   add_bos=not getattr(prompt, "added_special", False), special=True)
+        sequence = Sequence(tokens, self.stops, state)
+        if len(tokens) >= self.n_ctx:
+            sequence.error = f"Prompt of {len(tokens)} tokens exceeds the context of {self.n_ctx}"
+            sequence.done.set()
+            return sequence
+        with self.lock:
+            self.waiting.append(sequence)
+            self.available.notify()
+        return sequence
+
+    def add_token(self, token: int, pos: int, seq_id: int, logits: bool) -> int:
+        i = self.batch.n_tokens
+        self.batch.token[i] = token
+        self.batch.pos[i] = pos
+        self.batch.n_seq_id[i] = 1
+        self.batch.seq_id[i][0] = seq_id
+        self.batch.logits[i] = logits
+        self.batch.n_tokens += 1
+        return i
+
+    def fill_batch(self) -> dict:
+        """
+        Put one token of each running sequence in the batch, then prompt chunks of new ones.
+        Returns:
+            dict: sequence -> batch row of its logits, for sequences sampling a token this step
+        """
+        self.batch.n_tokens = 0
+        rows = {}
+        for sequence in self.running:
+            if not sequence.prefilling:
+                rows[sequence] = self.add_token(sequence.last_token, sequence.n_past, sequence.seq_id, True)
+                sequence.tokens.append(sequence.last_token)
+                sequence.n_past += 1
+        for sequence in self.running:
+            if not sequence.prefilling:
+                continue
+            capacity = self.n_batch - self.batch.n_tokens
+            if capacity <= 0:
+                break
+            end = min(len(sequence.tokens), sequence.n_past + capacity)
+            for pos in range(sequence.n_past, end):
+                row = self.add_token(sequence.tokens[pos], pos, sequence.seq_id, pos == len(sequence.tokens) - 1)
+            sequence.n_past = end
+            if not sequence.prefilling:
+                rows[sequence] = row
+        return rows
+
+    def emit(self, sequence: Sequence, token: int) -> bool:
+        """
+        Append the text of a sampled token to the sequence state.
+        Returns:
+            bool: True if the sequence is over (end of generation token, stop string or full context)
+        """
+        sequence.generated += 1
+        if token in self.eog:
+            return True
+        sequence.tail += sequence.decoder.decode(self.llm.detokenize([token]))
+        for stop in sequence.stops:
+            index = sequence.tail.find(stop)
+            if index >= 0:
+                sequence.state.append(sequence.tail[:index])
+                sequence.tail = ""
+                return True
+        # hold back what could be the start of a stop string
+        hold = max((len(stop) - 1 for stop in sequence.stops), default=0)
+        if len(sequence.tail) > hold:
+            cut = len(sequence.tail) - hold
+            sequence.state.append(sequence.tail[:cut])
+            sequence.tail = sequence.tail[cut:]
+        return sequence.n_past >= self.n_ctx
+
+    def retire(self, sequence: Sequence, error: str = None) -> None:
+        """Remove a sequence from the batch and free its slot, the lock must be held."""
+        sequence.error = error
+        self.running.remove(sequence)
+        self.free_slots.append(sequence.seq_id)
+        try:
+            if error is None:
+                sequence.tail += sequence.decoder.decode(b"", final=True)
+                if sequence.tail and not sequence.state.cancelled:
+                    sequence.state.append(sequence.tail)
+                # kept for the next prompt sharing this prefix
+                self.slot_tokens[sequence.seq_id] = sequence.tokens[:sequence.n_past]
+            else:
+                self.slot_tokens[sequence.seq_id] = []
+                self.clear(sequence.seq_id)
+        finally:
+            sequence.done.set()
+
+    def admit(self, sequence: Sequence) -> None:
+        """Give a sequence the free slot sharing the longest prefix with its prompt, the lock must be held."""
+        prefixes = {slot: common_prefix_length(self.slot_tokens[slot], sequence.tokens) for slot in self.free_slots}
+        slot = max(self.free_slots, key=lambda slot: prefixes[slot])
+        self.free_slots.remove(slot)
+        # the last prompt token is decoded again for its logits
+        prefix = min(prefixes[slot], len(sequence.tokens) - 1)
+        self.clear(slot, prefix)
+        self.slot_tokens[slot] = []
+        self.metrics.record(len(sequence.tokens), prefix)
+        sequence.seq_id = slot
+        sequence.n_past = prefix
+        self.running.append(sequence)
+
+    def clear(self, seq_id: int, start: int = 0) -> None:
+        clear_sequence(self.ctx, seq_id, start)
+
+    def schedule(self) -> dict:
+        """
+        Drop cancelled sequences, running or waiting, admit waiting ones into free slots and fill the batch.
+        The lock must be held.
+        Returns:
+            dict: sequence -> batch row of its logits, see fill_batch
+        """
+        for sequence in [sequence for sequence in self.running if sequence.state.cancelled]:
+            self.retire(sequence)
+        cancelled = [sequence for sequence in self.waiting if sequence.state.cancelled]
+        for sequence in cancelled:
+            # never admitted, nothing to free
+            self.waiting.remove(sequence)
+            sequence.done.set()
+        while self.waiting and self.free_slots:
+            self.admit(self.waiting.popleft())
+        return self.fill_batch() if self.running else {}
+
+    def decode(self) -> int:
+        """
+        Returns:
+            int: status of llama_decode on the batch, 0 on success
+        """
+        import llama_cpp
+        return llama_cpp.llama_decode(self.ctx, self.batch)
+
+    def logits(self, row: int) -> np.ndarray:
+        import llama_cpp
+        return np.ctypeslib.as_array(llama_cpp.llama_get_logits_ith(self.ctx, row), shape=(self.n_vocab,))
+
+    def fail(self, error: str) -> None:
+        """End every running and waiting sequence with an error, the lock must be held."""
+        for sequence in list(self.running):
+            try:
+                self.retire(sequence, error)
+            except Exception as e:
+                # its slot is freed and done set before the KV cache is cleared
+                logger.error(f"Error: failed to clear sequence {sequence.seq_id}: {e}")
+        while self.waiting:
+            sequence = self.waiting.popleft()
+            sequence.error = error
+            sequence.done.set()
+
+    def step(self) -> None:
+        with self.lock:
+            rows = self.schedule()
+            if not self.running:
+                self.available.wait()
+                return
+        start_time = time.perf_counter()
+        status = self.decode()
+        with self.lock:
+            self.decode_time += time.perf_counter() - start_time
+            self.steps += 1
+            self.decoded_tokens += self.batch.n_tokens
+            if status != 0:
+                for sequence in list(self.running):
+                    self.retire(sequence, f"llama_decode failed with status {status}")
+                return
+            for sequence, row in rows.items():
+                token = sample(self.logits(row), self.temperature, self.top_k, self.top_p, self.rng)
+                sequence.last_token = token
+                self.generated_tokens += 1
+                if self.emit(sequence, token):
+                    self.retire(sequence)
+
+    def safe_step(self) -> None:
+        """Run a step, an error ends the sequences of the batch instead of the decode thread."""
+        try:
+            self.step()
+        except Exception as e:
+            logger.error(f"Error: batched decoding failed: {e}")
+            with self.lock:
+                self.fail(str(e))
+
+    def loop(self) -> None:
+        while True:
+            self.safe_step()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: decode steps, mean sequences per step, generated tokens and tokens/s of llama_decode time
+        """
+        with self.lock:
+            return {
+                "slots": self.slots,
+                "running": len(self.running),
+                "waiting": len(self.waiting),
+                "steps": self.steps,
+                "mean_batch_tokens": self.decoded_tokens / max(self.steps, 1),
+                "generated_tokens": self.generated_tokens,
+                "decode_s": self.decode_time,
+                "decode_tokens_per_s": self.generated_tokens / self.decode_time if self.decode_time > 0 else 0.0,
+            }
@@ -1,38 +1,90 @@
-
+import threading
 from .generator import GeneratorLLM
-from llama_cpp import Llama
+from .prefix_cache import SessionPrefixCache, session_key
 
 class LlamacppLLM(GeneratorLLM):
 
-    def __init__(self):
+    def __init__(self, batch_slots: int = 1, n_ctx: int = 4096, prefix_cache_mb: int = 2048):
         """
         Handle generation using llama.cpp
+        Args:
+            batch_slots (int): Generations decoded together (continuous batching), 1 for one generation at a time
+            n_ctx (int): Context length of each generation
+            prefix_cache_mb (int): Memory of the KV cache states saved per session for prompt prefix reuse, 0 to disable
         """
         super().__init__()
         self.llm = None
-    
-    def generate(self, history):
-        if self.llm is None:
-            self.logger.info(f"Loading {self.model}...")
-            self.llm = Llama.from_pretrained(
-                repo_id=self.model,
-                filename="*Q8_0.gguf",
-                n_ctx=4096,
-                verbose=True
-            )
-        self.logger.info(f"Using {self.model} for generation with Llama.cpp")
-        try:
-            with self.state.lock:
-                self.state.is_generating = True
-                self.state.last_complete_sentence = ""
-                self.state.current_buffer = ""
-            output = self.llm.create_chat_completion(
-                  messages = history
+        self.loaded_model = None
+        self.batch_slots = batch_slots
+        self.n_ctx = n_ctx
+        self.prefix_cache_mb = prefix_cache_mb
+        self.batcher = None
+        self.cache = None
+        # a Llama context decodes one sequence at a time, concurrent jobs take turns
+        self.lock = threading.Lock()
+
+    def load(self, model: str) -> None:
+        """
+        Load the model on first use, the lock must be held.
+        The server serves one model: the prefix cache and the batch decoder hold KV cache states of that model.
+        Raises:
+            Exception: model is not the loaded model
+        """
+        if self.llm is not None:
+            if model != self.loaded_model:
+                raise Exception(f"llama.cpp serves {self.loaded_model}, restart the server to use {model}")
+            return
+        from llama_cpp import Llama
+        self.logger.info(f"Loading {model}...")
+        self.llm = Llama.from_pretrained(
+            repo_id=model,
+            filename="*Q8_0.gguf",
+            # in batched mode generations run on the context of the BatchDecoder
+            n_ctx=self.n_ctx if self.batch_slots == 1 else 512,
+            verbose=True
+        )
+        self.loaded_model = model
+        if self.batch_slots > 1:
+            from .llamacpp_batch import BatchDecoder
+            self.batcher = BatchDecoder(self.llm, slots=self.batch_slots, n_ctx=self.n_ctx)
+        elif self.prefix_cache_mb > 0:
+            self.cache = SessionPrefixCache(self.llm, capacity_bytes=self.prefix_cache_mb * 1024 * 1024)
+            self.llm.set_cache(self.cache)
+
+    def generate(self, history, state, model):
+        if self.batch_slots > 1:
+            with self.lock:
+                self.load(model)
+            self.logger.info(f"Using {model} for batched generation with Llama.cpp")
+            sequence = self.batcher.submit(history, state)
+            sequence.done.wait()
+            if sequence.error is not None:
+                raise Exception(sequence.error)
+            return sequence.generated
+        with self.lock:
+            self.load(model)
+            self.logger.info(f"Using {model} for generation with Llama.cpp")
+            if self.cache is not None:
+                self.cache.begin(session_key(history))
+            stream = self.llm.create_chat_completion(
+                  messages = history,
+                  stream = True
             )
-            with self.state.lock:
-                self.state.current_buffer = output['choices'][0]['message']['content']
-        except Exception as e:
-            self.logger.error(f"Error: {e}")
-        finally:
-            with self.state.lock:
-                self.state.is_generating = False
\ No newline at end of file
+            tokens = 0
+            for chunk in stream:
+                if state.cancelled:
+                    break
+                content = chunk['choices'][0]['delta'].get('content')
+                if content:
+                    tokens += 1
+                    state.append(content)
+            return tokens
+
+    def stats(self) -> dict:
+        stats = {**super().stats(), "mode": "batched" if self.batch_slots > 1 else "single"}
+        if self.batcher is not None:
+            stats["batch"] = self.batcher.stats()
+            stats["prefix_cache"] = self.batcher.metrics.stats()
+        if self.cache is not None:
+            stats["prefix_cache"] = self.cache.stats()
+        return stats
@@ -1,6 +1,5 @@
-
-import time
-from .generator import GeneratorLLM
+import threading
+from .generator import GeneratorLLM, GenerationState
 import ollama
 
 class OllamaLLM(GeneratorLLM):
@@ -11,38 +10,33 @@ class OllamaLLM(GeneratorLLM):
         """
         super().__init__()
 
-    def generate(self, history):
-        self.logger.info(f"Using {self.model} for generation with Ollama")
+    def generate(self, history, state, model):
+        self.logger.info(f"Using {model} for generation with Ollama")
+        tokens = None
         try:
-            with self.state.lock:
-                self.state.is_generating = True
-                self.state.last_complete_sentence = ""
-                self.state.current_buffer = ""
-
             stream = ollama.chat(
-                model=self.model,
+                model=model,
                 messages=history,
                 stream=True,
             )
 
             for chunk in stream:
+                if state.cancelled:
+                    break
                 content = chunk['message']['content']
                 if '\n' in content:
                     self.logger.info(content)
-
-                with self.state.lock:
-                    self.state.current_buffer += content
+                state.append(content)
+                if chunk.get('done'):
+                    tokens = chunk.get('eval_count')
+            return tokens
         except Exception as e:
             if "404" in str(e):
-                self.logger.info(f"Downloading {self.model}...")
-                ollama.pull(self.model)
+                self.logger.info(f"Downloading {model}...")
+                ollama.pull(model)
             if "refused" in str(e).lower():
                 raise Exception("Ollama connection failed. is the server running ?") from e
             raise e
-        finally:
-            self.logger.info("Generation complete")
-            with self.state.lock:
-                self.state.is_generating = False
 
 if __name__ == "__main__":
     generator = OllamaLLM()
@@ -53,7 +47,8 @@ if __name__ == "__main__":
         }
     ]
     generator.set_model("deepseek-r1:1.5b")
-    generator.start(history)
-    while True:
-        print(generator.get_status())
-        time.sleep(1)
\ No newline at end of file
+    state = GenerationState()
+    state.is_generating = True
+    threading.Thread(target=generator.run, args=(history, state)).start()
+    for delta in state.stream():
+        print(delta, end="", flush=True)
\ No newline at end of file
@@ -0,0 +1,119 @@
+import collections
+import hashlib
+import threading
+
+def common_prefix_length(a, b) -> int:
+    """Number of leading tokens two token sequences share."""
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+def session_key(history: list) -> str:
+    """
+    Identify the conversation of a request: the system prompt names the agent, the first user message the session.
+    """
+    head = "\x00".join(f"{message['role']}:{message['content']}" for message in history[:2])
+    return hashlib.sha1(head.encode("utf-8")).hexdigest()
+
+class PrefixMetrics:
+    """Prefix reuse counters, shared by the single-stream cache and the batch decoder."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.prompt_tokens = 0
+        self.saved_tokens = 0
+
+    def record(self, prompt_tokens: int, saved_tokens: int) -> None:
+        with self.lock:
+            if saved_tokens > 0:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.prompt_tokens += prompt_tokens
+            self.saved_tokens += saved_tokens
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "prompt_tokens": self.prompt_tokens,
+                "saved_tokens": self.saved_tokens,
+                "prefilled_tokens": self.prompt_tokens - self.saved_tokens,
+            }
+
+class SessionPrefixCache:
+    """
+    SessionPrefixCache keeps the llama.cpp state (KV cache) of the last turn of each session, in an LRU bounded by bytes.
+    Llama looks the prompt up before each completion: the state sharing the longest token prefix with it is
+    loaded if it beats what is already in the context, and only the remaining tokens are prefilled.
+    One state per session, the next turn of a session extends the previous one so the latest is always the longest prefix.
+    It implements the interface of llama_cpp's BaseLlamaCache, which Llama uses through Llama.set_cache.
+    """
+    def __init__(self, llm, capacity_bytes: int = 2 << 30):
+        """
+        Args:
+            llm (Llama): The model, its context is compared to the prompt for the metrics
+            capacity_bytes (int): Saved states beyond this size are evicted, least recently used first
+        """
+        self.capacity_bytes = capacity_bytes
+        self.llm = llm
+        self.lock = threading.Lock()
+        # session -> (tokens, LlamaState)
+        self.states = collections.OrderedDict()
+        self.session = None
+        self.metrics = PrefixMetrics()
+
+    def begin(self, session: str) -> None:
+        """Set the session of the next completion, its state is saved under this key."""
+        self.session = session
+
+    @property
+    def cache_size(self) -> int:
+        return sum(state.llama_state_size for _, state in self.states.values())
+
+    def _find_longest_prefix_key(self, key):
+        """
+        Returns:
+            tuple: (session, prefix length) of the saved state sharing the longest prefix with key, (None, 0) if none
+        """
+        best, best_length = None, 0
+        for session, (tokens, _) in self.states.items():
+            length = common_prefix_length(tokens, key)
+            if length > best_length:
+                best, best_length = session, length
+        return best, best_length
+
+    def __getitem__(self, key):
+        key = tuple(key)
+        live_length = common_prefix_length(tuple(self.llm.input_ids[:self.llm.n_tokens].tolist()), key)
+        with self.lock:
+            session, length = self._find_longest_prefix_key(key)
+            # Llama only loads the saved state if it beats the tokens already in the context
+            self.metrics.record(len(key), max(length, live_length))
+            if session is None:
+                raise KeyError("No saved state shares a prefix with the prompt")
+            self.states.move_to_end(session)
+            return self.states[session][1]
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return self._find_longest_prefix_key(tuple(key))[0] is not None
+
+    def __setitem__(self, key, value) -> None:
+        with self.lock:
+            session = self.session if self.session is not None else tuple(key)
+            self.states[session] = (tuple(key), value)
+            self.states.move_to_end(session)
+            while len(self.states) > 1 and self.cache_size > self.capacity_bytes:
+                self.states.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.metrics.stats(), "sessions": len(self.states), "bytes": self.cache_size}
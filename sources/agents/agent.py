@@ -162,7 +162,7 @@ class Agent():
         """
         Ask the LLM to process the prompt and return the answer and the reasoning.
         """
-        memory = self.memory.get()
+        memory = self.memory.get_context(self.llm.model)
         # pretty_print(type(memory))
         # pretty_print(memory)
         thought = self.llm.respond(memory, self.verbose)
@@ -0,0 +1,192 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List
+
+from sources.utility import pretty_print
+
+# rough token split used when no tokenizer is available for the model
+APPROX_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+# chat template overhead of a message (role and separators)
+MESSAGE_OVERHEAD = 4
+# tokens of the last message kept when the system prompt alone fills the budget
+MIN_LAST_MESSAGE_TOKENS = 64
+
+tokenizers = {}
+tokenizers_lock = threading.Lock()
+
+def get_tokenizer(model: str):
+    """
+    Get the tokenizer of a model, loaded once per process.
+    Only huggingface model ids (org/name) have a tokenizer, token counts of other models are approximated.
+    Args:
+        model (str): The model name
+    Returns:
+        The tokenizer or None
+    """
+    with tokenizers_lock:
+        if model in tokenizers:
+            return tokenizers[model]
+        tokenizer = None
+        if model and "/" in model:
+            try:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(model)
+            except Exception as e:
+                pretty_print(f"No tokenizer found for {model}, token counts are approximated: {str(e)}", color="warning")
+        tokenizers[model] = tokenizer
+        return tokenizer
+
+class TokenCounter:
+    """
+    TokenCounter counts the tokens of messages for a model, remembering the count of recently seen texts.
+    """
+    def __init__(self, model: str = None, cache_size: int = 4096):
+        """
+        Args:
+            model (str): Model whose tokenizer is used, None approximates the counts.
+            cache_size (int): Number of text counts remembered.
+        """
+        self.model = model
+        self.tokenizer = get_tokenizer(model) if model else None
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def count(self, text: str) -> int:
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if self.tokenizer is not None:
+            tokens = len(self.tokenizer.encode(text, add_special_tokens=False))
+        else:
+            tokens = len(APPROX_TOKEN_PATTERN.findall(text))
+        self.cache[key] = tokens
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return tokens
+
+    def count_message(self, message: dict) -> int:
+        return self.count(message['content']) + MESSAGE_OVERHEAD
+
+    def count_messages(self, messages: List[dict]) -> int:
+        return sum(self.count_message(message) for message in messages)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cut the middle of a text so it fits in max_tokens, the beginning and the end are kept.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        marker = "\n[...]\n"
+        if self.tokenizer is not None:
+            ids = self.tokenizer.encode(text, add_special_tokens=False)
+            half = max(max_tokens - self.count(marker), 2) // 2
+            return self.tokenizer.decode(ids[:half]) + marker + self.tokenizer.decode(ids[-half:])
+        spans = [match.span() for match in APPROX_TOKEN_PATTERN.finditer(text)]
+        half = max(max_tokens - self.count(marker), 2) // 2
+        return text[:spans[half - 1][1]] + marker + text[spans[-half][0]:]
+
+class ContextBuilder:
+    """
+    ContextBuilder fits a conversation into a token budget before it is sent to the LLM.
+    The system prompt and the most recent messages are kept verbatim, older messages are rolled
+    into hierarchical summaries: chunks of messages are summarized, then chunks of summaries, until they fit.
+    """
+    def __init__(self, max_tokens: int,
+                 recent_messages: int = 6,
+                 chunk_size: int = 4,
+                 summarize: Callable[[str], str] = None,
+                 model: str = None):
+        """
+        Args:
+            max_tokens (int): Token budget of the context.
+            recent_messages (int): Maximum number of recent messages kept verbatim.
+            chunk_size (int): Number of messages (or summaries) rolled into one summary.
+            summarize (Callable): Function summarizing a text, None drops the older messages instead.
+            model (str): Model whose tokenizer counts the tokens.
+        """
+        self.max_tokens = max_tokens
+        self.recent_messages = recent_messages
+        self.chunk_size = max(chunk_size, 2)
+        self.summarize = summarize
+        self.counter = TokenCounter(model)
+        self.stats = {"requests": 0, "tokens_in": 0, "tokens_out": 0, "tokens_saved": 0}
+
+    def build(self, messages: List[dict]) -> List[dict]:
+        """
+        Assemble the context of a request.
+        Args:
+            messages (list): The full conversation, system prompt first
+        Returns:
+            list: Messages fitting in the token budget
+        """
+        tokens_in = self.counter.count_messages(messages)
+        context = messages
+        if tokens_in > self.max_tokens:
+            context = self.fit(messages)
+        tokens_out = self.counter.count_messages(context)
+        self.stats["requests"] += 1
+        self.stats["tokens_in"] += tokens_in
+        self.stats["tokens_out"] += tokens_out
+        self.stats["tokens_saved"] += tokens_in - tokens_out
+        if tokens_out < tokens_in:
+            pretty_print(f"Context: {tokens_out}/{self.max_tokens} tokens, {tokens_in - tokens_out} tokens saved", color="status")
+        return context
+
+    def fit(self, messages: List[dict]) -> List[dict]:
+        head = [messages[0]] if messages and messages[0]['role'] == 'system' else []
+        body = messages[len(head):]
+        budget = self.max_tokens - self.counter.count_messages(head)
+        recent, used = [], 0
+        for message in reversed(body):
+            # the last message (the current query) is always kept, even with recent_messages = 0
+            if recent and len(recent) >= self.recent_messages:
+                break
+            tokens = self.counter.count_message(message)
+            if recent and used + tokens > budget:
+                break
+            recent.insert(0, message)
+            used += tokens
+        if recent and used > budget:
+            # the last message alone is over budget (page dumps), keep its beginning and end,
+            # some of it even when the system prompt leaves no room
+            content = self.counter.truncate(recent[0]['content'], max(budget - MESSAGE_OVERHEAD, MIN_LAST_MESSAGE_TOKENS))
+            recent = [{**recent[0], 'content': content}]
+            used = self.counter.count_messages(recent)
+        older = body[:len(body) - len(recent)]
+        summary = self.summarize_history(older, budget - used - MESSAGE_OVERHEAD)
+        if summary:
+            head = head + [{'role': 'system', 'content': summary}]
+        return head + recent
+
+    def summarize_history(self, messages: List[dict], max_tokens: int) -> str:
+        """
+        Roll older messages into summaries fitting in max_tokens.
+        Returns:
+            str: The summary, empty if nothing fits
+        """
+        if not messages or max_tokens <= 0:
+            return ""
+        header = "Summary of the earlier conversation:\n"
+        max_tokens -= self.counter.count(header)
+        texts = [f"{message['role']}: {message['content']}" for message in messages]
+        if self.summarize is not None:
+            texts = [self.summarize("\n".join(texts[i:i+self.chunk_size]))
+                     for i in range(0, len(texts), self.chunk_size)]
+            while len(texts) > 1 and self.counter.count("\n".join(texts)) > max_tokens:
+                texts = [self.summarize("\n".join(texts[i:i+self.chunk_size]))
+                         for i in range(0, len(texts), self.chunk_size)]
+        # without summarizer, or if the last level is still too long, the oldest content is cut first
+        text = "\n".join(texts)
+        while self.counter.count(text) > max_tokens and len(texts) > 1:
+            texts.pop(0)
+            text = "\n".join(texts)
+        text = self.counter.truncate(text, max_tokens)
+        return header + text if text else ""
+
+    def report(self) -> dict:
+        return dict(self.stats)
@@ -0,0 +1,81 @@
+import threading
+from collections import defaultdict
+
+class ConversationLog:
+    """
+    ConversationLog is the append-only store of every message of the process.
+    Agent memories are views over it: lists of entry indices, so a message handed over
+    to another agent is referenced, never copied. Entries are never modified in place,
+    a compressed message is swapped for a new entry dict, and every view holding it is notified.
+    """
+    def __init__(self):
+        self.entries = []
+        self.lock = threading.Lock()
+        # entry index -> callbacks(index, content) of the views holding it
+        self.watchers = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, role: str, content: str) -> int:
+        """
+        Returns:
+            int: Index of the new entry
+        """
+        with self.lock:
+            self.entries.append({'role': role, 'content': content})
+            return len(self.entries) - 1
+
+    def extend(self, messages: list) -> list:
+        """
+        Returns:
+            list: Indices of the new entries
+        """
+        with self.lock:
+            start = len(self.entries)
+            self.entries.extend({'role': message['role'], 'content': message['content']} for message in messages)
+            return list(range(start, len(self.entries)))
+
+    def get(self, index: int) -> dict:
+        return self.entries[index]
+
+    def select(self, indices: list) -> list:
+        """Get the entries at the given indices, shared and never modified, callers must not mutate them."""
+        with self.lock:
+            return [self.entries[index] for index in indices]
+
+    def replace(self, index: int, content: str, expected: str = None) -> bool:
+        """
+        Swap the content of an entry.
+        Args:
+            index (int): The entry
+            content (str): The new content
+            expected (str): Only swap if the entry still holds this content
+        Returns:
+            bool: True if the entry was swapped
+        """
+        with self.lock:
+            entry = self.entries[index]
+            if expected is not None and entry['content'] != expected:
+                return False
+            self.entries[index] = {**entry, 'content': content}
+            return True
+
+    def watch(self, index: int, callback) -> None:
+        """Call callback(index, content) when the entry is replaced."""
+        with self.lock:
+            self.watchers[index].append(callback)
+
+    def notify(self, index: int) -> None:
+        """
+        Tell the views holding an entry that it was replaced.
+        Called by the replacer once it released its own lock, callbacks take the lock of their view.
+        """
+        with self.lock:
+            callbacks = list(self.watchers.get(index, ()))
+            content = self.entries[index]['content']
+        for callback in callbacks:
+            callback(index, content)
+
+# the conversation log shared by every agent of the process
+conversation_log = ConversationLog()
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    agent_type TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, agent_type, position);
+CREATE INDEX IF NOT EXISTS idx_messages_agent ON messages (agent_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+"""
+
+class ConversationStore:
+    """
+    ConversationStore keeps the conversations of every agent in one SQLite database, one row per message.
+    The database runs in WAL mode so writes are cheap appends and reads never block the writer.
+    """
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the database file, created if needed.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        # memories are written from the agent thread and the compression workers
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def append(self, session_id: str, agent_type: str, position: int, role: str, content: str) -> None:
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO messages (session_id, agent_type, position, role, content, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, agent_type, position, role, content, time.time()))
+
+    def replace(self, session_id: str, agent_type: str, position: int, content: str) -> None:
+        with self.lock:
+            self.connection.execute(
+                "UPDATE messages SET content = ? WHERE session_id = ? AND agent_type = ? AND position = ?",
+                (content, session_id, agent_type, position))
+
+    def reset(self, session_id: str, agent_type: str, messages: list) -> None:
+        """Replace the messages of a session in one transaction."""
+        now = time.time()
+        with self.lock:
+            self.connection.execute("BEGIN")
+            self.connection.execute("DELETE FROM messages WHERE session_id = ? AND agent_type = ?",
+                                    (session_id, agent_type))
+            self.connection.executemany(
+                "INSERT INTO messages (session_id, agent_type, position, role, content, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(session_id, agent_type, position, message['role'], message['content'], now)
+                 for position, message in enumerate(messages)])
+            self.connection.execute("COMMIT")
+
+    def last_session(self, agent_type: str) -> list:
+        """
+        Get the messages of the latest session of an agent.
+        Returns:
+            list: The messages, empty if the agent has no session
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT role, content FROM messages WHERE agent_type = ?1 AND session_id = "
+                "(SELECT session_id FROM messages WHERE agent_type = ?1 ORDER BY timestamp DESC LIMIT 1) "
+                "ORDER BY position", (agent_type,)).fetchall()
+        return [{'role': role, 'content': content} for role, content in rows]
+
+    def history(self, agent_type: str = None, session_id: str = None,
+                since: float = None, contains: str = None, limit: int = 100) -> list:
+        """
+        Query messages across agents and sessions, newest first.
+        Args:
+            agent_type (str): Only messages of this agent
+            session_id (str): Only messages of this session
+            since (float): Only messages written after this unix time
+            contains (str): Only messages containing this text
+            limit (int): Maximum number of messages
+        Returns:
+            list: dicts with session_id, agent_type, position, role, content and timestamp
+        """
+        conditions, parameters = [], []
+        for column, value in [("agent_type", agent_type), ("session_id", session_id)]:
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            parameters.append(since)
+        if contains is not None:
+            conditions.append("instr(content, ?) > 0")
+            parameters.append(contains)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT session_id, agent_type, position, role, content, timestamp FROM messages {where} "
+                f"ORDER BY timestamp DESC, position DESC LIMIT ?", (*parameters, limit)).fetchall()
+        keys = ["session_id", "agent_type", "position", "role", "content", "timestamp"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+class StoreJournal:
+    """
+    StoreJournal records the session of one agent in a ConversationStore,
+    it takes the same events as SessionJournal so Memory can use either backend.
+    """
+    def __init__(self, store: ConversationStore, session_id: str, agent_type: str):
+        self.store = store
+        self.session_id = session_id
+        self.agent_type = agent_type
+
+    def append(self, event: dict) -> None:
+        if event["op"] == "reset":
+            self.store.reset(self.session_id, self.agent_type, event["messages"])
+        elif event["op"] == "push":
+            self.store.append(self.session_id, self.agent_type, event["index"], event["role"], event["content"])
+        elif event["op"] == "replace":
+            self.store.replace(self.session_id, self.agent_type, event["index"], event["content"])
+
+    def sync(self) -> None:
+        # every statement is committed as it runs
+        pass
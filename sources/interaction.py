@@ -1,7 +1,10 @@
+import time
 
 from sources.text_to_speech import Speech
 from sources.utility import pretty_print
 from sources.router import AgentRouter
+from sources.model_tiers import ModelTiers
+from sources.long_term_memory import LongTermMemory
 from sources.speech_to_text import AudioTranscriber, AudioRecorder
 
 class Interaction:
@@ -11,10 +14,21 @@ class Interaction:
     def __init__(self, agents,
                  tts_enabled: bool = True,
                  stt_enabled: bool = True,
-                 recover_last_session: bool = False):
+                 recover_last_session: bool = False,
+                 router_options: dict = None,
+                 tiers: ModelTiers = None,
+                 journal: bool = False,
+                 long_term_options: dict = None):
         self.agents = agents
+        self.tiers = tiers
         self.current_agent = None
-        self.router = AgentRouter(self.agents)
+        self.router = AgentRouter(self.agents, **(router_options or {}))
+        self.long_term = None
+        if long_term_options is not None:
+            # past turns are embedded with the router encoder, already loaded
+            self.long_term = LongTermMemory(self.router.engine.embed,
+                                            self.router.engine.backbone.embedding_dim,
+                                            **long_term_options)
         self.speech = Speech(enable=tts_enabled)
         self.is_active = True
         self.last_query = None
@@ -27,6 +41,10 @@ class Interaction:
             self.recorder = AudioRecorder()
         if recover_last_session:
             self.load_last_session()
+        if journal:
+            # after recovery, so the new journals start from the recovered history
+            for agent in self.agents:
+                agent.memory.open_journal(agent.type)
         if tts_enabled:
             self.speech.speak("Hello, we are online and ready. What can I do for you ?")
     
@@ -98,13 +116,21 @@ class Interaction:
         pretty_print(agent)
         if agent is None:
             return False
-        if self.current_agent != agent and self.last_answer is not None:
-            ## get last history from previous agent
-            self.current_agent.memory.push('user', self.last_query)
-            self.current_agent.memory.push('assistant', self.last_answer)
+        if self.current_agent is not None and self.current_agent != agent and self.last_answer is not None:
+            # hand the last exchange of the previous agent over, by reference to the shared log
+            agent.memory.link(self.current_agent.memory.last_exchange())
         self.current_agent = agent
         tmp = self.last_answer
+        tier = self.tiers.apply(agent, self.router.last_complexity) if self.tiers else None
+        if self.long_term is not None:
+            agent.memory.set_recalled(self.long_term.recall(self.last_query))
+        start_time = time.time()
+        agent.memory.start_turn()
         self.last_answer, _ = agent.process(self.last_query, self.speech)
+        if tier is not None:
+            self.tiers.record(tier, time.time() - start_time)
+        if self.long_term is not None and self.last_answer:
+            self.long_term.remember(agent.type, self.last_query, self.last_answer)
         if self.last_answer == tmp:
             self.last_answer = None
         return True
@@ -0,0 +1,170 @@
+import json
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+
+class KnnHead:
+    """
+    KnnHead is a k-nearest-neighbor routing head over a contiguous matrix of normalized example embeddings.
+    Queries are scored with a single matrix multiply and a partial sort, so latency stays flat
+    from hundreds to tens of thousands of examples. Examples are appended incrementally, and the matrix
+    can be memory-mapped from disk to persist routed queries between sessions.
+    """
+    def __init__(self, dim: int, path: str = None, capacity: int = 1024, temperature: float = 0.05):
+        """
+        Args:
+            dim (int): Embedding dimension.
+            path (str): Path prefix of the memory-mapped store (<path>.npy, <path>.labels.npy, <path>.json),
+                        None keeps the examples in RAM only.
+            capacity (int): Initial number of rows allocated.
+            temperature (float): Softmax temperature applied to neighbor similarities.
+        """
+        self.dim = dim
+        self.path = path
+        self.temperature = temperature
+        self.size = 0
+        self.label_names = []
+        self.label_to_id = {}
+        self.matrix = None
+        self.label_ids = None
+        if path is not None and os.path.exists(self.metadata_path):
+            self.load()
+        else:
+            self.allocate(capacity)
+
+    @property
+    def matrix_path(self) -> str:
+        return f"{self.path}.npy"
+
+    @property
+    def label_ids_path(self) -> str:
+        return f"{self.path}.labels.npy"
+
+    @property
+    def metadata_path(self) -> str:
+        return f"{self.path}.json"
+
+    @property
+    def capacity(self) -> int:
+        return self.matrix.shape[0]
+
+    def allocate(self, capacity: int) -> None:
+        """Allocate (or grow to) a matrix of the given capacity, keeping the current examples."""
+        old_matrix, old_ids = self.matrix, self.label_ids
+        label_ids = np.zeros(capacity, dtype=np.int32)
+        if self.path is None:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        else:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp.npy"
+            matrix = open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        if old_matrix is not None:
+            matrix[:self.size] = old_matrix[:self.size]
+            label_ids[:self.size] = old_ids[:self.size]
+        if self.path is not None:
+            matrix.flush()
+            del matrix, old_matrix
+            self.matrix = None
+            os.replace(tmp_path, self.matrix_path)
+            matrix = open_memmap(self.matrix_path, mode="r+")
+        self.matrix = matrix
+        self.label_ids = label_ids
+
+    def add(self, embeddings: np.ndarray, labels: list) -> None:
+        """
+        Append examples.
+        Args:
+            embeddings (np.ndarray): (n, dim) embeddings, normalized here
+            labels (list): n labels
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        if len(embeddings) != len(labels):
+            raise ValueError("Mismatched embeddings and labels")
+        needed = self.size + len(embeddings)
+        if needed > self.capacity:
+            self.allocate(max(self.capacity * 2, needed))
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        for label in labels:
+            if label not in self.label_to_id:
+                self.label_to_id[label] = len(self.label_names)
+                self.label_names.append(label)
+        self.matrix[self.size:needed] = embeddings / norms
+        self.label_ids[self.size:needed] = [self.label_to_id[label] for label in labels]
+        self.size = needed
+
+    def predict_batch(self, embeddings: np.ndarray, k: int = 10) -> list:
+        """
+        Score a batch of queries against every example with one matrix multiply.
+        Args:
+            embeddings (np.ndarray): (m, dim) query embeddings
+            k (int): Number of neighbors voting for each query
+        Returns:
+            list: For each query, (label, confidence) tuples sorted by confidence
+        """
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        if self.size == 0:
+            return [[] for _ in range(len(queries))]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = (queries / norms) @ self.matrix[:self.size].T
+        k = min(k, self.size)
+        if k < self.size:
+            neighbors = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            neighbors = np.tile(np.arange(self.size), (len(queries), 1))
+        results = []
+        for row, indices in enumerate(neighbors):
+            similarities = scores[row, indices]
+            weights = np.exp((similarities - similarities.max()) / self.temperature)
+            votes = np.bincount(self.label_ids[indices], weights=weights, minlength=len(self.label_names))
+            votes /= votes.sum()
+            order = np.argsort(-votes)
+            results.append([(self.label_names[i], float(votes[i])) for i in order if votes[i] > 0])
+        return results
+
+    def predict(self, embedding: np.ndarray, k: int = 10) -> list:
+        """
+        Score one query.
+        Returns:
+            list: (label, confidence) tuples sorted by confidence
+        """
+        return self.predict_batch(embedding, k)[0]
+
+    def flush(self) -> None:
+        """Write the examples to disk (memory-mapped store only)."""
+        if self.path is None:
+            return
+        self.matrix.flush()
+        np.save(self.label_ids_path, self.label_ids[:self.size])
+        with open(self.metadata_path, 'w', encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "size": self.size, "labels": self.label_names}, f)
+
+    def load(self) -> None:
+        """Open the memory-mapped store."""
+        with open(self.metadata_path, 'r', encoding="utf-8") as f:
+            metadata = json.load(f)
+        if metadata["dim"] != self.dim:
+            raise ValueError(f"kNN store {self.path} has dimension {metadata['dim']}, expected {self.dim}")
+        self.size = metadata["size"]
+        self.label_names = metadata["labels"]
+        self.label_to_id = {label: idx for idx, label in enumerate(self.label_names)}
+        self.matrix = open_memmap(self.matrix_path, mode="r+")
+        self.label_ids = np.zeros(self.capacity, dtype=np.int32)
+        self.label_ids[:self.size] = np.load(self.label_ids_path)
+
+if __name__ == "__main__":
+    import time
+    dim = 768
+    rng = np.random.default_rng(0)
+    head = KnnHead(dim)
+    query = rng.standard_normal(dim)
+    for target_size in [200, 1000, 5000, 20000, 50000]:
+        count = target_size - head.size
+        head.add(rng.standard_normal((count, dim)), [f"label_{i % 5}" for i in range(count)])
+        start_time = time.perf_counter()
+        for _ in range(100):
+            head.predict(query)
+        print(f"{head.size} examples: {(time.perf_counter() - start_time) * 10:.3f}ms per query")
@@ -10,10 +10,27 @@ from dotenv import load_dotenv, set_key
 from openai import OpenAI
 from huggingface_hub import InferenceClient
 import os
+import json
 import httpx
 
 from sources.utility import pretty_print, animate_thinking
 
+def iter_sse_events(response):
+    """
+    Read the server-sent events of a streamed HTTP response.
+    Args:
+        response (requests.Response): Response opened with stream=True
+    Returns:
+        Generator: The JSON payload of each "data:" event, until "data: [DONE]"
+    """
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
+
 # provider is initialised first- the main class in main.py file initialises provider with the provided details in config.ini
 # all the related functions to check and initialise the model are present in this class as functions 
 
@@ -77,22 +94,37 @@ class Provider:
             raise Exception(f"Invalid address format: {e}. Is port specified?")
         return address
 
-    def respond(self, history, verbose = True):
+    def respond_stream(self, history):
         """
-        Use the choosen provider to generate text.
+        Use the choosen provider to generate text, yielding the text as it is generated.
+        Args:
+            history (list): The conversation
+        Returns:
+            Generator: Text deltas
         """
         llm = self.available_providers[self.provider_name]
         try:
-            thought = llm(history, verbose)
+            yield from llm(history)
         except ConnectionError as e:
             raise ConnectionError(f"{str(e)}\nConnection to {self.server_ip} failed.")
         except AttributeError as e:
             raise NotImplementedError(f"{str(e)}\nIs {self.provider_name} implemented ?")
         except Exception as e:
             if "RemoteDisconnected" in str(e):
-                return f"{self.server_ip} seem offline. RemoteDisconnected error."
+                yield f"{self.server_ip} seem offline. RemoteDisconnected error."
+                return
             raise Exception(f"Provider {self.provider_name} failed: {str(e)}") from e
-        return thought
+
+    def respond(self, history, verbose = True):
+        """
+        Use the choosen provider to generate text.
+        """
+        chunks = []
+        for delta in self.respond_stream(history):
+            if verbose:
+                print(delta, end='', flush=True)
+            chunks.append(delta)
+        return "".join(chunks)
 
     def is_ip_online(self, ip_address):
         """
@@ -114,41 +146,68 @@ class Provider:
             pretty_print(f"Error with ping request {str(e)}", color="failure")
             return False
 
-    def server_fn(self, history, verbose = False):
+    def server_fn(self, history):
         """
-        Use a remote server with LLM to generate text.
+        Use a remote server with LLM to generate text, streamed as server-sent events.
         """
-        thought = ""
         route_setup = f"http://{self.server_ip}/setup"
-        route_gen = f"http://{self.server_ip}/generate"
+        route_stream = f"http://{self.server_ip}/generate_stream"
 
         if not self.is_ip_online(self.server_ip.split(":")[0]):
             raise Exception(f"Server is offline at {self.server_ip}")
 
         try:
             requests.post(route_setup, json={"model": self.model})
-            requests.post(route_gen, json={"messages": history})
-            is_complete = False
-            while not is_complete:
-                response = requests.get(f"http://{self.server_ip}/get_updated_sentence")
-                if "error" in response.json():
-                    pretty_print(response.json()["error"], color="failure")
-                    break
-                thought = response.json()["sentence"]
-                is_complete = bool(response.json()["is_complete"])
-                time.sleep(2)
+            with requests.post(route_stream, json={"messages": history, "model": self.model}, stream=True) as response:
+                if response.status_code == 404:
+                    # server without the streaming route
+                    yield from self.server_poll_fn(history)
+                    return
+                if response.status_code != 200:
+                    raise Exception(response.json().get("error", f"status {response.status_code}"))
+                for event in iter_sse_events(response):
+                    if "error" in event:
+                        pretty_print(event["error"], color="failure")
+                        break
+                    if "delta" in event:
+                        yield event["delta"]
         except KeyError as e:
             raise Exception(f"{str(e)}\nError occured with server route. Are you using the correct address for the config.ini provider?") from e
         except Exception as e:
             raise e
-        return thought
 
+    def server_poll_fn(self, history):
+        """
+        Use a remote server without the streaming route, polling the generated text.
+        """
+        thought = ""
+        offset = 0
+        response = requests.post(f"http://{self.server_ip}/generate", json={"messages": history, "model": self.model})
+        job_id = response.json().get("job_id")
+        is_complete = False
+        while not is_complete:
+            response = requests.get(f"http://{self.server_ip}/get_updated_sentence",
+                                    params={"since": offset, "job_id": job_id})
+            if "error" in response.json():
+                pretty_print(response.json()["error"], color="failure")
+                break
+            if "delta" in response.json():
+                if response.json()["delta"]:
+                    yield response.json()["delta"]
+                offset = response.json()["offset"]
+            else:
+                # server without the delta mode, diff the whole text
+                sentence = response.json()["sentence"]
+                if sentence.startswith(thought) and len(sentence) > len(thought):
+                    yield sentence[len(thought):]
+                thought = sentence
+            is_complete = bool(response.json()["is_complete"])
+            time.sleep(2)
 
-    def ollama_fn(self, history, verbose = False):
+    def ollama_fn(self, history):
         """
         Use local ollama server to generate text.
         """
-        thought = ""
         try:
             stream = chat(
                 model=self.model,
@@ -156,37 +215,37 @@ class Provider:
                 stream=True,
             )
             for chunk in stream:
-              if verbose:
-                print(chunk['message']['content'], end='', flush=True)
-              thought += chunk['message']['content']
+                yield chunk['message']['content']
         except httpx.ConnectError as e:
             raise Exception("\nOllama connection failed. provider should not be set to ollama if server address is not localhost") from e
         except ollama.ResponseError as e:
             if e.status_code == 404:
                 animate_thinking(f"Downloading {self.model}...")
                 ollama.pull(self.model)
-                self.ollama_fn(history, verbose)
+                yield from self.ollama_fn(history)
+                return
             if "refused" in str(e).lower():
                 raise Exception("Ollama connection failed. is the server running ?") from e
             raise e
-        return thought
     
-    def huggingface_fn(self, history, verbose=False):
+    def huggingface_fn(self, history):
         """
         Use huggingface to generate text.
         """
         client = InferenceClient(
         	api_key=self.get_api_key("huggingface")
         )
-        completion = client.chat.completions.create(
+        stream = client.chat.completions.create(
             model=self.model, 
         	messages=history, 
         	max_tokens=1024,
+            stream=True
         )
-        thought = completion.choices[0].message
-        return thought.content
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-    def openai_fn(self, history, verbose=False):
+    def openai_fn(self, history):
         """
         Use openai to generate text.
         """
@@ -197,65 +256,64 @@ class Provider:
             client = OpenAI(api_key=self.api_key)
 
         try:
-            response = client.chat.completions.create(
+            stream = client.chat.completions.create(
                 model=self.model,
                 messages=history,
+                stream=True
             )
-            if response is None:
+            if stream is None:
                 raise Exception("OpenAI response is empty.")
-            thought = response.choices[0].message.content
-            if verbose:
-                print(thought)
-            return thought
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}") from e
 
-    def deepseek_fn(self, history, verbose=False):
+    def deepseek_fn(self, history):
         """
         Use deepseek api to generate text.
         """
         client = OpenAI(api_key=self.api_key, base_url="https://api.deepseek.com")
         try:
-            response = client.chat.completions.create(
+            stream = client.chat.completions.create(
                 model="deepseek-chat",
                 messages=history,
-                stream=False
+                stream=True
             )
-            thought = response.choices[0].message.content
-            if verbose:
-                print(thought)
-            return thought
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
         except Exception as e:
             raise Exception(f"Deepseek API error: {str(e)}") from e
     
-    def lm_studio_fn(self, history, verbose = False):
+    def lm_studio_fn(self, history):
         """
         Use local lm-studio server to generate text.
         lm studio use endpoint /v1/chat/completions not /chat/completions like openai
+        The answer is streamed as server-sent events, one "data: {json}" line per delta.
         """
-        thought = ""
         route_start = f"http://{self.server_ip}/v1/chat/completions"
         payload = {
             "messages": history,
             "temperature": 0.7,
             "max_tokens": 4096,
-            "model": self.model
+            "model": self.model,
+            "stream": True
         }
         if not self.is_ip_online(self.server_ip.split(":")[0]):
             raise Exception(f"Server is offline at {self.server_ip}")
         try:
-            response = requests.post(route_start, json=payload)
-            result = response.json()
-            if verbose:
-                print("Response from LM Studio:", result)
-            return result.get("choices", [{}])[0].get("message", {}).get("content", "")
+            with requests.post(route_start, json=payload, stream=True) as response:
+                for event in iter_sse_events(response):
+                    delta = event.get("choices", [{}])[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
         except requests.exceptions.RequestException as e:
             raise Exception(f"HTTP request failed: {str(e)}") from e
         except Exception as e:
             raise Exception(f"An error occurred: {str(e)}") from e
-        return thought
 
-    def test_fn(self, history, verbose = True):
+    def test_fn(self, history):
         """
         This function is used to conduct tests.
         """
@@ -277,7 +335,8 @@ pwd
 
 goodbye!
         """
-        return thought
+        for line in thought.splitlines(keepends=True):
+            yield line
 
 if __name__ == "__main__":
     provider = Provider("server", "deepseek-r1:1.5b", "192.168.1.20:3333")
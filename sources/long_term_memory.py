@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import uuid
+from typing import Callable, List
+
+import numpy as np
+
+from sources.knn_head import KnnHead
+
+class LongTermMemory:
+    """
+    LongTermMemory recalls past turns relevant to a new query, across sessions and agents.
+    Each turn is embedded once and appended to a memory-mapped matrix (a KnnHead labeled by agent type),
+    the turn text is appended to a JSONL file alongside. A query is scored against every turn with one
+    matrix multiply, only the top-k snippets are injected in the context.
+    """
+    def __init__(self, embed: Callable[[List[str]], np.ndarray],
+                 dim: int,
+                 path: str = "conversations/long_term",
+                 top_k: int = 3,
+                 min_score: float = 0.5,
+                 max_chars: int = 600):
+        """
+        Args:
+            embed (Callable): Function embedding a list of texts into a (n, dim) array.
+            dim (int): Embedding dimension.
+            path (str): Path prefix of the index (<path>.npy, <path>.json, <path>.snippets.jsonl).
+            top_k (int): Maximum number of snippets recalled per query.
+            min_score (float): Minimum cosine similarity of a recalled snippet.
+            max_chars (int): Snippets are cut to this length.
+        """
+        self.embed = embed
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_chars = max_chars
+        self.session_id = str(uuid.uuid4())
+        self.lock = threading.Lock()
+        self.index = KnnHead(dim, path=path)
+        self.snippets_path = f"{path}.snippets.jsonl"
+        self.snippets = self.load_snippets()
+        # a crash between the two appends leaves an unmatched row, ignore it
+        self.index.size = min(self.index.size, len(self.snippets))
+        self.snippets = self.snippets[:self.index.size]
+        # rows from here on are turns of the current session
+        self.session_start = self.index.size
+
+    def load_snippets(self) -> list:
+        if not os.path.exists(self.snippets_path):
+            return []
+        snippets = []
+        with open(self.snippets_path, 'r', encoding="utf-8") as f:
+            for line in f:
+                try:
+                    snippets.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return snippets
+
+    def remember(self, agent_type: str, query: str, answer: str) -> None:
+        """
+        Store a turn.
+        Args:
+            agent_type (str): The agent who answered
+            query (str): The user query
+            answer (str): The agent answer
+        """
+        text = f"User: {query}\nAssistant: {answer}"
+        if len(text) > self.max_chars:
+            text = text[:self.max_chars] + "..."
+        embedding = self.embed([text])
+        snippet = {"session_id": self.session_id, "agent_type": agent_type, "text": text}
+        with self.lock:
+            with open(self.snippets_path, 'a', encoding="utf-8") as f:
+                f.write(json.dumps(snippet, ensure_ascii=False) + "\n")
+            self.snippets.append(snippet)
+            self.index.add(embedding, [agent_type])
+            self.index.flush()
+
+    def recall(self, query: str, agent_type: str = None) -> list:
+        """
+        Find the past turns most relevant to a query, turns of the current session are already in the context.
+        Args:
+            query (str): The new query
+            agent_type (str): Only recall turns of this agent, None for every agent
+        Returns:
+            list: Snippet texts, most relevant first
+        """
+        with self.lock:
+            size = self.index.size
+            if size == 0:
+                return []
+            query_embedding = np.asarray(self.embed([query]), dtype=np.float32).reshape(-1)
+            query_embedding /= max(np.linalg.norm(query_embedding), 1e-12)
+            scores = self.index.matrix[:size] @ query_embedding
+            # filter before the top-k, so a long session never hides the relevant past turns
+            eligible = scores >= self.min_score
+            eligible[self.session_start:] = False
+            if agent_type is not None:
+                if agent_type not in self.index.label_to_id:
+                    return []
+                eligible &= self.index.label_ids[:size] == self.index.label_to_id[agent_type]
+            rows = np.flatnonzero(eligible)
+            if len(rows) > self.top_k:
+                rows = rows[np.argpartition(-scores[rows], self.top_k - 1)[:self.top_k]]
+            return [self.snippets[idx]["text"] for idx in rows[np.argsort(-scores[rows])]]
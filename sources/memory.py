@@ -1,26 +1,69 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 import time
 import datetime
 import uuid
 import os
 import sys
 import json
+import threading
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sources.utility import timer_decorator, pretty_print
+from sources.summary_cache import SummaryCache
+from sources.context_builder import ContextBuilder
+from sources.summarizers import get_summarizer
+from sources.session_journal import SessionJournal
+from sources.conversation_store import ConversationStore, StoreJournal
+from sources.conversation_log import ConversationLog, conversation_log
+
+# summaries are shared by every agent memory and kept across sessions
+summary_cache = SummaryCache(os.path.join("conversations", "summaries.json"))
+# the summarizer is shared, background workers of different agents take turns
+summarizer_lock = threading.Lock()
 
 class Memory():
     """
     Memory is a class for managing the conversation memory
     It provides a method to compress the memory (experimental, use with caution).
+    Compression runs in a background worker, summaries are swapped in when ready.
+    The messages live in a ConversationLog shared by every agent, a memory is a view over it:
+    its system prompt plus the indices of its messages.
     """
+    # token budget of the context sent to the LLM, 0 sends the whole conversation (see configure_context)
+    context_tokens = 0
+    context_recent_messages = 6
+    context_tokenizer = None
+    # memory compression backend: led, extractive or auto (see sources/summarizers.py)
+    summarizer_backend = "auto"
+    summary_batch_size = 8
+    # session storage: None for the JSONL journals, a ConversationStore for the SQLite backend
+    store = None
+
     def __init__(self, system_prompt: str,
                  recover_last_session: bool = False,
-                 memory_compression: bool = True):
-        self.memory = []
-        self.memory = [{'role': 'system', 'content': system_prompt}]
+                 memory_compression: bool = True,
+                 log: ConversationLog = None):
+        self.log = log or conversation_log
+        self.view = [self.log.append('system', system_prompt)]
+        # position in the view of the first message of the current turn (the query), see start_turn
+        self.turn_start = None
+        # messages before this index went through compression already
+        self.compressed_count = 0
+        # bumped whenever the history is replaced, so stale summaries are dropped
+        self.generation = 0
+        self.lock = threading.RLock()
+        self.compress_requested = threading.Event()
+        self.compress_idle = threading.Event()
+        self.compress_idle.set()
+        self.compress_until = None
+        self.compress_pending = False
+        # texts the context builder needs summaries of, summarized by the worker for the next requests
+        self.summary_requests = []
+        self.worker = None
+        self.context_builders = {}
+        self.journal = None
+        # past turns recalled by the long-term memory for the current query
+        self.recalled = []
         
         self.session_time = datetime.datetime.now()
         self.session_id = str(uuid.uuid4())
@@ -29,39 +72,58 @@ class Memory():
         if recover_last_session:
             self.load_memory()
             self.session_recovered = True
-        # memory compression system
-        self.model = "pszemraj/led-base-book-summary"
-        self.device = self.get_cuda_device()
+        # memory compression system, the summarizer is shared and only loaded on first use
         self.memory_compression = memory_compression
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model)
     
     def get_filename(self) -> str:
         return f"memory_{self.session_time.strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+
+    @property
+    def memory(self) -> list:
+        """The messages of the view, shared with the log."""
+        return self.log.select(self.view)
+
+    def get_session_name(self) -> str:
+        return f"session_{self.session_time.strftime('%Y-%m-%d_%H-%M-%S')}_{self.session_id[:8]}"
+
+    @classmethod
+    def configure_storage(cls, backend: str = "jsonl", database: str = "conversations/conversations.db") -> None:
+        """
+        Set the session storage of every agent.
+        Args:
+            backend (str): "jsonl" for one journal file per session, "sqlite" for a shared database
+            database (str): Path of the SQLite database
+        """
+        if backend not in ["jsonl", "sqlite"]:
+            raise ValueError(f"Unknown memory storage: {backend}")
+        cls.store = ConversationStore(database) if backend == "sqlite" else None
+
+    def open_journal(self, agent_type: str = "casual_agent") -> None:
+        """
+        Start recording the session in an append-only journal, every change is written as it happens.
+        """
+        with self.lock:
+            if self.journal is not None:
+                return
+            if self.store is not None:
+                self.journal = StoreJournal(self.store, self.session_id, agent_type)
+            else:
+                self.journal = SessionJournal(os.path.join(self.conversation_folder, agent_type), self.get_session_name())
+            self.journal.append({"op": "reset", "messages": self.memory})
     
     def save_memory(self, agent_type: str = "casual_agent") -> None:
-        """Save the session memory to a file."""
-        if not os.path.exists(self.conversation_folder):
-            os.makedirs(self.conversation_folder)
-        save_path = os.path.join(self.conversation_folder, agent_type)
-        if not os.path.exists(save_path):
-            os.makedirs(save_path)
-        filename = self.get_filename()
-        path = os.path.join(save_path, filename)
-        json_memory = json.dumps(self.memory)
-        with open(path, 'w') as f:
-            f.write(json_memory)
+        """Save the session memory, the journal is written as the session goes so this only forces it to disk."""
+        if self.journal is None:
+            self.open_journal(agent_type)
+        self.journal.sync()
+        summary_cache.save()
     
     def find_last_session_path(self, path) -> str:
-        """Find the last session path."""
-        saved_sessions = []
-        for filename in os.listdir(path):
-            if filename.startswith('memory_'):
-                date = filename.split('_')[1]
-                saved_sessions.append((filename, date))
-        saved_sessions.sort(key=lambda x: x[1], reverse=True)
+        """Find the last session path of the legacy format (one JSON file per session)."""
+        saved_sessions = [filename for filename in os.listdir(path) if filename.startswith('memory_')]
         if len(saved_sessions) > 0:
-            return saved_sessions[0][0]
+            # memory_<date>_<time>.txt, the name sorts chronologically
+            return max(saved_sessions)
         return None
 
     def load_memory(self, agent_type: str = "casual_agent") -> None:
@@ -69,88 +131,301 @@ class Memory():
         pretty_print(f"Loading {agent_type} past memories... ", color="status")
         if self.session_recovered == True:
             return
+        if self.store is not None:
+            self.recover(self.store.last_session(agent_type))
+            return
         save_path = os.path.join(self.conversation_folder, agent_type)
         if not os.path.exists(save_path):
             pretty_print("No memory to load.", color="success")
             return
-        filename = self.find_last_session_path(save_path)
-        if filename is None:
-            pretty_print("Last session memory not found.", color="warning")
+        path = SessionJournal.find_latest(save_path)
+        if path is not None:
+            memory = SessionJournal.replay(path)
+        else:
+            filename = self.find_last_session_path(save_path)
+            if filename is None:
+                pretty_print("Last session memory not found.", color="warning")
+                return
+            with open(os.path.join(save_path, filename), 'r') as f:
+                memory = json.load(f)
+        self.recover(memory)
+
+    def recover(self, memory: list) -> None:
+        """Restore the history of a previous session."""
+        if memory and memory[-1]['role'] == 'user':
+            memory.pop()
+        if not memory:
+            pretty_print("Last session memory is empty.", color="warning")
             return
-        path = os.path.join(save_path, filename)
-        with open(path, 'r') as f:
-            self.memory = json.load(f)
-        if self.memory[-1]['role'] == 'user':
-            self.memory.pop()
-        self.compress()
+        # recovered summaries are cache hits, only messages never summarized reach the model
+        self.reset(memory)
+        self.request_compression()
         pretty_print("Session recovered successfully", color="success")
     
     def reset(self, memory: list) -> None:
-        self.memory = memory
+        with self.lock:
+            self.view = self.log.extend(memory)
+            for index in self.view:
+                self.log.watch(index, self.on_replace)
+            self.turn_start = None
+            self.compressed_count = 0
+            self.generation += 1
+            if self.journal is not None:
+                self.journal.append({"op": "reset", "messages": memory})
     
     def push(self, role: str, content: str) -> None:
         """Push a message to the memory."""
+        with self.lock:
+            curr_idx = len(self.view)
+            if curr_idx > 0 and self.log.get(self.view[-1])['content'] == content:
+                pretty_print("Warning: same message have been pushed twice to memory", color="error")
+            index = self.log.append(role, content)
+            self.view.append(index)
+            self.log.watch(index, self.on_replace)
+            if self.journal is not None:
+                self.journal.append({"op": "push", "index": curr_idx, "role": role, "content": content})
         if self.memory_compression and role == 'assistant':
-            self.compress()
-        curr_idx = len(self.memory)
-        if self.memory[curr_idx-1]['content'] == content:
-            pretty_print("Warning: same message have been pushed twice to memory", color="error")
-        self.memory.append({'role': role, 'content': content})
+            # the latest answer stays verbatim until the next one
+            self.request_compression(until=curr_idx)
     
     def clear(self) -> None:
-        self.memory = []
+        self.reset([])
+
+    def start_turn(self) -> None:
+        """Mark the start of a turn, the next message pushed is the query of the turn."""
+        with self.lock:
+            self.turn_start = len(self.view)
+
+    def last_exchange(self) -> list:
+        """
+        Returns:
+            list: Log indices of the query of the last turn and of the final answer to it,
+                  tool feedback pushed in between (role 'user') is left out
+        """
+        with self.lock:
+            if self.turn_start is None or self.turn_start >= len(self.view):
+                return []
+            turn = self.view[self.turn_start:]
+            answers = [index for index in turn[1:] if self.log.get(index)['role'] == 'assistant']
+            return turn[:1] + answers[-1:]
+
+    def link(self, indices: list) -> None:
+        """
+        Add messages of another agent to the view, by reference.
+        When the other agent compresses them, the summary is journaled for this view too.
+        Args:
+            indices (list): Log indices, from another memory's last_exchange()
+        """
+        with self.lock:
+            for index in indices:
+                if index in self.view:
+                    continue
+                self.view.append(index)
+                self.log.watch(index, self.on_replace)
+                if self.journal is not None:
+                    message = self.log.get(index)
+                    self.journal.append({"op": "push", "index": len(self.view) - 1,
+                                         "role": message['role'], "content": message['content']})
+
+    def on_replace(self, index: int, content: str) -> None:
+        """Journal the summary of a message of the view, whichever memory compressed it."""
+        with self.lock:
+            if self.journal is None or index not in self.view:
+                return
+            self.journal.append({"op": "replace", "index": self.view.index(index), "content": content})
     
     def get(self) -> list:
-        return self.memory
+        """
+        Get a snapshot of the conversation, it never waits on the summarizer.
+        Returns:
+            list: The messages, later pushes and summaries do not alter it (entries are swapped, never modified)
+        """
+        with self.lock:
+            return self.memory
 
-    def get_cuda_device(self) -> str:
-        if torch.backends.mps.is_available():
-            return "mps"
-        elif torch.cuda.is_available():
-            return "cuda"
-        else:
-            return "cpu"
+    @classmethod
+    def configure_context(cls, max_tokens: int, recent_messages: int = 6, tokenizer: str = None) -> None:
+        """
+        Set the token budget of the context of every agent.
+        Args:
+            max_tokens (int): Token budget, 0 sends the whole conversation
+            recent_messages (int): Maximum number of recent messages kept verbatim
+            tokenizer (str): Huggingface tokenizer counting the tokens, None uses the provider model name
+        """
+        cls.context_tokens = max_tokens
+        cls.context_recent_messages = recent_messages
+        cls.context_tokenizer = tokenizer or None
+
+    def get_context(self, model: str = None) -> list:
+        """
+        Get the conversation fitted in the token budget: system prompt and recent messages verbatim,
+        older messages rolled into summaries. Recalled memories are appended to the system prompt.
+        Args:
+            model (str): The model the context is sent to, its tokenizer counts the tokens
+        Returns:
+            list: The messages to send
+        """
+        messages = self.get()
+        if self.recalled and messages and messages[0]['role'] == 'system':
+            memories = "\n".join(f"- {snippet}" for snippet in self.recalled)
+            messages[0] = {**messages[0],
+                           'content': f"{messages[0]['content']}\n\nRelevant memories from earlier sessions:\n{memories}"}
+        if self.context_tokens <= 0:
+            return messages
+        model = self.context_tokenizer or model
+        if model not in self.context_builders:
+            self.context_builders[model] = ContextBuilder(self.context_tokens,
+                                                          recent_messages=self.context_recent_messages,
+                                                          summarize=self.summarize_shared,
+                                                          model=model)
+        return self.context_builders[model].build(messages)
+
+    def set_recalled(self, snippets: list) -> None:
+        """Set the past turns injected in the context of the coming requests."""
+        self.recalled = list(snippets)
+
+    def request_compression(self, until: int = None) -> None:
+        """
+        Wake the background compression worker, starting it on first use.
+        Args:
+            until (int): Compress the messages before this index, None for the whole history
+        """
+        with self.lock:
+            self.compress_until = until
+            self.compress_pending = True
+            self.wake_worker()
+
+    def request_summary(self, text: str) -> None:
+        """Queue a text for the background worker, its summary is cached for the next requests."""
+        with self.lock:
+            if text in self.summary_requests:
+                return
+            self.summary_requests.append(text)
+            self.wake_worker()
+
+    def wake_worker(self) -> None:
+        """Start the background worker on first use and signal it, the lock must be held."""
+        if self.worker is None:
+            self.worker = threading.Thread(target=self._compression_worker, daemon=True)
+            self.worker.start()
+        self.compress_idle.clear()
+        self.compress_requested.set()
+
+    def wait_compression(self, timeout: float = None) -> bool:
+        """
+        Wait for the pending compression to finish (used before saving a session).
+        Returns:
+            bool: True if no compression is pending
+        """
+        return self.compress_idle.wait(timeout)
+
+    def _compression_worker(self) -> None:
+        while True:
+            self.compress_requested.wait()
+            self.compress_requested.clear()
+            with self.lock:
+                compress, self.compress_pending = self.compress_pending, False
+                texts, self.summary_requests = self.summary_requests, []
+            try:
+                if compress:
+                    self.compress(self.compress_until)
+                if texts:
+                    with summarizer_lock:
+                        self.summarize_cached(texts)
+                summary_cache.save()
+            except Exception as e:
+                pretty_print(f"Memory compression failed: {str(e)}", color="failure")
+            if not self.compress_requested.is_set():
+                self.compress_idle.set()
+
+    @classmethod
+    def configure_summarizer(cls, backend: str, batch_size: int = 8) -> None:
+        """
+        Set the memory compression backend of every agent.
+        Args:
+            backend (str): "extractive", "led" or "auto" (LED on cuda, extractive otherwise)
+            batch_size (int): Number of messages summarized per model call
+        """
+        get_summarizer(backend)
+        cls.summarizer_backend = backend
+        cls.summary_batch_size = batch_size
 
     def summarize(self, text: str, min_length: int = 64) -> str:
         """
-        Summarize the text using the AI model.
+        Summarize the text with the configured summarizer backend.
         Args:
             text (str): The text to summarize
             min_length (int, optional): The minimum length of the summary. Defaults to 64.
         Returns:
             str: The summarized text
         """
-        if self.tokenizer is None or self.model is None:
-            return text
-        if len(text) < min_length*1.5:
-            return text
-        max_length = len(text) // 2 if len(text) > min_length*2 else min_length*2
-        input_text = "summarize: " + text
-        inputs = self.tokenizer(input_text, return_tensors="pt", max_length=512, truncation=True)
-        summary_ids = self.model.generate(
-            inputs['input_ids'],
-            max_length=max_length,  # Maximum length of the summary
-            min_length=min_length,  # Minimum length of the summary
-            length_penalty=1.0,  # Adjusts length preference
-            num_beams=4,  # Beam search for better quality
-            early_stopping=True  # Stop when all beams finish
-        )
-        summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        summary.replace('summary:', '')
-        return summary
+        return get_summarizer(self.summarizer_backend).summarize(text, min_length)
     
+    def summarize_cached(self, texts: list) -> list:
+        """
+        Summarize messages, reusing the summaries of identical content from any session.
+        Messages missing from the cache are summarized together in batches.
+        Summaries are also stored under their own hash, so summaries are never summarized again.
+        Args:
+            texts (list): The messages
+        Returns:
+            list: One summary per message
+        """
+        summarizer = get_summarizer(self.summarizer_backend)
+        keys = [SummaryCache.content_hash(text, summarizer.name) for text in texts]
+        summaries = [summary_cache.get(key) for key in keys]
+        missing = [idx for idx, summary in enumerate(summaries) if summary is None]
+        if missing:
+            computed = summarizer.summarize_batch([texts[idx] for idx in missing], batch_size=self.summary_batch_size)
+            for idx, summary in zip(missing, computed):
+                summaries[idx] = summary
+                summary_cache.put(keys[idx], summary)
+                summary_cache.put(SummaryCache.content_hash(summary, summarizer.name), summary)
+        return summaries
+
+    def summarize_shared(self, text: str) -> str:
+        """
+        Summarize for the context of a request, the summarizer never runs on the request path:
+        a cached summary is used, otherwise the text itself (the budget then cuts it)
+        and the background worker summarizes it for the next requests.
+        """
+        summarizer = get_summarizer(self.summarizer_backend)
+        cached = summary_cache.get(SummaryCache.content_hash(text, summarizer.name))
+        if cached is not None:
+            return cached
+        self.request_summary(text)
+        return text
+
     @timer_decorator
-    def compress(self) -> str:
+    def compress(self, until: int = None) -> str:
         """
         Compress the memory using the AI model.
+        Only the messages added since the last compression are processed. The summarizer runs
+        outside the memory lock, summaries replace their message only if the history was not reset meanwhile.
+        Args:
+            until (int): Compress the messages before this index, None for the whole history
         """
-        for i in range(len(self.memory)):
-            if i < 3:
-                continue
-            if self.memory[i]['role'] == 'system':
-                continue
-            if len(self.memory[i]['content']) > 128:
-                self.memory[i]['content'] = self.summarize(self.memory[i]['content'])
+        with self.lock:
+            generation = self.generation
+            messages = self.memory
+            end = len(messages) if until is None else min(until, len(messages))
+            pending = [(i, messages[i]['content']) for i in range(max(self.compressed_count, 3), end)
+                       if messages[i]['role'] != 'system' and len(messages[i]['content']) > 128]
+        with summarizer_lock:
+            summaries = self.summarize_cached([content for _, content in pending]) if pending else []
+        replaced = []
+        with self.lock:
+            if generation != self.generation:
+                return
+            for (i, content), summary in zip(pending, summaries):
+                # the log swaps the entry, snapshots returned by get() are never modified
+                # messages linked from another agent are compressed for both
+                if self.log.replace(self.view[i], summary, expected=content):
+                    replaced.append(self.view[i])
+            self.compressed_count = max(self.compressed_count, end)
+        # every view holding a replaced message journals it, this one included
+        for index in replaced:
+            self.log.notify(index)
 
 if __name__ == "__main__":
     memory = Memory("You are a helpful assistant.",
@@ -177,7 +452,9 @@ Ensure the file exists in the specified location.
     memory.push('user', "why do i get this error?")
     memory.push('assistant', sample_text)
     print("\n---\nmemory before:", memory.get())
-    memory.compress()
+    memory.push('user', "thanks")
+    memory.push('assistant', "You are welcome.")
+    memory.wait_compression()
     print("\n---\nmemory after:", memory.get())
     memory.save_memory()
     
\ No newline at end of file
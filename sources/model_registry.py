@@ -0,0 +1,199 @@
+import gc
+import sys
+import threading
+import time
+from typing import Any, Callable
+
+from sources.utility import pretty_print
+
+def estimate_model_size(obj: Any) -> int:
+    """
+    Estimate the resident size of a model in bytes.
+    Walk torch modules (parameters and buffers), tuples of models and wrappers exposing a `.model` attribute
+    (transformers pipelines, AdaptiveClassifier, Kokoro pipeline).
+    Args:
+        obj: The loaded model object
+    Returns:
+        int: The estimated size in bytes, 0 if unknown
+    """
+    if obj is None:
+        return 0
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_model_size(item) for item in obj)
+    if callable(getattr(obj, "parameters", None)) and callable(getattr(obj, "buffers", None)):
+        try:
+            size = sum(p.numel() * p.element_size() for p in obj.parameters())
+            size += sum(b.numel() * b.element_size() for b in obj.buffers())
+            return size
+        except Exception:
+            return 0
+    inner = getattr(obj, "model", None)
+    if inner is not None and inner is not obj and not isinstance(inner, str):
+        return estimate_model_size(inner)
+    return 0
+
+class ModelRegistry:
+    """
+    ModelRegistry is a process-wide store of the heavy AI models (summarizer, router, BART, Whisper, Kokoro).
+    Models are registered with a loader, loaded lazily on first use and shared between all users.
+    When a RAM budget is set, the least recently used models are evicted once the budget is exceeded.
+    """
+    def __init__(self, ram_budget_mb: int = 0):
+        self.lock = threading.RLock()
+        self.loaders = {}
+        self.pinned = set()
+        self.models = {}
+        self.load_locks = {}
+        self.ram_budget = ram_budget_mb * 1024 * 1024
+        self.stats = {"loads": 0, "hits": 0, "evictions": 0}
+
+    def register(self, name: str, loader: Callable[[], Any], pinned: bool = False) -> None:
+        """
+        Register a model loader. Registering an existing name is a no-op.
+        Args:
+            name (str): Unique name of the model
+            loader (Callable): Function without arguments returning the loaded model
+            pinned (bool): Pinned models are never evicted (for models callers keep references to)
+        """
+        with self.lock:
+            if name in self.loaders:
+                return
+            self.loaders[name] = loader
+            self.load_locks[name] = threading.Lock()
+            if pinned:
+                self.pinned.add(name)
+
+    def is_registered(self, name: str) -> bool:
+        return name in self.loaders
+
+    def is_loaded(self, name: str) -> bool:
+        with self.lock:
+            return name in self.models
+
+    def get(self, name: str) -> Any:
+        """
+        Get a shared reference to a model, loading it on first use.
+        Args:
+            name (str): Name of the registered model
+        Returns:
+            The loaded model
+        """
+        if name not in self.loaders:
+            raise KeyError(f"Model {name} is not registered.")
+        with self.lock:
+            entry = self.models.get(name)
+            if entry is not None:
+                entry["last_used"] = time.time()
+                self.stats["hits"] += 1
+                return entry["model"]
+        with self.load_locks[name]:
+            with self.lock:
+                entry = self.models.get(name)
+                if entry is not None:
+                    entry["last_used"] = time.time()
+                    self.stats["hits"] += 1
+                    return entry["model"]
+            pretty_print(f"Loading model {name}...", color="status")
+            start_time = time.time()
+            model = self.loaders[name]()
+            load_time = time.time() - start_time
+            size = estimate_model_size(model)
+            with self.lock:
+                self.models[name] = {
+                    "model": model,
+                    "size": size,
+                    "load_time": load_time,
+                    "last_used": time.time()
+                }
+                self.stats["loads"] += 1
+            pretty_print(f"Model {name} loaded in {load_time:.2f}s ({size / (1024 * 1024):.0f} MB)", color="status")
+        self.enforce_budget(keep=name)
+        return model
+
+    def evict(self, name: str) -> bool:
+        """
+        Drop the registry reference to a model so it can be garbage collected.
+        Returns:
+            bool: True if the model was loaded and has been evicted
+        """
+        with self.lock:
+            entry = self.models.pop(name, None)
+            if entry is None:
+                return False
+            self.stats["evictions"] += 1
+        del entry
+        self.release_memory()
+        pretty_print(f"Model {name} evicted from memory.", color="status")
+        return True
+
+    def evict_idle(self, max_idle_seconds: float) -> list:
+        """
+        Evict every unpinned model not used for more than max_idle_seconds.
+        Returns:
+            list: Names of the evicted models
+        """
+        now = time.time()
+        with self.lock:
+            idle = [name for name, entry in self.models.items()
+                    if name not in self.pinned and now - entry["last_used"] > max_idle_seconds]
+        return [name for name in idle if self.evict(name)]
+
+    def set_ram_budget(self, ram_budget_mb: int) -> None:
+        """Set the RAM budget in MB (0 disables eviction) and apply it."""
+        self.ram_budget = ram_budget_mb * 1024 * 1024
+        self.enforce_budget()
+
+    def total_size(self) -> int:
+        with self.lock:
+            return sum(entry["size"] for entry in self.models.values())
+
+    def enforce_budget(self, keep: str = None) -> list:
+        """
+        Evict least recently used unpinned models until the loaded models fit the RAM budget.
+        Args:
+            keep (str): Name of a model that must stay loaded (the one just requested)
+        Returns:
+            list: Names of the evicted models
+        """
+        evicted = []
+        if self.ram_budget <= 0:
+            return evicted
+        while self.total_size() > self.ram_budget:
+            with self.lock:
+                candidates = sorted(
+                    (entry["last_used"], name) for name, entry in self.models.items()
+                    if name not in self.pinned and name != keep
+                )
+            if not candidates:
+                break
+            name = candidates[0][1]
+            if self.evict(name):
+                evicted.append(name)
+        return evicted
+
+    def release_memory(self) -> None:
+        """Run the garbage collector and release cached accelerator memory."""
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def report(self) -> dict:
+        """
+        Returns:
+            dict: Loaded models with their size (MB), load time and idle time, plus registry counters
+        """
+        now = time.time()
+        with self.lock:
+            models = {
+                name: {
+                    "size_mb": entry["size"] / (1024 * 1024),
+                    "load_time": entry["load_time"],
+                    "idle_seconds": now - entry["last_used"],
+                    "pinned": name in self.pinned
+                }
+                for name, entry in self.models.items()
+            }
+            return {"models": models, **self.stats}
+
+registry = ModelRegistry()
@@ -0,0 +1,86 @@
+import threading
+
+from sources.utility import pretty_print
+
+class ModelTiers:
+    """
+    ModelTiers picks the model serving each turn from the complexity estimated by the router.
+    LOW complexity turns go to a small fast model, HIGH complexity turns to the main model.
+    Agent types can be pinned to a tier with overrides, and every turn is counted per tier.
+    """
+    TIERS = ["low", "high"]
+
+    def __init__(self, high_provider, low_provider=None, overrides: dict = None):
+        """
+        Args:
+            high_provider: Provider of the main model.
+            low_provider: Provider of the small model, None serves every turn with the main model.
+            overrides (dict): Agent type -> "low", "high" or "auto" (follow the complexity estimate).
+        exceptions:
+            ValueError: If an override is not a known tier
+        """
+        self.providers = {"high": high_provider, "low": low_provider or high_provider}
+        self.overrides = {}
+        for agent_type, tier in (overrides or {}).items():
+            tier = tier.strip().lower()
+            if tier not in self.TIERS + ["auto"]:
+                raise ValueError(f"Unknown model tier for {agent_type}: {tier}")
+            if tier != "auto":
+                self.overrides[agent_type] = tier
+        self.lock = threading.Lock()
+        self.stats = {tier: {"turns": 0, "total_time": 0.0} for tier in self.TIERS}
+
+    @property
+    def enabled(self) -> bool:
+        return self.providers["low"] is not self.providers["high"]
+
+    def resolve(self, agent_type: str, complexity: str) -> str:
+        """
+        Find the tier of a turn.
+        Args:
+            agent_type (str): Type of the selected agent
+            complexity (str): Complexity estimated by the router (LOW, HIGH or None)
+        Returns:
+            str: "low" or "high"
+        """
+        if agent_type in self.overrides:
+            return self.overrides[agent_type]
+        return "low" if complexity == "LOW" else "high"
+
+    def apply(self, agent, complexity: str) -> str:
+        """
+        Set the provider of an agent for the coming turn.
+        Args:
+            agent (Agent): The selected agent
+            complexity (str): Complexity estimated by the router
+        Returns:
+            str: The tier serving the turn
+        """
+        tier = self.resolve(agent.type, complexity)
+        agent.llm = self.providers[tier]
+        if self.enabled:
+            pretty_print(f"Model tier: {tier} ({agent.llm.model})", color="status")
+        return tier
+
+    def record(self, tier: str, elapsed: float) -> None:
+        """Count a turn served by a tier and its duration in seconds."""
+        with self.lock:
+            self.stats[tier]["turns"] += 1
+            self.stats[tier]["total_time"] += elapsed
+
+    def report(self) -> dict:
+        """
+        Returns:
+            dict: tier -> model, number of turns, share of the turns and mean turn time in seconds
+        """
+        with self.lock:
+            total = sum(stats["turns"] for stats in self.stats.values())
+            return {
+                tier: {
+                    "model": self.providers[tier].model,
+                    "turns": stats["turns"],
+                    "share": stats["turns"] / total if total else 0.0,
+                    "mean_time": stats["total_time"] / stats["turns"] if stats["turns"] else 0.0
+                }
+                for tier, stats in self.stats.items()
+            }
@@ -1,6 +1,9 @@
 import os
 import sys
+import time
+import random
 import torch
+from typing import Tuple
 from transformers import pipeline
 # adaptive-classifier==0.0.10
 from adaptive_classifier import AdaptiveClassifier
@@ -15,21 +18,151 @@ from sources.agents.planner_agent import FileAgent
 from sources.agents.browser_agent import BrowserAgent
 from sources.language import LanguageUtility
 from sources.utility import pretty_print
+from sources.model_registry import registry
+from sources.routing_engine import RoutingEngine, quantize_classifier, compare_engines
+from sources.routing_cache import RoutingCache
+from sources.rule_router import RuleRouter
+
+def load_bart(quantization: str = "none") -> pipeline:
+    """
+    Load the BART zero-shot classification pipeline.
+    Args:
+        quantization (str): "int8" to dynamically quantize the linear layers for CPU inference
+    """
+    bart = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+    if quantization == "int8":
+        bart.model = torch.quantization.quantize_dynamic(bart.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return bart
 
 class AgentRouter:
     """
     AgentRouter is a class that selects the appropriate agent based on the user query.
     """
-    def __init__(self, agents: list):
+    def __init__(self, agents: list,
+                 mode: str = "cascade",
+                 cascade_threshold: float = 0.5,
+                 quantization: str = "none",
+                 cache_size: int = 256,
+                 cache_ttl: float = 3600,
+                 cache_similarity: float = 0,
+                 rules: bool = True,
+                 knn_weight: float = 0,
+                 holdout: float = 0):
+        """
+        Args:
+            agents (list): The agents to route to.
+            mode (str): "cascade" only consults BART when the LLM router confidence is below cascade_threshold,
+                        "vote" always runs both models, "router" never loads BART.
+            cascade_threshold (float): Minimum LLM router confidence to skip BART in cascade mode.
+            quantization (str): "int8" runs the router models with dynamic int8 quantization on cpu, "none" in fp32.
+            cache_size (int): Number of routing decisions cached, 0 disables the cache.
+            cache_ttl (float): Time to live of a cached decision in seconds, 0 for no expiry.
+            cache_similarity (float): Cosine similarity for near-duplicate cache hits, 0 for exact matches only.
+            rules (bool): Route obvious queries with the rules of llm_router/rules.json before the neural router.
+            knn_weight (float): Weight of the k-NN head over routed examples (see add_routing_examples)
+                                in the LLM router scores, 0 disables the head.
+            holdout (float): Fraction of the few-shot examples kept out of training for evaluation (benchmark only).
+        """
+        if mode not in ["cascade", "vote", "router"]:
+            raise ValueError(f"Unknown router mode: {mode}")
+        if quantization not in ["none", "int8"]:
+            raise ValueError(f"Unknown router quantization: {quantization}")
+        if quantization == "int8" and torch.cuda.is_available():
+            # the router runs on cuda when available, dynamic quantization is cpu only
+            pretty_print(f"int8 quantization is only supported on cpu, router stays in fp32.", color="warning")
+            quantization = "none"
+        self.quantization = quantization
+        self.holdout = holdout
+        self.holdout_sets = {}
         self.agents = agents
+        self.mode = mode
+        self.cascade_threshold = cascade_threshold
+        self.cascade_stats = {"router": 0, "bart": 0}
+        self.last_complexity = None
+        self.cache = RoutingCache(max_size=cache_size, ttl=cache_ttl, similarity_threshold=cache_similarity)
+        self.rule_router = RuleRouter(os.path.join(self.get_router_path(), "rules.json")) if rules else None
         self.lang_analysis = LanguageUtility()
-        self.pipelines = {
-            "bart": pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-        }
-        self.talk_classifier = self.load_llm_router()
-        self.complexity_classifier = self.load_llm_router()
-        self.learn_few_shots_tasks()
-        self.learn_few_shots_complexity()
+        registry.register("bart", lambda: load_bart(quantization))
+        # the router encoder is kept by the router for its lifetime, so it is pinned in the registry
+        registry.register("llm_router", self.load_router_backend, pinned=True)
+        # one encoder, two heads: task classification and complexity estimation
+        self.engine = RoutingEngine(registry.get("llm_router"),
+                                    store_dir=self.get_store_path(),
+                                    backend="int8" if quantization == "int8" else "fp32")
+        self.talk_classifier = self.learn_few_shots_tasks()
+        self.complexity_classifier = self.learn_few_shots_complexity()
+        self.knn_weight = knn_weight
+        if knn_weight > 0:
+            self.engine.add_knn_head("routed", path=os.path.join(self.get_store_path(), "routed"))
+
+    def get_router_path(self) -> str:
+        return "../llm_router" if __name__ == "__main__" else "./llm_router"
+
+    def get_store_path(self) -> str:
+        if self.holdout > 0:
+            return os.path.join(self.get_router_path(), "prototypes", f"holdout_{int(self.holdout * 100)}")
+        return os.path.join(self.get_router_path(), "prototypes")
+
+    def split_few_shots(self, name: str, few_shots: list) -> Tuple[list, list]:
+        """
+        Split the few-shot examples into training texts and labels.
+        With a holdout fraction, a deterministic stratified part of the unique examples is kept in
+        self.holdout_sets[name] for evaluation instead of being learned.
+        Args:
+            name (str): The head name
+            few_shots (list): (text, label) pairs
+        Returns:
+            tuple: The training texts and labels
+        """
+        if self.holdout <= 0:
+            return [text for text, _ in few_shots], [label for _, label in few_shots]
+        rng = random.Random(42)
+        by_label = {}
+        for text, label in dict.fromkeys((text, label) for text, label in few_shots):
+            by_label.setdefault(label, []).append(text)
+        train, held_out = [], []
+        for label, texts in by_label.items():
+            rng.shuffle(texts)
+            count = int(len(texts) * self.holdout) if len(texts) > 1 else 0
+            held_out += [(text, label) for text in texts[:count]]
+            train += [(text, label) for text in texts[count:]]
+        self.holdout_sets[name] = held_out
+        return [text for text, _ in train], [label for _, label in train]
+
+    def load_router_backend(self) -> AdaptiveClassifier:
+        """
+        Load the LLM router model with the configured quantization.
+        """
+        classifier = self.load_llm_router()
+        if self.quantization == "int8":
+            return quantize_classifier(classifier)
+        return classifier
+
+    def check_quantization(self) -> dict:
+        """
+        Compare the int8 router against the fp32 router on the few-shot set.
+        Both routers learn the same few-shot lists, so the check covers the whole routing path.
+        Returns:
+            dict: Top label agreement rate per head and mean latency of each backend
+        """
+        reference = self.load_llm_router()
+        if reference.device != "cpu":
+            raise ValueError("int8 quantization is only supported on cpu.")
+        engines = [
+            RoutingEngine(reference, store_dir=self.get_store_path(), backend="fp32"),
+            RoutingEngine(quantize_classifier(reference), store_dir=self.get_store_path(), backend="int8")
+        ]
+        for engine in engines:
+            for name, (texts, labels) in self.engine.few_shots.items():
+                engine.learn_head(name, texts, labels)
+        texts = list(dict.fromkeys(text for texts, _ in self.engine.few_shots.values() for text in texts))
+        results = compare_engines(engines[0], engines[1], texts)
+        for name in self.engine.few_shots:
+            pretty_print(f"Head {name}: int8 agrees with fp32 on {results[name]*100:.1f}% of {len(texts)} queries",
+                         color="success" if results[name] == 1.0 else "warning")
+        pretty_print(f"Latency per query: fp32 {results['reference_latency_ms']:.1f}ms, "
+                     f"int8 {results['candidate_latency_ms']:.1f}ms", color="info")
+        return results
 
     def load_llm_router(self) -> AdaptiveClassifier:
         """
@@ -39,7 +172,7 @@ class AgentRouter:
         exceptions:
             Exception: If the safetensors fails to load
         """
-        path = "../llm_router" if __name__ == "__main__" else "./llm_router"
+        path = self.get_router_path()
         try:
             talk_classifier = AdaptiveClassifier.from_pretrained(path)
         except Exception as e:
@@ -54,10 +187,12 @@ class AgentRouter:
         else:
             return "cpu"
     
-    def learn_few_shots_complexity(self) -> None:
+    def learn_few_shots_complexity(self) -> AdaptiveClassifier:
         """
         Few shot learning for complexity estimation.
-        Use the build in add_examples method of the Adaptive_classifier.
+        The learned head is cached on disk by the routing engine, keyed by the few-shot list.
+        Returns:
+            AdaptiveClassifier: The complexity head
         """
         few_shots = [
             ("can you find api and build a python web app with it ?", "HIGH"),
@@ -142,14 +277,15 @@ class AgentRouter:
             ("Bonjour", "LOW"),
             ("What's up ?", "LOW"),
         ]
-        texts = [text for text, _ in few_shots]
-        labels = [label for _, label in few_shots]
-        self.complexity_classifier.add_examples(texts, labels)
+        texts, labels = self.split_few_shots("complexity", few_shots)
+        return self.engine.learn_head("complexity", texts, labels)
 
-    def learn_few_shots_tasks(self) -> None:
+    def learn_few_shots_tasks(self) -> AdaptiveClassifier:
         """
         Few shot learning for tasks classification.
-        Use the build in add_examples method of the Adaptive_classifier.
+        The learned head is cached on disk by the routing engine, keyed by the few-shot list.
+        Returns:
+            AdaptiveClassifier: The task classification head
         """
         few_shots = [
             ["Place this information inside a text file", "files"],
@@ -293,9 +429,8 @@ class AgentRouter:
             ("hi", "talk"),
             ("hello", "talk"),
         ]
-        texts = [text for text, _ in few_shots]
-        labels = [label for _, label in few_shots]
-        self.talk_classifier.add_examples(texts, labels)
+        texts, labels = self.split_few_shots("talk", few_shots)
+        return self.engine.learn_head("talk", texts, labels)
 
     def llm_router(self, text: str) -> tuple:
         """
@@ -303,47 +438,88 @@ class AgentRouter:
         Args:
             text: The input text
         """
-        predictions = self.talk_classifier.predict(text)
+        predictions = self.engine.predict("talk", text)
+        if self.knn_weight > 0 and self.engine.get_head("routed").size > 0:
+            predictions = self.blend_predictions(predictions, self.engine.predict("routed", text))
         predictions = [pred for pred in predictions if pred[0] not in ["HIGH", "LOW"]]
         predictions = sorted(predictions, key=lambda x: x[1], reverse=True)
         return predictions[0]
     
+    def blend_predictions(self, predictions: list, knn_predictions: list) -> list:
+        """
+        Mix the talk head scores with the k-NN head scores, weighted by knn_weight.
+        """
+        scores = {label: (1 - self.knn_weight) * score for label, score in predictions}
+        for label, score in knn_predictions:
+            scores[label] = scores.get(label, 0.0) + self.knn_weight * score
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+    def add_routing_examples(self, texts: list, labels: list) -> None:
+        """
+        Append labeled queries (such as reviewed routing logs) to the k-NN head, they are kept on disk between sessions.
+        Args:
+            texts (list): The queries
+            labels (list): The talk labels (talk, web, code, files, ...)
+        """
+        if self.knn_weight <= 0:
+            raise ValueError("The k-NN routing head is disabled, set knn_weight above 0.")
+        self.engine.add_knn_examples("routed", texts, labels)
+        pretty_print(f"Routing examples: {self.engine.get_head('routed').size} stored.", color="status")
+
     def router_vote(self, text: str, labels: list, log_confidence:bool = False) -> str:
         """
         Vote between the LLM router and BART model.
+        In cascade mode the LLM router answers alone when confident, BART is only loaded and run otherwise.
         Args:
             text: The input text
             labels: The labels to classify
         Returns:
             str: The selected label
         """
-        result_bart = self.pipelines['bart'](text, labels)
-        result_llm_router = self.llm_router(text)
+        start_time = time.time()
+        llm_router, confidence_llm_router = self.llm_router(text)
+        router_latency = (time.time() - start_time) * 1000
+        if self.mode == "router" or (self.mode == "cascade" and confidence_llm_router >= self.cascade_threshold):
+            self.cascade_stats["router"] += 1
+            pretty_print(f"Router cascade: LLM-router {llm_router} ({confidence_llm_router:.2f}) accepted "
+                         f"[router {router_latency:.0f}ms]", color="status")
+            return llm_router
+        start_time = time.time()
+        result_bart = registry.get("bart")(text, labels)
+        bart_latency = (time.time() - start_time) * 1000
+        self.cascade_stats["bart"] += 1
         bart, confidence_bart = result_bart['labels'][0], result_bart['scores'][0]
-        llm_router, confidence_llm_router = result_llm_router[0], result_llm_router[1]
         final_score_bart = confidence_bart / (confidence_bart + confidence_llm_router)
         final_score_llm = confidence_llm_router / (confidence_bart + confidence_llm_router)
+        choice = bart if final_score_bart > final_score_llm else llm_router
+        pretty_print(f"Router cascade: LLM-router {llm_router} ({confidence_llm_router:.2f}) below threshold, "
+                     f"BART {bart} ({confidence_bart:.2f}) -> {choice} "
+                     f"[router {router_latency:.0f}ms, bart {bart_latency:.0f}ms]", color="status")
         if log_confidence:
             pretty_print(f"Agent choice -> BART: {bart} ({final_score_bart}) LLM-router: {llm_router} ({final_score_llm})")
-        # return bart if final_score_bart > final_score_llm else llm_router
-        return llm_router
+        return choice
     
+    def extract_first_sentence(self, text: str) -> str:
+        """
+        Extract the first line of the query, the part used for language detection.
+        """
+        for line in text.split("\n"):
+            if line.strip():
+                return line.strip()
+        return text
+
     def classify_text(self, text: str, threshold: float = 0.4) -> list:
         """
         Classify the text using the LLM router and BART model.
+        The whole text is classified, as for the complexity, so the shared encoder embeds it once for both heads.
         """
-        first_sentence = None
         lang = "en"
-        for line in text.split("\n"):
-            first_sentence = line.strip()
-            break
-        if first_sentence is None:
-            first_sentence = text
+        first_sentence = self.extract_first_sentence(text)
         try:
             lang = self.lang_analysis.detect_language(first_sentence)
             # no multilanguage support yet
             labels = [agent.role["en"] for agent in self.agents]
-            result = self.router_vote(first_sentence, labels, log_confidence=False)
+            result = self.router_vote(text, labels, log_confidence=False)
         except Exception as e:
             raise e
         return result, lang
@@ -356,7 +532,7 @@ class AgentRouter:
         Returns:
             str: The estimated complexity
         """
-        predictions = self.complexity_classifier.predict(text)
+        predictions = self.engine.predict("complexity", text)
         predictions = sorted(predictions, key=lambda x: x[1], reverse=True)
         if len(predictions) == 0:
             return "LOW"
@@ -391,35 +567,91 @@ class AgentRouter:
         pretty_print(f"Erreur lors du choix de l'agent. Le système de routage n'est pas encore multilingue.", color="failure")
         pretty_print(f"Error al elegir agente. El sistema de enrutamiento aún no es multilingüe.", color="failure")
     
-    def select_agent(self, text: str) -> Agent:
+    def find_agent_by_role(self, role: str) -> Agent:
         """
-        Select the appropriate agent based on the text.
+        Find the first agent with the given english role.
+        """
+        for agent in self.agents:
+            if agent.role["en"] == role:
+                return agent
+        return None
+
+    def route_rules(self, text: str) -> Agent:
+        """
+        Route obvious queries with the rule-based fast path.
+        Returns:
+            Agent: The selected agent, None to fall through to the neural router
+        """
+        if self.rule_router is None:
+            return None
+        roles = [agent.role["en"] for agent in self.agents]
+        rule = self.rule_router.match(text, roles)
+        if rule is None:
+            return None
+        agent = self.find_agent_by_role(rule["agent"])
+        pretty_print(f"Selected agent: {agent.agent_name} (rule {rule['name']}, "
+                     f"fired {self.rule_router.stats[rule['name']]} times)", color="warning")
+        return agent
+
+    def route_text(self, text: str) -> Tuple[Agent, str]:
+        """
+        Route the text through complexity estimation and the classifiers.
         Args:
             text (str): The text to select the agent from
         Returns:
-            Agent: The selected agent
+            tuple: The selected agent (None if no agent fits) and the detected language
         """
-        if len(self.agents) == 0:
-            return self.agents[0]
+        # the whole request: multi-line tasks often open with a short line,
+        # the task head scores the same text so the query is encoded once
         complexity = self.estimate_complexity(text)
-        if complexity == "LOW":
-            complexity = "HIGH"
-        pretty_print(complexity)
+        self.last_complexity = complexity
+        pretty_print(f"Estimated complexity: {complexity}", color="status")
         best_agent, lang = self.classify_text(text)
         if lang != "en":
             self.multi_language_message(text)
         if complexity == None:
             pretty_print(f"Hmm, the task seems to be complex but you gave very little information. can you clarify?", color="info")
-            return None
+            return None, lang
         if complexity == "HIGH" and lang == "en":
             pretty_print(f"Complex task detected, routing to planner agent.", color="info")
-            return self.find_planner_agent()
+            return self.find_planner_agent(), lang
         for agent in self.agents:
             if best_agent == agent.role["en"]:
                 pretty_print(f"Selected agent: {agent.agent_name} (roles: {agent.role[lang]})", color="warning")
-                return agent
+                return agent, lang
         pretty_print(f"Error choosing agent.", color="failure")
-        return None
+        return None, lang
+
+    def select_agent(self, text: str) -> Agent:
+        """
+        Select the appropriate agent based on the text.
+        Obvious queries are routed by rules, then recent decisions are reused for identical
+        (or, if enabled, near-identical) queries, the neural router handles the rest.
+        Args:
+            text (str): The text to select the agent from
+        Returns:
+            Agent: The selected agent, the estimated complexity of the query is kept in self.last_complexity
+        """
+        if len(self.agents) == 0:
+            return self.agents[0]
+        agent = self.route_rules(text)
+        if agent is not None:
+            # rules only match single-step queries
+            self.last_complexity = "LOW"
+            return agent
+        embedding = None
+        if self.cache.similarity_enabled:
+            # the embedding route_text reuses on a miss
+            embedding = self.engine.encode(text)
+        decision = self.cache.get(text, embedding)
+        if decision is not None:
+            agent, self.last_complexity = decision
+            pretty_print(f"Selected agent: {agent.agent_name} (routing cache, hit rate {self.cache.hit_rate()*100:.0f}%)", color="warning")
+            return agent
+        agent, lang = self.route_text(text)
+        if agent is not None and lang == "en":
+            self.cache.put(text, (agent, self.last_complexity), embedding)
+        return agent
 
 if __name__ == "__main__":
     agents = [
@@ -429,6 +661,9 @@ if __name__ == "__main__":
         FileAgent("file", "../prompts/coder_agent.txt", None)
     ]
     router = AgentRouter(agents)
+    if "--check-quantization" in sys.argv:
+        router.check_quantization()
+        sys.exit(0)
     texts = [
         "hi",
         #"你好",
@@ -0,0 +1,197 @@
+#!/usr/bin python3
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sources.router import AgentRouter
+from sources.model_registry import registry
+from sources.utility import pretty_print
+
+class RoutingTarget:
+    """
+    RoutingTarget stands for an agent during the benchmark: the router only reads the name, type and roles.
+    """
+    def __init__(self, name: str, agent_type: str, role: str):
+        self.agent_name = name
+        self.type = agent_type
+        self.role = {"en": role, "fr": role, "zh": role}
+
+def make_targets() -> list:
+    return [
+        RoutingTarget("casual", "casual_agent", "talk"),
+        RoutingTarget("coder", "code_agent", "code"),
+        RoutingTarget("file", "file_agent", "files"),
+        RoutingTarget("browser", "browser_agent", "web"),
+        RoutingTarget("planner", "planner_agent", "Research, setup and code"),
+    ]
+
+def get_peak_rss_mb() -> float:
+    """Peak resident set size of the process in MB."""
+    try:
+        import resource
+    except ImportError:
+        # windows, fall back to the current resident set size
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB on linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def latency_summary(latencies: list) -> dict:
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+    }
+
+def evaluate(predict, corpus: list, verbose: bool = False, expect=None) -> dict:
+    """
+    Run a routing function over a labeled corpus.
+    Args:
+        predict (Callable): Function taking a query and returning the predicted label
+        corpus (list): (query, expected label) pairs
+        verbose (bool): Show the router logs
+        expect (Callable): Function taking the query and its corpus label and returning the expected label, called after predict
+    Returns:
+        dict: accuracy, confusion matrix (expected -> predicted -> count) and latency percentiles in ms
+    """
+    confusion = {}
+    latencies = []
+    correct = 0
+    for text, expected in corpus:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(sys.stdout if verbose else output):
+            start_time = time.perf_counter()
+            predicted = str(predict(text))
+            latencies.append(time.perf_counter() - start_time)
+            if expect is not None:
+                expected = str(expect(text, expected))
+        row = confusion.setdefault(expected, {})
+        row[predicted] = row.get(predicted, 0) + 1
+        correct += predicted == expected
+    return {
+        "count": len(corpus),
+        "accuracy": correct / len(corpus) if corpus else 0.0,
+        "confusion": confusion,
+        "latency_ms": latency_summary(latencies),
+    }
+
+def print_confusion(confusion: dict) -> None:
+    labels = sorted(set(confusion) | {label for row in confusion.values() for label in row})
+    width = max(len(label) for label in labels) + 2
+    print("expected \\ predicted".ljust(width) + "".join(label.rjust(width) for label in labels))
+    for expected in labels:
+        row = confusion.get(expected, {})
+        print(expected.ljust(width) + "".join(str(row.get(label, 0)).rjust(width) for label in labels))
+
+def print_results(results: dict, baseline: dict = None) -> None:
+    def delta(value, old_value, unit=""):
+        if old_value is None:
+            return ""
+        return f" ({value - old_value:+.3f}{unit} vs baseline)"
+
+    baseline = baseline or {}
+    pretty_print(f"Router load time: {results['load_time_s']:.2f}s"
+                 f"{delta(results['load_time_s'], baseline.get('load_time_s'), 's')}", color="info")
+    pretty_print(f"Peak RSS: {results['peak_rss_mb']:.0f} MB"
+                 f"{delta(results['peak_rss_mb'], baseline.get('peak_rss_mb'), ' MB')}", color="info")
+    for name, model in results["models"].items():
+        pretty_print(f"  {name}: loaded in {model['load_time']:.2f}s, {model['size_mb']:.0f} MB", color="info")
+    for stage in ["estimate_complexity", "classify_text", "select_agent"]:
+        result = results[stage]
+        old = baseline.get(stage, {})
+        latency = result["latency_ms"]
+        old_latency = old.get("latency_ms", {})
+        pretty_print(f"\n--- {stage} ({result['count']} queries) ---", color="status")
+        pretty_print(f"accuracy: {result['accuracy'] * 100:.1f}%"
+                     f"{delta(result['accuracy'] * 100, old['accuracy'] * 100 if old else None, '%')}", color="success")
+        if latency:
+            pretty_print(" ".join(f"{key}: {latency[key]:.1f}ms{delta(latency[key], old_latency.get(key), 'ms')}"
+                                  for key in ["p50", "p95", "p99"]), color="success")
+        print_confusion(result["confusion"])
+
+def expected_agent(router: AgentRouter, text: str, agent_name: str) -> str:
+    """
+    The agent select_agent should pick for a query of the task of agent_name, given the complexity it estimated:
+    HIGH complexity goes to the planner (english queries) and no complexity asks for clarification (no agent).
+    Complexity errors are counted by the estimate_complexity stage, not twice.
+    """
+    lang = router.lang_analysis.detect_language(router.extract_first_sentence(text))
+    if router.last_complexity == "HIGH" and lang == "en":
+        return router.find_planner_agent().agent_name
+    if router.last_complexity is None:
+        return None
+    return agent_name
+
+def run_benchmark(args) -> dict:
+    """
+    Build a router trained on the few-shot lists minus a held-out split, then route the held-out queries.
+    """
+    start_time = time.perf_counter()
+    router = AgentRouter(make_targets(),
+                         mode=args.mode,
+                         cascade_threshold=args.cascade_threshold,
+                         quantization=args.quantization,
+                         cache_size=0,
+                         rules=not args.no_rules,
+                         holdout=args.holdout)
+    load_time = time.perf_counter() - start_time
+    complexity_corpus = router.holdout_sets.get("complexity", [])
+    task_corpus = router.holdout_sets.get("talk", [])
+    agent_corpus = []
+    for text, label in task_corpus:
+        agent = router.find_agent_by_role(label)
+        if agent is not None:
+            agent_corpus.append((text, agent.agent_name))
+    return {
+        "config": vars(args),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "load_time_s": load_time,
+        "estimate_complexity": evaluate(router.estimate_complexity, complexity_corpus, args.verbose),
+        "classify_text": evaluate(lambda text: router.classify_text(text)[0], task_corpus, args.verbose),
+        "select_agent": evaluate(lambda text: getattr(router.select_agent(text), "agent_name", None),
+                                 agent_corpus, args.verbose,
+                                 expect=lambda text, agent_name: expected_agent(router, text, agent_name)),
+        "models": registry.report()["models"],
+        "peak_rss_mb": get_peak_rss_mb(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='AgentRouter accuracy and latency benchmark, run from the project root')
+    parser.add_argument('--holdout', type=float, default=0.2, help='fraction of the few-shot examples held out for evaluation')
+    parser.add_argument('--mode', type=str, default="cascade", help='router mode: cascade, vote or router')
+    parser.add_argument('--cascade-threshold', type=float, default=0.5, help='LLM router confidence needed to skip BART')
+    parser.add_argument('--quantization', type=str, default="none", help='router backend: none or int8')
+    parser.add_argument('--no-rules', action='store_true', help='disable the rule-based fast path')
+    parser.add_argument('--save', type=str, default=None, help='save the results as JSON to this path')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON results of a previous run to compare with')
+    parser.add_argument('--verbose', action='store_true', help='show the router logs')
+    args = parser.parse_args()
+
+    if not 0 < args.holdout < 1:
+        parser.error("--holdout must be between 0 and 1")
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, 'r', encoding="utf-8") as f:
+            baseline = json.load(f)
+    results = run_benchmark(args)
+    print_results(results, baseline)
+    if args.save is not None:
+        with open(args.save, 'w', encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        pretty_print(f"Results saved to {args.save}", color="success")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+class RoutingCache:
+    """
+    RoutingCache remembers recent routing decisions.
+    Queries are looked up by their normalized text, and optionally by embedding similarity
+    so that near-identical queries reuse a prior decision.
+    """
+    def __init__(self, max_size: int = 256, ttl: float = 3600, similarity_threshold: float = 0):
+        """
+        Args:
+            max_size (int): Maximum number of decisions kept, least recently used are dropped first.
+            ttl (float): Time to live of a decision in seconds, 0 for no expiry.
+            similarity_threshold (float): Minimum cosine similarity for a near-duplicate hit, 0 disables the lookup.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0}
+
+    @property
+    def similarity_enabled(self) -> bool:
+        return self.similarity_threshold > 0
+
+    def normalize(self, text: str) -> str:
+        """Normalize a query: lowercase, collapse whitespace and drop trailing punctuation."""
+        text = re.sub(r'\s+', ' ', text.lower()).strip()
+        return text.rstrip(" .!?")
+
+    def is_expired(self, entry: dict) -> bool:
+        return self.ttl > 0 and time.time() - entry["time"] > self.ttl
+
+    def get(self, text: str, embedding: Any = None) -> Any:
+        """
+        Find a cached decision for a query.
+        Args:
+            text (str): The query
+            embedding: Normalized query embedding (torch or numpy), used for the near-duplicate lookup
+        Returns:
+            The cached decision or None
+        """
+        key = self.normalize(text)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.is_expired(entry):
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry["decision"]
+            if self.similarity_enabled and embedding is not None:
+                best_key, best_score = None, self.similarity_threshold
+                for other_key, other in list(self.entries.items()):
+                    if self.is_expired(other):
+                        del self.entries[other_key]
+                        continue
+                    if other["embedding"] is None:
+                        continue
+                    score = float((other["embedding"] * embedding).sum())
+                    if score >= best_score:
+                        best_key, best_score = other_key, score
+                if best_key is not None:
+                    self.entries.move_to_end(best_key)
+                    self.stats["similar_hits"] += 1
+                    return self.entries[best_key]["decision"]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, text: str, decision: Any, embedding: Any = None) -> None:
+        """
+        Store a routing decision.
+        Args:
+            text (str): The query
+            decision: The routing decision
+            embedding: Normalized query embedding, only kept when the near-duplicate lookup is enabled
+        """
+        if self.max_size <= 0:
+            return
+        key = self.normalize(text)
+        with self.lock:
+            self.entries[key] = {
+                "decision": decision,
+                "embedding": embedding if self.similarity_enabled else None,
+                "time": time.time()
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def hit_rate(self) -> float:
+        total = sum(self.stats.values())
+        if total == 0:
+            return 0.0
+        return (self.stats["exact_hits"] + self.stats["similar_hits"]) / total
+
+    def report(self) -> dict:
+        return {"size": len(self.entries), "hit_rate": self.hit_rate(), **self.stats}
@@ -0,0 +1,338 @@
+import copy
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+import torch
+# adaptive-classifier==0.0.10
+from adaptive_classifier import AdaptiveClassifier, PrototypeMemory, Example
+
+from sources.utility import pretty_print
+from sources.knn_head import KnnHead
+
+# bump when the stored prototype format changes, older stores are then ignored
+PROTOTYPE_STORE_VERSION = 1
+
+def quantize_classifier(classifier: AdaptiveClassifier) -> AdaptiveClassifier:
+    """
+    Create an int8 copy of an AdaptiveClassifier for CPU inference.
+    The transformer linear layers are dynamically quantized, the classification state is shared.
+    Args:
+        classifier (AdaptiveClassifier): The fp32 classifier, left untouched
+    Returns:
+        AdaptiveClassifier: The quantized classifier
+    """
+    if classifier.device != "cpu":
+        raise ValueError(f"int8 quantization only runs on cpu, the router is on {classifier.device}.")
+    quantized = copy.copy(classifier)
+    quantized.model = torch.quantization.quantize_dynamic(classifier.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return quantized
+
+def compare_engines(reference: 'RoutingEngine', candidate: 'RoutingEngine', texts: List[str]) -> dict:
+    """
+    Compare the routing decisions and latency of two engines holding the same heads.
+    Args:
+        reference (RoutingEngine): The reference engine (fp32)
+        candidate (RoutingEngine): The engine to check (int8)
+        texts (list): The queries to route
+    Returns:
+        dict: head name -> agreement rate of the top label, plus mean latency per query (ms) of each engine
+    """
+    results = {}
+    latencies = {"reference": 0.0, "candidate": 0.0}
+    agreements = {name: 0 for name in reference.heads if name in candidate.heads}
+    for text in texts:
+        start_time = time.time()
+        reference_preds = reference.predict_all(text, k=1)
+        latencies["reference"] += time.time() - start_time
+        start_time = time.time()
+        candidate_preds = candidate.predict_all(text, k=1)
+        latencies["candidate"] += time.time() - start_time
+        for name in agreements:
+            if reference_preds[name][0][0] == candidate_preds[name][0][0]:
+                agreements[name] += 1
+    for name, agreed in agreements.items():
+        results[name] = agreed / max(len(texts), 1)
+    results["reference_latency_ms"] = latencies["reference"] * 1000 / max(len(texts), 1)
+    results["candidate_latency_ms"] = latencies["candidate"] * 1000 / max(len(texts), 1)
+    return results
+
+class RoutingEngine:
+    """
+    RoutingEngine shares a single AdaptiveClassifier encoder between several classification heads.
+    Each head keeps its own examples, prototypes and adaptive head, but all of them embed text through the engine,
+    so a query is encoded once and every head scores the same embedding.
+    Learned heads and few-shot embeddings are persisted in store_dir, so startup only embeds examples that changed.
+    """
+    def __init__(self, backbone: AdaptiveClassifier, cache_size: int = 64, store_dir: str = None, backend: str = "fp32"):
+        """
+        Args:
+            backbone (AdaptiveClassifier): The pretrained router, it is never modified.
+            cache_size (int): Number of query embeddings kept for reuse between heads.
+            store_dir (str): Folder of the prototype store, None disables persistence.
+            backend (str): Inference backend of the backbone (fp32 or int8), embeddings are stored per backend.
+        """
+        self.backbone = backbone
+        self.heads = {}
+        self.cache_size = cache_size
+        self.embedding_cache = OrderedDict()
+        self.forward_passes = 0
+        self.backend = backend
+        self.model_name = f"{backbone.model.config._name_or_path}:{backend}"
+        self.few_shots = {}
+        self.store_dir = store_dir
+        self.stored_embeddings = self.load_embedding_store()
+        self.store_dirty = False
+
+    def add_head(self, name: str) -> AdaptiveClassifier:
+        """
+        Create a new head initialized from the backbone examples, prototypes and adaptive head.
+        The head shares the backbone transformer and tokenizer, only the light classification state is copied.
+        Args:
+            name (str): The head name
+        Returns:
+            AdaptiveClassifier: The head, usable with add_examples and predict
+        """
+        backbone = self.backbone
+        head = copy.copy(backbone)
+        head.memory = PrototypeMemory(backbone.embedding_dim, config=backbone.config)
+        for label, examples in backbone.memory.examples.items():
+            head.memory.examples[label] = list(examples)
+        head.memory.prototypes = dict(backbone.memory.prototypes)
+        head.memory._restore_from_save()
+        head.adaptive_head = copy.deepcopy(backbone.adaptive_head)
+        head.label_to_id = dict(backbone.label_to_id)
+        head.id_to_label = dict(backbone.id_to_label)
+        # every head embeds through the engine so embeddings are shared
+        head._get_embeddings = self.get_embeddings
+        self.heads[name] = head
+        return head
+
+    def add_knn_head(self, name: str, path: str = None) -> KnnHead:
+        """
+        Create a k-nearest-neighbor head for large example sets (such as routed queries fed back to the router).
+        Args:
+            name (str): The head name
+            path (str): Path prefix of the memory-mapped store, None keeps the examples in RAM
+        Returns:
+            KnnHead: The head
+        """
+        head = KnnHead(self.backbone.embedding_dim, path=path)
+        self.heads[name] = head
+        return head
+
+    def add_knn_examples(self, name: str, texts: List[str], labels: List[str], batch_size: int = 64) -> None:
+        """
+        Embed examples in batches and append them to a k-nearest-neighbor head.
+        """
+        head = self.get_head(name)
+        for i in range(0, len(texts), batch_size):
+            head.add(self.embed(texts[i:i+batch_size]), labels[i:i+batch_size])
+        head.flush()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts with the shared encoder, bypassing the few-shot store and query cache.
+        Returns:
+            np.ndarray: (len(texts), embedding_dim) normalized embeddings
+        """
+        self.forward_passes += 1
+        return torch.stack(self.backbone._get_embeddings(texts)).cpu().numpy()
+
+    def get_head(self, name: str) -> AdaptiveClassifier:
+        if name not in self.heads:
+            raise KeyError(f"Routing head {name} does not exist.")
+        return self.heads[name]
+
+    def get_embeddings(self, texts: List[str]) -> List[torch.Tensor]:
+        """
+        Embed texts with the shared encoder, reusing the embeddings of recently seen texts.
+        Args:
+            texts (list): The texts to embed
+        Returns:
+            list: One normalized embedding tensor per text
+        """
+        computed = {}
+        if len(texts) > 1:
+            # few-shot batches are looked up in the persistent store first
+            for text in texts:
+                stored = self.stored_embeddings.get(self.text_hash(text))
+                if stored is not None:
+                    computed[text] = stored
+        missing = [text for text in dict.fromkeys(texts)
+                   if text not in self.embedding_cache and text not in computed]
+        if missing:
+            self.forward_passes += 1
+            embeddings = self.backbone._get_embeddings(missing)
+            computed.update(zip(missing, embeddings))
+            if len(texts) > 1:
+                for text, embedding in zip(missing, embeddings):
+                    self.stored_embeddings[self.text_hash(text)] = embedding
+                self.store_dirty = True
+        results = []
+        for text in texts:
+            if text in computed:
+                embedding = computed[text]
+            else:
+                embedding = self.embedding_cache[text]
+                self.embedding_cache.move_to_end(text)
+            results.append(embedding)
+        if len(texts) == 1:
+            # only single queries are worth keeping, few-shot batches are embedded once
+            self.embedding_cache[texts[0]] = results[0]
+            while len(self.embedding_cache) > self.cache_size:
+                self.embedding_cache.popitem(last=False)
+        return results
+
+    def encode(self, text: str) -> torch.Tensor:
+        """Encode a single query with the shared encoder."""
+        return self.get_embeddings([text])[0]
+
+    def predict(self, name: str, text: str, k: int = 5) -> list:
+        """
+        Score a query with one head.
+        Args:
+            name (str): The head name
+            text (str): The query
+            k (int): Number of labels to return
+        Returns:
+            list: (label, confidence) tuples sorted by confidence
+        """
+        head = self.get_head(name)
+        if isinstance(head, KnnHead):
+            return head.predict(self.encode(text).numpy(), k=max(k, 10))[:k]
+        return head.predict(text, k=k)
+
+    def predict_all(self, text: str, k: int = 5) -> dict:
+        """
+        Encode a query once and score it with every head.
+        Returns:
+            dict: head name -> list of (label, confidence) tuples
+        """
+        self.encode(text)
+        return {name: self.predict(name, text, k=k) for name in self.heads}
+
+    def text_hash(self, text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def examples_key(self, texts: List[str], labels: List[str]) -> str:
+        """
+        Key of a few-shot list: hash of the store version, encoder name, backbone state and examples.
+        """
+        content = json.dumps({
+            "version": PROTOTYPE_STORE_VERSION,
+            "model_name": self.model_name,
+            "train_steps": self.backbone.train_steps,
+            "examples": list(zip(texts, labels))
+        }, ensure_ascii=False)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def learn_head(self, name: str, texts: List[str], labels: List[str]) -> AdaptiveClassifier:
+        """
+        Create a head and teach it a few-shot list.
+        The learned head is restored from the prototype store when the few-shot list did not change,
+        otherwise only new examples are embedded and the result is saved for the next start.
+        Args:
+            name (str): The head name
+            texts (list): The example texts
+            labels (list): The example labels
+        Returns:
+            AdaptiveClassifier: The learned head
+        """
+        head = self.add_head(name)
+        self.few_shots[name] = (list(texts), list(labels))
+        key = self.examples_key(texts, labels)
+        if self.load_head(name, key):
+            return head
+        head.add_examples(texts, labels)
+        self.save_head(name, key)
+        self.save_embedding_store()
+        return head
+
+    def store_filename(self, stem: str) -> str:
+        """Stores are kept per backend (<stem>.fp32.pt, <stem>.int8.pt) so switching quantization keeps both."""
+        return f"{stem}.{self.backend}.pt"
+
+    def write_store_file(self, filename: str, data: dict) -> None:
+        os.makedirs(self.store_dir, exist_ok=True)
+        path = os.path.join(self.store_dir, filename)
+        tmp_path = path + ".tmp"
+        torch.save(data, tmp_path)
+        os.replace(tmp_path, path)
+
+    def read_store_file(self, filename: str) -> dict:
+        if self.store_dir is None:
+            return None
+        path = os.path.join(self.store_dir, filename)
+        if not os.path.exists(path):
+            return None
+        try:
+            data = torch.load(path)
+        except Exception as e:
+            pretty_print(f"Ignoring unreadable prototype store {path}: {str(e)}", color="warning")
+            return None
+        if data.get("version") != PROTOTYPE_STORE_VERSION or data.get("model_name") != self.model_name:
+            return None
+        return data
+
+    def load_embedding_store(self) -> dict:
+        data = self.read_store_file(self.store_filename("embeddings"))
+        return data["embeddings"] if data is not None else {}
+
+    def save_embedding_store(self) -> None:
+        if self.store_dir is None or not self.store_dirty:
+            return
+        self.write_store_file(self.store_filename("embeddings"), {
+            "version": PROTOTYPE_STORE_VERSION,
+            "model_name": self.model_name,
+            "embeddings": self.stored_embeddings
+        })
+        self.store_dirty = False
+
+    def save_head(self, name: str, key: str) -> None:
+        """Save the learned state of a head (examples, prototypes, adaptive head) under a few-shot key."""
+        if self.store_dir is None:
+            return
+        head = self.get_head(name)
+        self.write_store_file(self.store_filename(f"head_{name}"), {
+            "version": PROTOTYPE_STORE_VERSION,
+            "model_name": self.model_name,
+            "key": key,
+            "examples": {
+                label: [(ex.text, ex.embedding) for ex in examples]
+                for label, examples in head.memory.examples.items()
+            },
+            "prototypes": dict(head.memory.prototypes),
+            "label_to_id": dict(head.label_to_id),
+            "adaptive_head": head.adaptive_head.state_dict() if head.adaptive_head is not None else None,
+            "train_steps": head.train_steps
+        })
+
+    def load_head(self, name: str, key: str) -> bool:
+        """
+        Restore the learned state of a head if the store matches the few-shot key.
+        Returns:
+            bool: True if the head was restored
+        """
+        data = self.read_store_file(self.store_filename(f"head_{name}"))
+        if data is None or data.get("key") != key:
+            return False
+        head = self.get_head(name)
+        head.memory = PrototypeMemory(self.backbone.embedding_dim, config=self.backbone.config)
+        for label, examples in data["examples"].items():
+            head.memory.examples[label] = [Example(text, label, embedding) for text, embedding in examples]
+        head.memory.prototypes = dict(data["prototypes"])
+        head.memory._restore_from_save()
+        head.label_to_id = dict(data["label_to_id"])
+        head.id_to_label = {idx: label for label, idx in head.label_to_id.items()}
+        head.adaptive_head = None
+        if data["adaptive_head"] is not None:
+            head._initialize_adaptive_head()
+            head.adaptive_head.load_state_dict(data["adaptive_head"])
+        head.train_steps = data["train_steps"]
+        pretty_print(f"Routing head {name} loaded from prototype store.", color="status")
+        return True
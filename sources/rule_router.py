@@ -0,0 +1,70 @@
+import json
+import re
+
+class RuleRouter:
+    """
+    RuleRouter is a fast keyword/regex routing stage that runs before the neural router.
+    Rules are declared in a JSON file; each rule maps regex patterns to an agent role.
+    Queries matching a fallthrough pattern (multi-step requests) are left to the neural router,
+    unless the rule is marked "always".
+    """
+    def __init__(self, rules_path: str):
+        """
+        Args:
+            rules_path (str): Path to the JSON rules file.
+        """
+        self.rules_path = rules_path
+        self.rules = []
+        self.fallthrough = []
+        self.stats = {"fallthrough": 0}
+        self.load_rules(rules_path)
+
+    def load_rules(self, rules_path: str) -> None:
+        """
+        Load and compile the rules file.
+        exceptions:
+            ValueError: If a rule is missing a name, agent or patterns
+        """
+        with open(rules_path, 'r', encoding="utf-8") as f:
+            data = json.load(f)
+        self.fallthrough = [re.compile(pattern, re.IGNORECASE) for pattern in data.get("fallthrough", [])]
+        self.rules = []
+        for rule in data.get("rules", []):
+            if not all(key in rule for key in ["name", "agent", "patterns"]):
+                raise ValueError(f"Invalid routing rule in {rules_path}: {rule}")
+            self.rules.append({
+                "name": rule["name"],
+                "agent": rule["agent"],
+                "patterns": [re.compile(pattern, re.IGNORECASE) for pattern in rule["patterns"]],
+                "always": rule.get("always", False)
+            })
+            self.stats[rule["name"]] = 0
+
+    def match(self, text: str, roles: list = None) -> dict:
+        """
+        Find the first rule matching the query.
+        Args:
+            text (str): The query
+            roles (list): Agent roles available, rules for other roles are skipped
+        Returns:
+            dict: The matching rule (name, agent, patterns, always) or None to fall through to the neural router
+        """
+        query = text.strip()
+        multi_step = any(pattern.search(query) for pattern in self.fallthrough)
+        for rule in self.rules:
+            if multi_step and not rule["always"]:
+                continue
+            if roles is not None and rule["agent"] not in roles:
+                continue
+            if any(pattern.search(query) for pattern in rule["patterns"]):
+                self.stats[rule["name"]] += 1
+                return rule
+        self.stats["fallthrough"] += 1
+        return None
+
+    def report(self) -> dict:
+        """
+        Returns:
+            dict: Number of times each rule fired, and the number of queries left to the neural router
+        """
+        return dict(self.stats)
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+from typing import Iterator
+
+INDEX_FILENAME = "latest.json"
+
+class SessionJournal:
+    """
+    SessionJournal records the conversation of an agent as an append-only JSONL file, one event per line.
+    Events are flushed as they are written, so a crash loses nothing, and an index file
+    points to the latest journal so resuming a session never scans the conversation folder.
+    Events:
+        {"op": "reset", "messages": [...]}  the history was replaced
+        {"op": "push", "role": ..., "content": ...}  a message was appended
+        {"op": "replace", "index": i, "content": ...}  a message was compressed
+    """
+    def __init__(self, folder: str, session_name: str):
+        """
+        Args:
+            folder (str): Conversation folder of the agent (conversations/<agent_type>).
+            session_name (str): Name of the session, the journal is <session_name>.jsonl.
+        """
+        self.folder = folder
+        self.filename = f"{session_name}.jsonl"
+        self.path = os.path.join(folder, self.filename)
+        self.lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self.file = open(self.path, 'a', encoding="utf-8")
+        self.write_index()
+
+    def write_index(self) -> None:
+        """Point the index of the folder to this journal."""
+        index_path = os.path.join(self.folder, INDEX_FILENAME)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'w', encoding="utf-8") as f:
+            json.dump({"journal": self.filename, "time": time.time()}, f)
+        os.replace(tmp_path, index_path)
+
+    def append(self, event: dict) -> None:
+        with self.lock:
+            self.file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.file.flush()
+
+    def sync(self) -> None:
+        """Force the journal to disk."""
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+    @staticmethod
+    def find_latest(folder: str) -> str:
+        """
+        Returns:
+            str: Path of the latest journal of a folder, None if there is none
+        """
+        index_path = os.path.join(folder, INDEX_FILENAME)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, 'r', encoding="utf-8") as f:
+                path = os.path.join(folder, json.load(f)["journal"])
+        except (json.JSONDecodeError, KeyError):
+            return None
+        return path if os.path.exists(path) else None
+
+    @staticmethod
+    def read_events(path: str) -> Iterator[dict]:
+        """Stream the events of a journal, a truncated last line (crash while writing) is skipped."""
+        with open(path, 'r', encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    @staticmethod
+    def replay(path: str) -> list:
+        """
+        Rebuild the conversation of a journal.
+        Returns:
+            list: The messages
+        """
+        messages = []
+        for event in SessionJournal.read_events(path):
+            if event["op"] == "reset":
+                messages = list(event["messages"])
+            elif event["op"] == "push":
+                messages.append({'role': event["role"], 'content': event["content"]})
+            elif event["op"] == "replace" and event["index"] < len(messages):
+                messages[event["index"]] = {**messages[event["index"]], 'content': event["content"]}
+        return messages
@@ -8,6 +8,8 @@ from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 import librosa
 import pyaudio
 
+from sources.model_registry import registry
+
 audio_queue = queue.Queue()
 done = False
 
@@ -69,6 +71,10 @@ class Transcript:
     """
     def __init__(self):
         self.last_read = None
+        registry.register("whisper", self.load_pipeline)
+
+    def load_pipeline(self):
+        """Load the speech recognition pipeline, shared through the model registry."""
         device = self.get_device()
         torch_dtype = torch.float16 if device == "cuda" else torch.float32
         model_id = "distil-whisper/distil-medium.en"
@@ -79,7 +85,7 @@ class Transcript:
         model.to(device)
         processor = AutoProcessor.from_pretrained(model_id)
         
-        self.pipe = pipeline(
+        return pipeline(
             "automatic-speech-recognition",
             model=model,
             tokenizer=processor.tokenizer,
@@ -113,7 +119,7 @@ class Transcript:
             audio_data = np.mean(audio_data, axis=1)
         if sample_rate != 16000:
             audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=16000)
-        result = self.pipe(audio_data)
+        result = registry.get("whisper")(audio_data)
         return self.remove_hallucinations(result["text"])
     
 class AudioTranscriber:
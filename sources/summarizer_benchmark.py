@@ -0,0 +1,103 @@
+#!/usr/bin python3
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sources.summarizers import get_summarizer
+from sources.session_journal import SessionJournal
+from sources.utility import pretty_print
+
+def load_messages(folder: str, min_chars: int = 128, limit: int = 0) -> list:
+    """
+    Collect the messages worth compressing from recorded conversations.
+    Args:
+        folder (str): Conversation folder (conversations/<agent_type>/session_*.jsonl or memory_*.txt)
+        min_chars (int): Messages this short are never compressed by Memory and are skipped
+        limit (int): Maximum number of messages, 0 for all
+    Returns:
+        list: Message contents
+    """
+    messages = []
+    for path in sorted(glob.glob(os.path.join(folder, "*", "session_*.jsonl"))):
+        # messages as pushed, before any compression
+        messages += [event['content'] for event in SessionJournal.read_events(path)
+                     if event['op'] == 'push' and event['role'] != 'system' and len(event['content']) > min_chars]
+    for path in sorted(glob.glob(os.path.join(folder, "*", "memory_*.txt"))):
+        with open(path, 'r', encoding="utf-8") as f:
+            try:
+                conversation = json.load(f)
+            except json.JSONDecodeError:
+                continue
+        messages += [message['content'] for message in conversation
+                     if message['role'] != 'system' and len(message['content']) > min_chars]
+    # same filter as Memory.compress, identical messages are only summarized once
+    messages = list(dict.fromkeys(messages))
+    return messages[:limit] if limit > 0 else messages
+
+def run_backend(backend: str, messages: list, batch_size: int = 8) -> dict:
+    """
+    Summarize every message with a backend, one by one and then in batches.
+    Returns:
+        dict: latency percentiles in ms, compression ratio (summary chars / message chars) and batched total time
+    """
+    summarizer = get_summarizer(backend)
+    summarizer.summarize(messages[0])  # warm up, loads the model
+    latencies, ratios = [], []
+    for text in messages:
+        start_time = time.perf_counter()
+        summary = summarizer.summarize(text)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        ratios.append(len(summary) / len(text))
+    start_time = time.perf_counter()
+    summarizer.summarize_batch(messages, batch_size=batch_size)
+    batch_time = time.perf_counter() - start_time
+    latencies = np.array(latencies)
+    return {
+        "messages": len(messages),
+        "latency_ms": {
+            "mean": float(latencies.mean()),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+        },
+        "compression_ratio": float(np.mean(ratios)),
+        "chars_in": sum(len(text) for text in messages),
+        "sequential_s": float(latencies.sum() / 1000),
+        "batched_s": batch_time,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory summarizer latency and compression benchmark, run from the project root')
+    parser.add_argument('--folder', type=str, default="conversations", help='folder of the recorded conversations')
+    parser.add_argument('--backends', type=str, default="extractive,led", help='comma separated summarizer backends')
+    parser.add_argument('--limit', type=int, default=50, help='maximum number of messages, 0 for all')
+    parser.add_argument('--batch-size', type=int, default=8, help='messages per summarizer call in batched mode')
+    parser.add_argument('--save', type=str, default=None, help='save the results as JSON to this path')
+    args = parser.parse_args()
+
+    messages = load_messages(args.folder, limit=args.limit)
+    if not messages:
+        pretty_print(f"No recorded messages to summarize in {args.folder}, enable save_session in config.ini.", color="failure")
+        sys.exit(1)
+    pretty_print(f"{len(messages)} messages from {args.folder}", color="status")
+    results = {}
+    for backend in args.backends.split(","):
+        result = run_backend(backend.strip(), messages, args.batch_size)
+        results[backend.strip()] = result
+        latency = result["latency_ms"]
+        pretty_print(f"{backend}: mean {latency['mean']:.1f}ms, p50 {latency['p50']:.1f}ms, p95 {latency['p95']:.1f}ms, "
+                     f"compression ratio {result['compression_ratio']:.2f}, "
+                     f"total {result['sequential_s']:.2f}s sequential / {result['batched_s']:.2f}s batched", color="success")
+    if args.save is not None:
+        with open(args.save, 'w', encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        pretty_print(f"Results saved to {args.save}", color="success")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import re
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+
+from sources.model_registry import registry
+
+LED_MODEL = "pszemraj/led-base-book-summary"
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+|\n+')
+WORD_PATTERN = re.compile(r"\w+")
+SENTENCE_END_PATTERN = re.compile(r'[.!?]+["\')\]]*')
+
+def load_led() -> tuple:
+    """Load the tokenizer and model of the LED summarizer."""
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    tokenizer = AutoTokenizer.from_pretrained(LED_MODEL)
+    model = AutoModelForSeq2SeqLM.from_pretrained(LED_MODEL)
+    return tokenizer, model
+
+registry.register("summarizer", load_led)
+
+def trim_to_sentence(text: str) -> str:
+    """Cut a text after its last complete sentence, the text is kept whole if it has none."""
+    ends = [match.end() for match in SENTENCE_END_PATTERN.finditer(text)]
+    return text[:ends[-1]] if ends else text
+
+class Summarizer(ABC):
+    """
+    Summarizer is the interface of the memory compression backends.
+    """
+    name = "base"
+
+    @abstractmethod
+    def summarize(self, text: str, min_length: int = 64) -> str:
+        """
+        Summarize a message.
+        Args:
+            text (str): The text to summarize
+            min_length (int): Texts shorter than 1.5 times this length are returned as is
+        Returns:
+            str: The summary
+        """
+        pass
+
+    def summarize_batch(self, texts: list, min_length: int = 64, batch_size: int = 8) -> list:
+        """
+        Summarize several messages, backends running a model override it to batch the calls.
+        Args:
+            texts (list): The texts to summarize
+            min_length (int): Texts shorter than 1.5 times this length are returned as is
+            batch_size (int): Number of texts per model call
+        Returns:
+            list: One summary per text
+        """
+        return [self.summarize(text, min_length) for text in texts]
+
+class ExtractiveSummarizer(Summarizer):
+    """
+    ExtractiveSummarizer keeps the most central sentences of a message, ranked with TextRank
+    over a sentence similarity graph. It runs in milliseconds on CPU and never rewrites the text.
+    """
+    name = "extractive"
+
+    def __init__(self, ratio: float = 0.5, damping: float = 0.85, iterations: int = 30):
+        """
+        Args:
+            ratio (float): Target length of the summary relative to the text.
+            damping (float): TextRank damping factor.
+            iterations (int): Power iterations of TextRank.
+        """
+        self.ratio = ratio
+        self.damping = damping
+        self.iterations = iterations
+
+    def split_sentences(self, text: str) -> list:
+        return [sentence.strip() for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+
+    def rank(self, sentences: list) -> np.ndarray:
+        """
+        Score sentences with TextRank.
+        Returns:
+            np.ndarray: One score per sentence
+        """
+        words = [WORD_PATTERN.findall(sentence.lower()) for sentence in sentences]
+        vocabulary = {word: idx for idx, word in enumerate(dict.fromkeys(w for ws in words for w in ws))}
+        counts = np.zeros((len(sentences), max(len(vocabulary), 1)), dtype=np.float32)
+        for row, sentence_words in enumerate(words):
+            for word in sentence_words:
+                counts[row, vocabulary[word]] += 1
+        # log term frequency weighted by inverse sentence frequency
+        weights = np.log1p(counts) * np.log((1 + len(sentences)) / (1 + (counts > 0).sum(axis=0)))
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = weights / norms
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, 0.0)
+        totals = similarity.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        transition = similarity / totals
+        scores = np.full(len(sentences), 1.0 / len(sentences))
+        for _ in range(self.iterations):
+            scores = (1 - self.damping) / len(sentences) + self.damping * transition.T @ scores
+        return scores
+
+    def summarize(self, text: str, min_length: int = 64) -> str:
+        if len(text) < min_length*1.5:
+            return text
+        sentences = self.split_sentences(text)
+        if len(sentences) <= 2:
+            return text
+        target = max(min_length, int(len(text) * self.ratio))
+        selected, length = [], 0
+        for idx in np.argsort(-self.rank(sentences), kind="stable"):
+            if length >= target:
+                break
+            selected.append(idx)
+            length += len(sentences[idx]) + 1
+        return " ".join(sentences[idx] for idx in sorted(selected))
+
+class LedSummarizer(Summarizer):
+    """
+    LedSummarizer rewrites a message with the LED abstractive model and beam search.
+    Better summaries than the extractive backend, but seconds per message on CPU.
+    """
+    name = f"led:{LED_MODEL}"
+
+    def summarize(self, text: str, min_length: int = 64) -> str:
+        return self.summarize_batch([text], min_length)[0]
+
+    def max_length(self, text: str, min_length: int) -> int:
+        """Maximum summary length of a text, in tokens."""
+        return len(text) // 2 if len(text) > min_length*2 else min_length*2
+
+    def summarize_batch(self, texts: list, min_length: int = 64, batch_size: int = 8) -> list:
+        """
+        Summarize texts in padded batches, one generate call per batch.
+        Texts are sorted by length so each batch holds texts of similar length and little padding.
+        Each summary is capped to the max length of its own text, a summary cut by its cap ends on its last
+        complete sentence instead of a fragment.
+        """
+        summaries = list(texts)
+        pending = sorted((idx for idx, text in enumerate(texts) if len(text) >= min_length*1.5),
+                         key=lambda idx: len(texts[idx]))
+        if not pending:
+            return summaries
+        tokenizer, model = registry.get("summarizer")
+        for start in range(0, len(pending), max(batch_size, 1)):
+            batch = pending[start:start+batch_size]
+            max_lengths = [self.max_length(texts[idx], min_length) for idx in batch]
+            inputs = tokenizer(["summarize: " + texts[idx] for idx in batch], return_tensors="pt",
+                               max_length=512, truncation=True, padding=True)
+            summary_ids = model.generate(
+                inputs['input_ids'],
+                attention_mask=inputs['attention_mask'],
+                max_length=max(max_lengths),  # Maximum length of the longest summary of the batch
+                min_length=min_length,  # Minimum length of the summary
+                length_penalty=1.0,  # Adjusts length preference
+                num_beams=4,  # Beam search for better quality
+                early_stopping=True  # Stop when all beams finish
+            )
+            capped = tokenizer.batch_decode([ids[:max_length] for ids, max_length in zip(summary_ids, max_lengths)],
+                                            skip_special_tokens=True)
+            whole = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+            for idx, summary, full_summary in zip(batch, capped, whole):
+                if summary != full_summary:
+                    summary = trim_to_sentence(summary)
+                summaries[idx] = summary.replace('summary:', '')
+        return summaries
+
+summarizer_backends = {
+    "extractive": ExtractiveSummarizer,
+    "led": LedSummarizer,
+}
+summarizers = {}
+summarizers_lock = threading.Lock()
+
+def cuda_available() -> bool:
+    """LED is only fast enough for the request path on a GPU, torch is not needed by the extractive backend."""
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+def get_summarizer(backend: str = "auto") -> Summarizer:
+    """
+    Get a summarizer backend, created once per process.
+    Args:
+        backend (str): "extractive", "led" or "auto" (LED on cuda, extractive otherwise), only configured backends load a model
+    Returns:
+        Summarizer: The summarizer
+    """
+    if backend == "auto":
+        backend = "led" if cuda_available() else "extractive"
+    if backend not in summarizer_backends:
+        raise ValueError(f"Unknown summarizer: {backend}")
+    with summarizers_lock:
+        if backend not in summarizers:
+            summarizers[backend] = summarizer_backends[backend]()
+        return summarizers[backend]
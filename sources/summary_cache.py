@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+class SummaryCache:
+    """
+    SummaryCache maps the hash of a message to its summary, so a message is never summarized twice.
+    Summaries are keyed by content hash, they are shared between agents and persisted across sessions.
+    """
+    def __init__(self, path: str, max_entries: int = 10000):
+        """
+        Args:
+            path (str): JSON file of the cache, loaded on first use.
+            max_entries (int): Maximum number of summaries kept, least recently used are dropped first.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.loaded = False
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def content_hash(text: str, model: str = "") -> str:
+        return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding="utf-8") as f:
+                self.entries = OrderedDict(json.load(f))
+        except (json.JSONDecodeError, OSError):
+            self.entries = OrderedDict()
+
+    def get(self, key: str) -> str:
+        """
+        Returns:
+            str: The summary stored under a content hash, or None
+        """
+        with self.lock:
+            self.load()
+            summary = self.entries.get(key)
+            if summary is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return summary
+
+    def put(self, key: str, summary: str) -> None:
+        with self.lock:
+            self.load()
+            self.entries[key] = summary
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def save(self) -> None:
+        """Write the cache to disk if it changed."""
+        with self.lock:
+            if not self.dirty:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
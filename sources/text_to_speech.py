@@ -6,6 +6,8 @@ import re
 import platform
 from sys import modules
 
+from sources.model_registry import registry
+
 class Speech():
     """
     Speech is a class for generating speech from text.
@@ -21,9 +23,11 @@ class Speech():
             "chinese": ['zf_xiaobei', 'zf_xiaoni', 'zf_xiaoxiao', 'zf_xiaoyi', 'zm_yunjian', 'zm_yunxi', 'zm_yunxia', 'zm_yunyang'],
             "french": ['ff_siwis']
         }
-        self.pipeline = None
+        self.pipeline_name = None
         if enable:
-            self.pipeline = KPipeline(lang_code=self.lang_map[language])
+            lang_code = self.lang_map[language]
+            self.pipeline_name = f"kokoro_{lang_code}"
+            registry.register(self.pipeline_name, lambda: KPipeline(lang_code=lang_code))
         self.voice = self.voice_map[language][2]
         self.speed = 1.2
 
@@ -35,11 +39,11 @@ class Speech():
             sentence (str): The text to convert to speech. Will be pre-processed.
             voice_number (int, optional): Index of the voice to use from the voice map.
         """
-        if not self.pipeline:
+        if not self.pipeline_name:
             return
         sentence = self.clean_sentence(sentence)
         self.voice = self.voice_map["english"][voice_number]
-        generator = self.pipeline(
+        generator = registry.get(self.pipeline_name)(
             sentence, voice=self.voice,
             speed=self.speed, split_pattern=r'\n+'
         )
@@ -0,0 +1,105 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+from unittest import mock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.context_builder import ContextBuilder, TokenCounter
+from sources.memory import Memory, summarizer_lock
+from sources.summary_cache import SummaryCache
+
+def make_conversation(turns: int) -> list:
+    messages = [{'role': 'system', 'content': "You are a helpful assistant."}]
+    for i in range(turns):
+        messages.append({'role': 'user', 'content': f"question {i} " + "word " * 50})
+        messages.append({'role': 'assistant', 'content': f"answer {i} " + "word " * 50})
+    return messages
+
+class TestContextBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.summarized = []
+        def summarize(text):
+            self.summarized.append(text)
+            return text.split("\n")[0][:40]
+        self.builder = ContextBuilder(max_tokens=300, recent_messages=2, summarize=summarize)
+
+    def test_under_budget_is_untouched(self):
+        messages = make_conversation(1)
+        self.assertEqual(self.builder.build(messages), messages)
+        self.assertEqual(self.builder.stats["tokens_saved"], 0)
+
+    def test_fits_budget_and_keeps_recent(self):
+        messages = make_conversation(10)
+        context = self.builder.build(messages)
+        self.assertLessEqual(self.builder.counter.count_messages(context), 300)
+        self.assertEqual(context[0], messages[0])
+        self.assertEqual(context[-2:], messages[-2:])
+        self.assertTrue(context[1]['content'].startswith("Summary of the earlier conversation"))
+        self.assertGreater(self.builder.stats["tokens_saved"], 0)
+        self.assertTrue(self.summarized)
+
+    def test_oversized_last_message_is_truncated(self):
+        messages = make_conversation(1) + [{'role': 'user', 'content': "page " * 1000}]
+        context = ContextBuilder(max_tokens=200).build(messages)
+        self.assertLessEqual(TokenCounter().count_messages(context), 200)
+        self.assertIn("[...]", context[-1]['content'])
+
+    def test_system_prompt_over_budget(self):
+        messages = [{'role': 'system', 'content': "rule " * 400}]
+        self.assertEqual(ContextBuilder(max_tokens=100).build(messages), messages)
+        context = ContextBuilder(max_tokens=100).build(messages + [{'role': 'user', 'content': "what is the plan?"}])
+        self.assertEqual(context[-1], {'role': 'user', 'content': "what is the plan?"})
+
+    def test_no_recent_messages_keeps_query(self):
+        messages = make_conversation(10)
+        builder = ContextBuilder(max_tokens=300, recent_messages=0, summarize=lambda text: text[:40])
+        context = builder.build(messages)
+        self.assertEqual(context[-1], messages[-1])
+        self.assertLessEqual(builder.counter.count_messages(context), 300)
+
+    def test_context_does_not_wait_for_compression(self):
+        with tempfile.TemporaryDirectory() as folder, \
+             mock.patch("sources.memory.summary_cache", SummaryCache(os.path.join(folder, "summaries.json"))):
+            memory = Memory("You are a helpful assistant.", memory_compression=False)
+            memory.context_tokens = 300
+            memory.summarizer_backend = "extractive"
+            for message in make_conversation(10)[1:]:
+                memory.push(message['role'], message['content'])
+            # a background compression holds the summarizer
+            with summarizer_lock:
+                context = memory.get_context()
+            self.assertEqual(context[-1], memory.get()[-1])
+            self.assertLessEqual(TokenCounter().count_messages(context), 300)
+            memory.wait_compression(timeout=5)
+
+    def test_summaries_computed_in_the_background(self):
+        calls = []
+        class FirstLine:
+            name = "first-line"
+            def summarize_batch(self, texts, batch_size=8):
+                calls.append((threading.current_thread(), len(texts)))
+                return [text.split("\n")[0][:40] for text in texts]
+        with tempfile.TemporaryDirectory() as folder, \
+             mock.patch("sources.memory.get_summarizer", return_value=FirstLine()), \
+             mock.patch("sources.memory.summary_cache", SummaryCache(os.path.join(folder, "summaries.json"))):
+            memory = Memory("You are a helpful assistant.", memory_compression=False)
+            memory.context_tokens = 300
+            memory.context_recent_messages = 2
+            for message in make_conversation(10)[1:]:
+                memory.push(message['role'], message['content'])
+            first = memory.get_context()
+            # the request only queued the summaries
+            self.assertTrue(all(thread is not threading.current_thread() for thread, _ in calls))
+            self.assertTrue(memory.wait_compression(timeout=5))
+            self.assertTrue(calls)
+            second = memory.get_context()
+            self.assertEqual(second[-1], memory.get()[-1])
+            self.assertLessEqual(TokenCounter().count_messages(second), 300)
+            # cached summaries replace the raw messages the first context had to cut
+            self.assertIn("user: question 0", second[1]['content'])
+            self.assertNotEqual(first[1], second[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.conversation_log import ConversationLog
+from sources.memory import Memory
+from sources.session_journal import SessionJournal
+
+class TestConversationLog(unittest.TestCase):
+
+    def setUp(self):
+        self.log = ConversationLog()
+
+    def test_append_and_select(self):
+        first = self.log.append('user', "hello")
+        indices = self.log.extend([{'role': 'assistant', 'content': "hi"}, {'role': 'user', 'content': "bye"}])
+        self.assertEqual(indices, [1, 2])
+        view = self.log.select([first, 2])
+        self.assertEqual([message['content'] for message in view], ["hello", "bye"])
+        # views share the entries, nothing is copied
+        self.assertIs(view[0], self.log.select([first])[0])
+
+    def test_replace_keeps_snapshots(self):
+        index = self.log.append('assistant', "a long answer")
+        snapshot = self.log.select([index])
+        self.assertFalse(self.log.replace(index, "summary", expected="another answer"))
+        self.assertTrue(self.log.replace(index, "summary", expected="a long answer"))
+        self.assertEqual(snapshot[0]['content'], "a long answer")
+        self.assertEqual(self.log.get(index)['content'], "summary")
+
+class TestMemoryHandoff(unittest.TestCase):
+
+    def setUp(self):
+        self.log = ConversationLog()
+        self.coder = Memory("coder prompt", memory_compression=False, log=self.log)
+        self.casual = Memory("casual prompt", memory_compression=False, log=self.log)
+
+    def test_handoff_skips_tool_feedback(self):
+        self.coder.start_turn()
+        self.coder.push('user', "list the files")
+        self.coder.push('assistant', "```bash\nls\n```")
+        # Agent.execute_modules pushes tool feedback as a user message
+        self.coder.push('user', "[success] a.txt b.txt")
+        self.coder.push('assistant', "There are two files: a.txt and b.txt.")
+        self.casual.link(self.coder.last_exchange())
+        self.assertEqual(self.casual.get(), [
+            {'role': 'system', 'content': "casual prompt"},
+            {'role': 'user', 'content': "list the files"},
+            {'role': 'assistant', 'content': "There are two files: a.txt and b.txt."},
+        ])
+
+    def test_linked_summary_is_journaled(self):
+        with tempfile.TemporaryDirectory() as folder:
+            self.casual.conversation_folder = folder
+            self.casual.open_journal("casual_agent")
+            self.coder.summarizer_backend = "extractive"
+            answer = " ".join(f"Sentence number {i} explains one more step of the build." for i in range(12))
+            # the first exchange is never compressed
+            self.coder.push('user', "hello")
+            self.coder.push('assistant', "hi")
+            self.coder.start_turn()
+            self.coder.push('user', "how do I build it?")
+            self.coder.push('assistant', answer)
+            self.casual.link(self.coder.last_exchange())
+            self.coder.compress()
+            self.casual.journal.close()
+            replayed = SessionJournal.replay(self.casual.journal.path)
+            self.assertEqual(replayed, self.casual.get())
+            self.assertLess(len(replayed[-1]['content']), len(answer))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.conversation_store import ConversationStore, StoreJournal
+
+class TestConversationStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ConversationStore(os.path.join(self.tmp.name, "conversations.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_wal_mode(self):
+        mode = self.store.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_last_session_with_journal_events(self):
+        old = StoreJournal(self.store, "old", "casual_agent")
+        old.append({"op": "reset", "messages": [{'role': 'system', 'content': "prompt"}]})
+        old.append({"op": "push", "index": 1, "role": "user", "content": "old question"})
+        new = StoreJournal(self.store, "new", "casual_agent")
+        new.append({"op": "reset", "messages": [{'role': 'system', 'content': "prompt"}]})
+        new.append({"op": "push", "index": 1, "role": "user", "content": "hello"})
+        new.append({"op": "push", "index": 2, "role": "assistant", "content": "a long answer"})
+        new.append({"op": "replace", "index": 2, "content": "summary"})
+        self.assertEqual(self.store.last_session("casual_agent"), [
+            {'role': 'system', 'content': "prompt"},
+            {'role': 'user', 'content': "hello"},
+            {'role': 'assistant', 'content': "summary"},
+        ])
+        self.assertEqual(self.store.last_session("code_agent"), [])
+
+    def test_history_across_agents(self):
+        self.store.append("s1", "casual_agent", 1, "user", "find my resume")
+        self.store.append("s1", "file_agent", 1, "user", "find my resume pdf")
+        self.store.append("s1", "code_agent", 1, "user", "write a snake game")
+        rows = self.store.history(contains="resume")
+        self.assertEqual({row["agent_type"] for row in rows}, {"casual_agent", "file_agent"})
+        self.assertEqual(len(self.store.history(agent_type="code_agent")), 1)
+        self.assertEqual(len(self.store.history(limit=2)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
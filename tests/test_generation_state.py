@@ -0,0 +1,81 @@
+import unittest
+import os
+import sys
+import threading
+import types
+from unittest import mock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+# server/sources is imported as "sources" by the server, load it under another name
+server_sources = types.ModuleType("server_sources")
+server_sources.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'sources')]
+sys.modules.setdefault("server_sources", server_sources)
+from server_sources import generator
+from server_sources.generator import GenerationState
+
+class TestGenerationState(unittest.TestCase):
+
+    def setUp(self):
+        self.state = GenerationState()
+        self.state.is_generating = True
+
+    def test_delta_since_offset(self):
+        for chunk in ["Hel", "lo wor", "ld"]:
+            self.state.append(chunk)
+        self.assertEqual(self.state.current_buffer, "Hello world")
+        self.assertEqual(self.state.text_since(0), "Hello world")
+        self.assertEqual(self.state.text_since(4), "o world")
+        self.assertEqual(self.state.text_since(9), "ld")
+        self.assertEqual(self.state.text_since(11), "")
+        status = self.state.status(since=6)
+        self.assertEqual(status["delta"], "world")
+        self.assertEqual(status["offset"], 11)
+        self.assertNotIn("sentence", status)
+        # without since the whole text is returned, as before
+        self.assertEqual(self.state.status()["sentence"], "Hello world")
+
+    def test_sentence_boundaries(self):
+        self.state.append("First one. Sec")
+        self.assertEqual(self.state.last_complete_sentence, "First one.")
+        self.assertEqual(self.state.sentence_end, len("First one. "))
+        self.state.append("ond one!")
+        # no space yet, the sentence may go on
+        self.assertEqual(self.state.last_complete_sentence, "First one.")
+        self.state.append(" Third?\nFourth")
+        self.assertEqual(self.state.last_complete_sentence, "Third?")
+        self.state.finish()
+        self.assertEqual(self.state.last_complete_sentence, "Fourth")
+        self.assertEqual(self.state.sentence_end, self.state.length)
+
+    def test_wait_for_text(self):
+        self.state.append("a")
+        self.assertEqual(self.state.wait_for_text(0, timeout=0), ("a", False))
+        threading.Timer(0.05, self.state.append, args=("b",)).start()
+        self.assertEqual(self.state.wait_for_text(1, timeout=5), ("b", False))
+        self.state.finish("boom")
+        self.assertEqual(self.state.wait_for_text(2, timeout=5), ("", True))
+        self.assertEqual(self.state.status()["error"], "boom")
+
+    def test_boundary_split_across_chunks(self):
+        for chunk in ["Hi", "!", "!", " ", "there"]:
+            self.state.append(chunk)
+        self.assertEqual(self.state.last_complete_sentence, "Hi!!")
+        self.assertEqual(self.state.sentence_end, len("Hi!! "))
+
+    def test_long_sentence_not_rescanned(self):
+        scanned = []
+        pattern = generator.SENTENCE_END
+        class Recorder:
+            def finditer(self, text):
+                scanned.append(len(text))
+                return pattern.finditer(text)
+        with mock.patch.object(generator, "SENTENCE_END", Recorder()):
+            for _ in range(2000):
+                self.state.append("x = y ")
+            self.state.append("end\n")
+        self.assertLessEqual(max(scanned), len("x = y ") + generator.SENTENCE_OVERLAP)
+        self.assertEqual(self.state.last_complete_sentence, ("x = y " * 2000 + "end").strip())
+        self.assertEqual(self.state.sentence_end, self.state.length)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import sys
+import threading
+import time
+import types
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+# server/sources is imported as "sources" by the server, load it under another name
+server_sources = types.ModuleType("server_sources")
+server_sources.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'sources')]
+sys.modules.setdefault("server_sources", server_sources)
+from server_sources.generator import GeneratorLLM
+from server_sources.job_queue import JobQueue, QueueFull
+
+class EchoLLM(GeneratorLLM):
+    """Answers with the last message word by word, each word waits for `release`."""
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Semaphore(0)
+
+    def generate(self, history, state, model):
+        for word in history[-1]['content'].split():
+            self.release.acquire()
+            if state.cancelled:
+                break
+            state.append(word + " ")
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.generator = EchoLLM()
+        self.generator.set_model("echo")
+        self.jobs = JobQueue(self.generator, workers=1, max_queued=2)
+
+    def wait(self, job):
+        return "".join(job.state.stream(heartbeat=5))
+
+    def test_jobs_run_in_order(self):
+        first = self.jobs.submit([{'role': 'user', 'content': "one two"}])
+        second = self.jobs.submit([{'role': 'user', 'content': "three"}])
+        self.assertIs(self.jobs.get(second.id), second)
+        self.assertIs(self.jobs.get(), second)
+        for _ in range(3):
+            self.generator.release.release()
+        self.assertEqual(self.wait(first), "one two ")
+        self.assertEqual(self.wait(second), "three ")
+        stats = self.jobs.stats()
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["jobs"]["submitted"], 2)
+
+    def test_submit_many_and_throughput(self):
+        batch = self.jobs.submit_many([[{'role': 'user', 'content': "a b"}], [{'role': 'user', 'content': "c"}]])
+        with self.assertRaises(QueueFull):
+            self.jobs.submit_many([[{'role': 'user', 'content': "d"}]] * 3)
+        for _ in range(3):
+            self.generator.release.release()
+        self.assertEqual([self.wait(job) for job in batch], ["a b ", "c "])
+        while self.jobs.stats()["jobs"].get("done", 0) < 2:
+            time.sleep(0.01)
+        stats = self.jobs.stats()["generator"]
+        # one token per appended chunk
+        self.assertEqual(stats["tokens"], 3)
+        self.assertGreater(stats["tokens_per_s"], 0)
+
+    def test_queue_is_bounded(self):
+        running = self.jobs.submit([{'role': 'user', 'content': "a"}])
+        # the worker takes the first job, two more fill the queue
+        while running.status == "queued":
+            time.sleep(0.01)
+        queued = [self.jobs.submit([{'role': 'user', 'content': "b"}]) for _ in range(2)]
+        self.assertEqual(self.jobs.position(queued[1]), 1)
+        with self.assertRaises(QueueFull):
+            self.jobs.submit([{'role': 'user', 'content': "c"}])
+        self.assertEqual(self.jobs.stats()["jobs"]["rejected"], 1)
+        for _ in range(3):
+            self.generator.release.release()
+
+    def test_cancel(self):
+        running = self.jobs.submit([{'role': 'user', 'content': "one two three"}])
+        queued = self.jobs.submit([{'role': 'user', 'content': "four"}])
+        self.assertTrue(self.jobs.cancel(queued.id))
+        self.assertEqual(queued.status, "cancelled")
+        self.assertEqual(queued.state.error, "Generation cancelled")
+        self.generator.release.release()
+        stream = running.state.stream(heartbeat=5)
+        self.assertEqual(next(stream), "one ")
+        self.assertTrue(self.jobs.cancel(running.id))
+        self.generator.release.release()
+        self.assertEqual("".join(stream), "")
+        self.assertEqual(running.state.error, "Generation cancelled")
+        self.assertFalse(self.jobs.cancel(queued.id))
+
+if __name__ == '__main__':
+    unittest.main()
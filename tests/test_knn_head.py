@@ -0,0 +1,49 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.knn_head import KnnHead
+
+class TestKnnHead(unittest.TestCase):
+
+    def setUp(self):
+        self.head = KnnHead(dim=3, capacity=2)
+
+    def test_empty_predict(self):
+        self.assertEqual(self.head.predict(np.ones(3)), [])
+
+    def test_nearest_label_wins(self):
+        self.head.add(np.array([[1.0, 0, 0], [0, 1.0, 0], [0, 0, 1.0]]), ["web", "code", "files"])
+        predictions = self.head.predict(np.array([0.1, 0.9, 0.0]), k=3)
+        self.assertEqual(predictions[0][0], "code")
+        self.assertAlmostEqual(sum(score for _, score in predictions), 1.0, places=5)
+
+    def test_growth_keeps_examples(self):
+        rng = np.random.default_rng(0)
+        embeddings = rng.standard_normal((50, 3))
+        self.head.add(embeddings, ["talk"] * 50)
+        self.assertEqual(self.head.size, 50)
+        self.assertGreaterEqual(self.head.capacity, 50)
+        self.assertTrue(np.allclose(np.linalg.norm(self.head.matrix[:50], axis=1), 1.0))
+
+    def test_batch_matches_single(self):
+        self.head.add(np.array([[1.0, 0, 0], [0, 1.0, 0]]), ["web", "code"])
+        queries = np.array([[1.0, 0.1, 0], [0.1, 1.0, 0]])
+        batch = self.head.predict_batch(queries, k=2)
+        self.assertEqual(batch, [self.head.predict(query, k=2) for query in queries])
+
+    def test_memmap_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "routed")
+            head = KnnHead(dim=3, path=path, capacity=1)
+            head.add(np.array([[1.0, 0, 0], [0, 1.0, 0]]), ["web", "code"])
+            head.flush()
+            reloaded = KnnHead(dim=3, path=path)
+            self.assertEqual(reloaded.size, 2)
+            self.assertEqual(reloaded.predict(np.array([0, 1.0, 0]), k=1)[0][0], "code")
+            del head, reloaded
+
+if __name__ == '__main__':
+    unittest.main()
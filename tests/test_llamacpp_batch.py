@@ -0,0 +1,213 @@
+import unittest
+import os
+import sys
+import types
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+# server/sources is imported as "sources" by the server, load it under another name
+server_sources = types.ModuleType("server_sources")
+server_sources.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'sources')]
+sys.modules.setdefault("server_sources", server_sources)
+from server_sources.generator import GenerationState
+from server_sources.llamacpp_batch import BatchDecoder, Sequence, sample
+
+EOS = 256
+
+class ByteLLM:
+    """One token per byte, EOS after them."""
+    def detokenize(self, tokens):
+        return bytes(token for token in tokens if token < EOS)
+
+class FakeBatch:
+    def __init__(self, n_batch):
+        self.n_tokens = 0
+        self.token = [0] * n_batch
+        self.pos = [0] * n_batch
+        self.n_seq_id = [0] * n_batch
+        self.seq_id = [[0] for _ in range(n_batch)]
+        self.logits = [False] * n_batch
+
+    def rows(self):
+        return [(self.token[i], self.pos[i], self.seq_id[i][0], self.logits[i]) for i in range(self.n_tokens)]
+
+def make_decoder(slots=2, n_batch=8, stops=()):
+    """A BatchDecoder without llama.cpp context: no decode thread, clear() is recorded."""
+    decoder = BatchDecoder.__new__(BatchDecoder)
+    decoder.llm = ByteLLM()
+    decoder.slots = slots
+    decoder.n_ctx = 64
+    decoder.n_batch = n_batch
+    decoder.stops = list(stops)
+    decoder.eog = frozenset({EOS})
+    decoder.temperature, decoder.top_k, decoder.top_p = 0.0, 40, 0.95
+    decoder.rng = np.random.default_rng(0)
+    decoder.batch = FakeBatch(n_batch)
+    decoder.cleared = []
+    decoder.clear = lambda seq_id, start=0: decoder.cleared.append((seq_id, start))
+    decoder.init_scheduler()
+    return decoder
+
+def make_sequence(tokens, stops=()):
+    return Sequence(tokens, list(stops), GenerationState())
+
+class TestSample(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.logits = np.array([0.0, 3.0, 1.0, 2.5, -1.0])
+
+    def test_greedy_at_zero_temperature(self):
+        for _ in range(10):
+            self.assertEqual(sample(self.logits, 0.0, 40, 0.95, self.rng), 1)
+
+    def test_top_k_truncates(self):
+        drawn = {sample(self.logits, 5.0, 2, 1.0, self.rng) for _ in range(200)}
+        self.assertEqual(drawn, {1, 3})
+
+    def test_top_p_truncates(self):
+        # token 1 alone holds more than 10% of the mass
+        drawn = {sample(self.logits, 1.0, 5, 0.1, self.rng) for _ in range(200)}
+        self.assertEqual(drawn, {1})
+
+class TestEmit(unittest.TestCase):
+
+    def emit_text(self, decoder, sequence, text):
+        return [decoder.emit(sequence, byte) for byte in text.encode("utf-8")]
+
+    def test_stop_string_held_back_across_tokens(self):
+        decoder = make_decoder(stops=["</s>"])
+        sequence = make_sequence([1], stops=["</s>"])
+        self.assertEqual(self.emit_text(decoder, sequence, "Hello <"), [False] * 7)
+        # "o <" could still be the start of the stop string
+        self.assertEqual(sequence.state.current_buffer, "Hell")
+        self.assertEqual(self.emit_text(decoder, sequence, "/s>"), [False, False, True])
+        self.assertEqual(sequence.state.current_buffer, "Hello ")
+
+    def test_partial_stop_string_released(self):
+        decoder = make_decoder(stops=["</s>"])
+        sequence = make_sequence([1], stops=["</s>"])
+        self.emit_text(decoder, sequence, "a </b> c")
+        decoder.running.append(sequence)
+        sequence.seq_id = 0
+        decoder.free_slots.remove(0)
+        decoder.retire(sequence)
+        self.assertEqual(sequence.state.current_buffer, "a </b> c")
+
+    def test_utf8_split_across_tokens(self):
+        decoder = make_decoder()
+        sequence = make_sequence([1])
+        first, second = "é".encode("utf-8")
+        self.assertFalse(decoder.emit(sequence, first))
+        self.assertEqual(sequence.state.current_buffer, "")
+        self.assertFalse(decoder.emit(sequence, second))
+        self.assertEqual(sequence.state.current_buffer, "é")
+
+    def test_end_of_generation_token(self):
+        decoder = make_decoder()
+        sequence = make_sequence([1])
+        self.assertTrue(decoder.emit(sequence, EOS))
+        self.assertEqual(sequence.state.current_buffer, "")
+        self.assertEqual(sequence.generated, 1)
+
+class TestScheduling(unittest.TestCase):
+
+    def test_admit_picks_longest_prefix_slot(self):
+        decoder = make_decoder()
+        decoder.slot_tokens[1] = [1, 2, 3, 4]
+        sequence = make_sequence([1, 2, 3, 9, 10])
+        decoder.waiting.append(sequence)
+        rows = decoder.schedule()
+        self.assertEqual(sequence.seq_id, 1)
+        self.assertEqual(decoder.cleared, [(1, 3)])
+        self.assertEqual(decoder.batch.rows(), [(9, 3, 1, False), (10, 4, 1, True)])
+        self.assertEqual(rows, {sequence: 1})
+        self.assertEqual(decoder.metrics.stats()["saved_tokens"], 3)
+
+    def test_identical_prompt_decodes_last_token_again(self):
+        decoder = make_decoder()
+        decoder.slot_tokens[0] = [1, 2, 3]
+        sequence = make_sequence([1, 2, 3])
+        decoder.waiting.append(sequence)
+        decoder.schedule()
+        self.assertEqual(decoder.cleared, [(0, 2)])
+        self.assertEqual(decoder.batch.rows(), [(3, 2, 0, True)])
+
+    def test_prompt_prefilled_in_chunks_after_running_tokens(self):
+        decoder = make_decoder(n_batch=4)
+        running = make_sequence([5])
+        decoder.waiting.append(running)
+        decoder.schedule()
+        running.last_token = 7
+        prompt = make_sequence([1, 2, 3, 4, 5, 6])
+        decoder.waiting.append(prompt)
+        rows = decoder.schedule()
+        # one token of the running sequence first, the prompt fills the rest of the batch without logits
+        self.assertEqual(decoder.batch.rows(), [(7, 1, 0, True), (1, 0, 1, False), (2, 1, 1, False), (3, 2, 1, False)])
+        self.assertEqual(rows, {running: 0})
+        self.assertTrue(prompt.prefilling)
+        running.last_token = 8
+        rows = decoder.schedule()
+        self.assertEqual(decoder.batch.rows(), [(8, 2, 0, True), (4, 3, 1, False), (5, 4, 1, False), (6, 5, 1, True)])
+        self.assertEqual(rows, {running: 0, prompt: 3})
+
+    def test_cancelled_waiting_sequence_done_without_a_free_slot(self):
+        decoder = make_decoder(slots=1)
+        running = make_sequence([1, 2])
+        waiting = make_sequence([3, 4])
+        decoder.waiting.extend([running, waiting])
+        decoder.schedule()
+        waiting.state.cancel()
+        decoder.schedule()
+        self.assertTrue(waiting.done.is_set())
+        self.assertEqual(len(decoder.waiting), 0)
+        self.assertEqual(decoder.running, [running])
+
+    def test_retired_tokens_kept_for_the_next_prompt(self):
+        decoder = make_decoder(slots=1)
+        sequence = make_sequence([1, 2])
+        decoder.waiting.append(sequence)
+        decoder.schedule()
+        sequence.last_token = 3
+        decoder.schedule()
+        decoder.retire(sequence)
+        self.assertTrue(sequence.done.is_set())
+        self.assertEqual(decoder.slot_tokens[0], [1, 2, 3])
+        self.assertEqual(decoder.free_slots, [0])
+
+class TestDecodeErrors(unittest.TestCase):
+
+    def setUp(self):
+        self.decoder = make_decoder(slots=1)
+        self.decoder.decode = lambda: 0
+        self.decoder.logits = lambda row: np.array([0.0, 1.0])
+        self.running = make_sequence([1, 2])
+        self.waiting = make_sequence([3])
+        self.decoder.waiting.extend([self.running, self.waiting])
+
+    def test_step_samples_and_emits(self):
+        self.decoder.safe_step()
+        self.assertEqual(self.running.last_token, 1)
+        self.assertEqual(self.running.generated, 1)
+        self.assertFalse(self.running.done.is_set())
+
+    def test_error_ends_the_batch_not_the_loop(self):
+        def emit(sequence, token):
+            raise ValueError("bad token")
+        self.decoder.emit = emit
+        self.decoder.safe_step()
+        for sequence in (self.running, self.waiting):
+            self.assertTrue(sequence.done.is_set())
+            self.assertEqual(sequence.error, "bad token")
+        self.assertEqual((self.decoder.running, self.decoder.free_slots), ([], [0]))
+        self.assertEqual(self.decoder.slot_tokens[0], [])
+        # the next request is served
+        self.decoder.emit = lambda sequence, token: True
+        sequence = make_sequence([4])
+        self.decoder.waiting.append(sequence)
+        self.decoder.safe_step()
+        self.assertTrue(sequence.done.is_set())
+        self.assertIsNone(sequence.error)
+
+if __name__ == '__main__':
+    unittest.main()
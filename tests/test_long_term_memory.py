@@ -0,0 +1,52 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.long_term_memory import LongTermMemory
+
+VOCABULARY = ["resume", "pdf", "snake", "game", "python", "weather", "paris"]
+
+def embed(texts):
+    return np.array([[text.lower().count(word) for word in VOCABULARY] for text in texts], dtype=np.float32)
+
+class TestLongTermMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "long_term")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_memory(self):
+        return LongTermMemory(embed, len(VOCABULARY), path=self.path, top_k=1, min_score=0.3)
+
+    def test_recall_from_earlier_session(self):
+        past = self.make_memory()
+        past.remember("code_agent", "write a snake game in python", "Here is the snake game.")
+        past.remember("file_agent", "find my resume pdf", "Found resume.pdf")
+        # turns of the current session are not recalled
+        self.assertEqual(past.recall("where is my resume"), [])
+        current = self.make_memory()
+        self.assertEqual(current.index.size, 2)
+        recalled = current.recall("open my resume")
+        self.assertEqual(len(recalled), 1)
+        self.assertIn("resume.pdf", recalled[0])
+        self.assertEqual(current.recall("open my resume", agent_type="code_agent"), [])
+        self.assertEqual(current.recall("weather in paris"), [])
+
+    def test_long_session_does_not_hide_past_turns(self):
+        past = self.make_memory()
+        past.remember("file_agent", "find my resume pdf", "Found resume.pdf")
+        current = self.make_memory()
+        for i in range(10):
+            # closer to the query than the past turn
+            current.remember("file_agent", "resume resume", f"resume {i}")
+        recalled = current.recall("resume")
+        self.assertEqual(len(recalled), 1)
+        self.assertIn("resume.pdf", recalled[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.model_registry import ModelRegistry
+
+class FakeModel:
+    def __init__(self, size):
+        self.size = size
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ModelRegistry()
+        self.load_count = {"a": 0, "b": 0}
+
+    def make_loader(self, name):
+        def loader():
+            self.load_count[name] += 1
+            return FakeModel(name)
+        return loader
+
+    def test_lazy_and_shared_loading(self):
+        self.registry.register("a", self.make_loader("a"))
+        self.assertFalse(self.registry.is_loaded("a"))
+        first = self.registry.get("a")
+        second = self.registry.get("a")
+        self.assertIs(first, second)
+        self.assertEqual(self.load_count["a"], 1)
+
+    def test_register_twice_keeps_first_loader(self):
+        self.registry.register("a", self.make_loader("a"))
+        self.registry.register("a", self.make_loader("b"))
+        self.registry.get("a")
+        self.assertEqual(self.load_count, {"a": 1, "b": 0})
+
+    def test_unknown_model(self):
+        with self.assertRaises(KeyError):
+            self.registry.get("unknown")
+
+    def test_budget_evicts_least_recently_used(self):
+        self.registry.register("a", self.make_loader("a"))
+        self.registry.register("b", self.make_loader("b"))
+        self.registry.get("a")
+        self.registry.get("b")
+        # fake sizes, 1 MB each, with a budget that only fits one model
+        for entry in self.registry.models.values():
+            entry["size"] = 1024 * 1024
+        self.registry.set_ram_budget(1)
+        self.assertFalse(self.registry.is_loaded("a"))
+        self.assertTrue(self.registry.is_loaded("b"))
+
+    def test_pinned_models_are_never_evicted(self):
+        self.registry.register("a", self.make_loader("a"), pinned=True)
+        self.registry.get("a")
+        self.assertEqual(self.registry.evict_idle(-1), [])
+        self.assertTrue(self.registry.is_loaded("a"))
+
+if __name__ == '__main__':
+    unittest.main()
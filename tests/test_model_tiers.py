@@ -0,0 +1,55 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.model_tiers import ModelTiers
+
+class FakeProvider:
+    def __init__(self, model):
+        self.model = model
+
+class FakeAgent:
+    def __init__(self, agent_type):
+        self.type = agent_type
+        self.llm = None
+
+class TestModelTiers(unittest.TestCase):
+
+    def setUp(self):
+        self.big = FakeProvider("deepseek-r1:14b")
+        self.small = FakeProvider("llama3.2:1b")
+        self.tiers = ModelTiers(self.big, self.small, overrides={"planner_agent": "high", "code_agent": "auto"})
+
+    def test_complexity_picks_tier(self):
+        agent = FakeAgent("casual_agent")
+        self.assertEqual(self.tiers.apply(agent, "LOW"), "low")
+        self.assertIs(agent.llm, self.small)
+        self.assertEqual(self.tiers.apply(agent, "HIGH"), "high")
+        self.assertIs(agent.llm, self.big)
+        self.assertEqual(self.tiers.resolve("code_agent", None), "high")
+
+    def test_override(self):
+        self.assertEqual(self.tiers.resolve("planner_agent", "LOW"), "high")
+        self.assertEqual(self.tiers.resolve("code_agent", "LOW"), "low")
+        with self.assertRaises(ValueError):
+            ModelTiers(self.big, self.small, overrides={"casual_agent": "medium"})
+
+    def test_disabled_without_small_model(self):
+        tiers = ModelTiers(self.big)
+        agent = FakeAgent("casual_agent")
+        tiers.apply(agent, "LOW")
+        self.assertFalse(tiers.enabled)
+        self.assertIs(agent.llm, self.big)
+
+    def test_report(self):
+        self.tiers.record("low", 1.0)
+        self.tiers.record("low", 3.0)
+        self.tiers.record("high", 10.0)
+        report = self.tiers.report()
+        self.assertEqual(report["low"]["turns"], 2)
+        self.assertAlmostEqual(report["low"]["mean_time"], 2.0)
+        self.assertAlmostEqual(report["high"]["share"], 1 / 3)
+        self.assertEqual(report["low"]["model"], "llama3.2:1b")
+
+if __name__ == '__main__':
+    unittest.main()
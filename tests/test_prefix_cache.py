@@ -0,0 +1,116 @@
+import unittest
+import os
+import sys
+import types
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+# server/sources is imported as "sources" by the server, load it under another name
+server_sources = types.ModuleType("server_sources")
+server_sources.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server', 'sources')]
+sys.modules.setdefault("server_sources", server_sources)
+from server_sources.prefix_cache import PrefixMetrics, SessionPrefixCache, common_prefix_length, session_key
+from server_sources.llamacpp_handler import LlamacppLLM
+
+class FakeLLM:
+    """The tokens in the context of a Llama."""
+    def __init__(self, tokens=()):
+        self.input_ids = np.array(list(tokens) + [0] * 8, dtype=np.intc)
+        self.n_tokens = len(tokens)
+
+class FakeState:
+    def __init__(self, size):
+        self.llama_state_size = size
+
+class TestPrefixMetrics(unittest.TestCase):
+
+    def test_counts(self):
+        metrics = PrefixMetrics()
+        self.assertEqual(metrics.stats()["hit_rate"], 0.0)
+        metrics.record(100, 80)
+        metrics.record(50, 0)
+        stats = metrics.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertEqual(stats["saved_tokens"], 80)
+        self.assertEqual(stats["prefilled_tokens"], 70)
+
+    def test_common_prefix_length(self):
+        self.assertEqual(common_prefix_length([1, 2, 3], (1, 2, 4)), 2)
+        self.assertEqual(common_prefix_length([1, 2], [1, 2, 3]), 2)
+        self.assertEqual(common_prefix_length([], [1]), 0)
+
+    def test_session_key_ignores_later_turns(self):
+        system = {'role': 'system', 'content': "You are a coder"}
+        first = {'role': 'user', 'content': "hello"}
+        later = [system, first, {'role': 'assistant', 'content': "hi"}, {'role': 'user', 'content': "next"}]
+        self.assertEqual(session_key([system, first]), session_key(later))
+        self.assertNotEqual(session_key([system, first]), session_key([system, {'role': 'user', 'content': "other"}]))
+
+class TestSessionPrefixCache(unittest.TestCase):
+
+    def setUp(self):
+        self.llm = FakeLLM()
+        self.cache = SessionPrefixCache(self.llm, capacity_bytes=100)
+
+    def save(self, session, tokens, size=10):
+        self.cache.begin(session)
+        state = FakeState(size)
+        self.cache[tokens] = state
+        return state
+
+    def test_next_turn_finds_the_session_state(self):
+        state = self.save("a", [1, 2, 3, 4])
+        self.save("b", [1, 5])
+        self.assertIn([1, 2, 3, 4, 9], self.cache)
+        self.assertIs(self.cache[[1, 2, 3, 4, 9]], state)
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["saved_tokens"], stats["prefilled_tokens"]), (1, 4, 1))
+        self.assertEqual((stats["sessions"], stats["bytes"]), (2, 20))
+
+    def test_miss_raises_key_error(self):
+        self.save("a", [1, 2])
+        self.assertNotIn([7, 8], self.cache)
+        with self.assertRaises(KeyError):
+            self.cache[[7, 8]]
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_one_state_per_session(self):
+        self.save("a", [1, 2])
+        latest = self.save("a", [1, 2, 3, 4])
+        self.assertEqual(self.cache.stats()["sessions"], 1)
+        self.assertIs(self.cache[[1, 2, 3, 4, 5]], latest)
+
+    def test_least_recently_used_evicted_over_capacity(self):
+        self.save("a", [1], size=40)
+        self.save("b", [2], size=40)
+        # looking "a" up makes "b" the least recently used
+        self.cache[[1, 9]]
+        self.save("c", [3], size=40)
+        self.assertEqual(list(self.cache.states), ["a", "c"])
+        self.assertLessEqual(self.cache.cache_size, 100)
+
+    def test_live_context_counts_as_saved(self):
+        self.llm = FakeLLM([1, 2, 3])
+        self.cache = SessionPrefixCache(self.llm)
+        self.save("a", [1])
+        self.cache[[1, 2, 3, 4]]
+        self.assertEqual(self.cache.stats()["saved_tokens"], 3)
+
+class TestLlamacppLoad(unittest.TestCase):
+
+    def test_other_model_rejected(self):
+        generator = LlamacppLLM()
+        llm = FakeLLM()
+        generator.llm = llm
+        generator.loaded_model = "model-a"
+        generator.load("model-a")
+        with self.assertRaises(Exception) as context:
+            generator.load("model-b")
+        self.assertIn("model-a", str(context.exception))
+        # nothing reloaded
+        self.assertIs(generator.llm, llm)
+        self.assertEqual(generator.loaded_model, "model-a")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import importlib.util
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+ROUTER_DEPENDENCIES = all(importlib.util.find_spec(name) is not None
+                          for name in ["torch", "transformers", "adaptive_classifier"])
+
+class ComplexityEngine:
+    """Scores HIGH whatever the text, and records the texts it was asked about."""
+    def __init__(self):
+        self.texts = []
+
+    def predict(self, name, text, k=5):
+        self.texts.append(text)
+        if name == "talk":
+            return [("code", 0.9), ("talk", 0.1)]
+        return [("HIGH", 0.9), ("LOW", 0.1)]
+
+class English:
+    def detect_language(self, text):
+        return "en"
+
+@unittest.skipUnless(ROUTER_DEPENDENCIES, "the router needs torch, transformers and adaptive_classifier")
+class TestRouterComplexity(unittest.TestCase):
+
+    def test_multi_line_request_uses_full_text(self):
+        from sources.router import AgentRouter
+        router = AgentRouter.__new__(AgentRouter)
+        router.engine = ComplexityEngine()
+        router.agents = []
+        router.classify_text = lambda text: ("talk", "en")
+        router.find_planner_agent = lambda: "planner"
+        text = "Build me an app.\n" + "It should fetch the weather from an API, store it in sqlite and plot a weekly chart. " * 2
+        agent, _ = router.route_text(text)
+        self.assertEqual(router.engine.texts, [text])
+        # a long request opening with a short line is not sent back for clarification
+        self.assertEqual(router.last_complexity, "HIGH")
+        self.assertEqual(agent, "planner")
+
+    def test_heads_score_the_same_text(self):
+        from sources.router import AgentRouter
+        router = AgentRouter.__new__(AgentRouter)
+        router.engine = ComplexityEngine()
+        router.agents = []
+        router.lang_analysis = English()
+        router.mode = "router"
+        router.knn_weight = 0
+        router.cascade_stats = {"router": 0, "bart": 0}
+        router.find_planner_agent = lambda: "planner"
+        text = "Fix this bug.\nThe parser crashes on empty files, it should return an empty list instead of raising."
+        router.route_text(text)
+        # one routing text, so the shared encoder embeds it once for the complexity and task heads
+        self.assertEqual(router.engine.texts, [text, text])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.routing_cache import RoutingCache
+
+class TestRoutingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = RoutingCache(max_size=2, ttl=0)
+
+    def test_normalized_exact_hit(self):
+        self.cache.put("Search the web for  cats", "web")
+        self.assertEqual(self.cache.get("search the web for cats ?"), "web")
+        self.assertEqual(self.cache.stats["exact_hits"], 1)
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get("hello"))
+        self.assertEqual(self.cache.stats["misses"], 1)
+        self.assertEqual(self.cache.hit_rate(), 0.0)
+
+    def test_lru_eviction(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.cache.get("a")
+        self.cache.put("c", 3)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), 1)
+
+    def test_ttl_expiry(self):
+        cache = RoutingCache(ttl=0.01)
+        cache.put("hi", "talk")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("hi"))
+
+    def test_similar_hit(self):
+        cache = RoutingCache(similarity_threshold=0.9)
+        embedding = np.array([1.0, 0.0])
+        near = np.array([0.99, 0.141])
+        far = np.array([0.0, 1.0])
+        cache.put("find my resume", "files", embedding)
+        self.assertEqual(cache.get("locate my resume", near), "files")
+        self.assertIsNone(cache.get("tell me a joke", far))
+        self.assertEqual(cache.stats["similar_hits"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
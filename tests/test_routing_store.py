@@ -0,0 +1,42 @@
+import unittest
+import importlib.util
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+
+ROUTER_DEPENDENCIES = all(importlib.util.find_spec(name) is not None for name in ["torch", "adaptive_classifier"])
+
+@unittest.skipUnless(ROUTER_DEPENDENCIES, "the router needs torch and adaptive_classifier")
+class TestRoutingStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # the store only needs the encoder name of the backbone
+        self.backbone = SimpleNamespace(model=SimpleNamespace(config=SimpleNamespace(_name_or_path="router")),
+                                        embedding_dim=4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def engine(self, backend: str):
+        from sources.routing_engine import RoutingEngine
+        return RoutingEngine(self.backbone, store_dir=self.tmp.name, backend=backend)
+
+    def test_backends_keep_their_own_store(self):
+        import torch
+        for backend, value in [("fp32", 1.0), ("int8", 2.0)]:
+            engine = self.engine(backend)
+            engine.stored_embeddings["example"] = torch.full((4,), value)
+            engine.store_dirty = True
+            engine.save_embedding_store()
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["embeddings.fp32.pt", "embeddings.int8.pt"])
+        # switching back and forth never overwrites the other backend's store
+        self.assertEqual(float(self.engine("fp32").stored_embeddings["example"][0]), 1.0)
+        self.assertEqual(float(self.engine("int8").stored_embeddings["example"][0]), 2.0)
+        self.assertNotEqual(self.engine("fp32").store_filename("head_task"),
+                            self.engine("int8").store_filename("head_task"))
+
+if __name__ == '__main__':
+    unittest.main()
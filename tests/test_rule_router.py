@@ -0,0 +1,42 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.rule_router import RuleRouter
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), '..', 'llm_router', 'rules.json')
+
+class TestRuleRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.router = RuleRouter(RULES_PATH)
+
+    def assertRoutes(self, text, agent):
+        rule = self.router.match(text)
+        self.assertIsNotNone(rule, f"No rule matched: {text}")
+        self.assertEqual(rule["agent"], agent)
+
+    def test_obvious_queries(self):
+        self.assertRoutes("hi", "talk")
+        self.assertRoutes("Hello there!", "talk")
+        self.assertRoutes("Goodbye (exit requested by user, dont think, make answer very short)", "talk")
+        self.assertRoutes("Search the web for the latest iPhone release", "web")
+        self.assertRoutes("write a python script to ping a website", "code")
+        self.assertRoutes("Can you find a file called resume.docx on my drive?", "files")
+
+    def test_fallthrough(self):
+        self.assertIsNone(self.router.match("Search the web for a weather API and build an app with it"))
+        self.assertIsNone(self.router.match("Tell me a funny story"))
+        self.assertIsNone(self.router.match("hi, can you debug this Java code?"))
+        self.assertEqual(self.router.report()["fallthrough"], 3)
+
+    def test_unavailable_roles_are_skipped(self):
+        self.assertIsNone(self.router.match("search the web for cats", roles=["talk", "code"]))
+
+    def test_rule_counters(self):
+        self.router.match("hi")
+        self.router.match("hello")
+        self.assertEqual(self.router.report()["greeting"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
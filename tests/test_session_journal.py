@@ -0,0 +1,46 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.session_journal import SessionJournal
+
+class TestSessionJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tmp.name, "casual_agent")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_replay(self):
+        journal = SessionJournal(self.folder, "session_a")
+        journal.append({"op": "reset", "messages": [{'role': 'system', 'content': "prompt"}]})
+        journal.append({"op": "push", "role": "user", "content": "hello"})
+        journal.append({"op": "push", "role": "assistant", "content": "a long answer"})
+        journal.append({"op": "replace", "index": 2, "content": "summary"})
+        journal.close()
+        self.assertEqual(SessionJournal.replay(journal.path), [
+            {'role': 'system', 'content': "prompt"},
+            {'role': 'user', 'content': "hello"},
+            {'role': 'assistant', 'content': "summary"},
+        ])
+
+    def test_index_points_to_latest(self):
+        self.assertIsNone(SessionJournal.find_latest(self.folder))
+        SessionJournal(self.folder, "session_b").close()
+        latest = SessionJournal(self.folder, "session_a")
+        latest.close()
+        self.assertEqual(SessionJournal.find_latest(self.folder), latest.path)
+
+    def test_truncated_line_is_skipped(self):
+        journal = SessionJournal(self.folder, "session_a")
+        journal.append({"op": "push", "role": "user", "content": "hello"})
+        journal.close()
+        with open(journal.path, 'a', encoding="utf-8") as f:
+            f.write('{"op": "push", "role": "assis')
+        self.assertEqual(SessionJournal.replay(journal.path), [{'role': 'user', 'content': "hello"}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import os
+import sys
+from unittest import mock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.summarizers import Summarizer, ExtractiveSummarizer, LedSummarizer, get_summarizer
+
+TEXT = """
+The error means the compiler cannot find helper_functions.h in its include paths.
+Angle brackets are used for system headers, quotes are used for local project headers.
+If helper_functions.h is next to cuda.cu, include it with quotes instead of angle brackets.
+Otherwise pass the folder containing helper_functions.h to the compiler with the -I flag.
+The CUDA samples usually keep helper_functions.h in the common/inc folder of the samples.
+By the way, the weather is nice today.
+"""
+
+class TestExtractiveSummarizer(unittest.TestCase):
+
+    def setUp(self):
+        self.summarizer = ExtractiveSummarizer(ratio=0.4)
+
+    def test_short_text_unchanged(self):
+        self.assertEqual(self.summarizer.summarize("hello there"), "hello there")
+
+    def test_summary_is_shorter_and_extractive(self):
+        summary = self.summarizer.summarize(TEXT)
+        self.assertLess(len(summary), len(TEXT))
+        sentences = self.summarizer.split_sentences(TEXT)
+        for sentence in self.summarizer.split_sentences(summary.replace(". ", ".\n")):
+            self.assertIn(sentence, sentences)
+
+    def test_off_topic_sentence_dropped(self):
+        sentences = self.summarizer.split_sentences(TEXT)
+        scores = self.summarizer.rank(sentences)
+        self.assertLess(scores[-1], scores.mean())
+        self.assertNotIn("weather", self.summarizer.summarize(TEXT))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_summarizer("gpt")
+        self.assertIs(get_summarizer("extractive"), get_summarizer("extractive"))
+
+    def test_interface(self):
+        with self.assertRaises(TypeError):
+            Summarizer()
+        # auto is the default: the extractive backend without cuda, LED on cuda
+        with mock.patch("sources.summarizers.cuda_available", return_value=False):
+            self.assertIsInstance(get_summarizer(), ExtractiveSummarizer)
+        with mock.patch("sources.summarizers.cuda_available", return_value=True):
+            self.assertIsInstance(get_summarizer(), LedSummarizer)
+
+class FakeTokenizer:
+    """Word tokenizer, enough to check the length bounds of the LED summaries."""
+    def __call__(self, texts, **kwargs):
+        ids = [text.split() for text in texts]
+        return {'input_ids': ids, 'attention_mask': [[1] * len(words) for words in ids]}
+
+    def batch_decode(self, ids, skip_special_tokens=True):
+        return [" ".join(words) for words in ids]
+
+class FakeLed:
+    """Always generates up to max_length tokens, the worst case of beam search, a sentence ends every 7 tokens."""
+    def generate(self, input_ids, attention_mask=None, max_length=20, **kwargs):
+        return [[f"w{i}." if i % 7 == 6 else f"w{i}" for i in range(max_length)] for _ in input_ids]
+
+class TestLedSummarizer(unittest.TestCase):
+
+    def test_batched_summaries_keep_their_own_bounds(self):
+        texts = ["short " * 30, "medium " * 60, "long " * 200]
+        summarizer = LedSummarizer()
+        models = mock.Mock()
+        models.get.return_value = (FakeTokenizer(), FakeLed())
+        with mock.patch("sources.summarizers.registry", models):
+            single = [summarizer.summarize(text) for text in texts]
+            batched = summarizer.summarize_batch(texts, batch_size=3)
+        for text, summary, alone in zip(texts, batched, single):
+            self.assertLessEqual(len(summary.split()), summarizer.max_length(text, 64))
+            self.assertTrue(alone.startswith(summary))
+        # the longest text sets the length of the batch, the others are cut on a sentence end
+        self.assertEqual(batched[-1], single[-1])
+        for summary in batched[:-1]:
+            self.assertTrue(summary.endswith("."))
+
+if __name__ == '__main__':
+    unittest.main()
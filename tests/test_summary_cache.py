@@ -0,0 +1,40 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Add project root to Python path
+from sources.summary_cache import SummaryCache
+
+class TestSummaryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "summaries.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hash_depends_on_model(self):
+        self.assertEqual(SummaryCache.content_hash("hello", "a"), SummaryCache.content_hash("hello", "a"))
+        self.assertNotEqual(SummaryCache.content_hash("hello", "a"), SummaryCache.content_hash("hello", "b"))
+
+    def test_persisted_across_sessions(self):
+        cache = SummaryCache(self.path)
+        self.assertIsNone(cache.get("key"))
+        cache.put("key", "short summary")
+        cache.save()
+        reloaded = SummaryCache(self.path)
+        self.assertEqual(reloaded.get("key"), "short summary")
+        self.assertEqual(reloaded.stats["hits"], 1)
+
+    def test_lru_bound(self):
+        cache = SummaryCache(self.path, max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+
+if __name__ == '__main__':
+    unittest.main()